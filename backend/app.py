@@ -7,12 +7,53 @@
 import os
 import sqlite3
 import hashlib
+import hmac
 import json
+import logging
+import tempfile
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from flask import Flask, request, jsonify, session, send_file
+from flask import Flask, Response, g, request, jsonify, session, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from db import get_db, get_pool, init_app as init_db_app
+from migrations import run_migrations
+from blobstore import put_blob, blob_stats
+from renderer import render_template, template_cache
+from generation import (
+    load_servers, load_templates, render_for_server, server_output_dir,
+    record_generated, delete_generated_records, safe_name, ServerManifest
+)
+from fleet import regenerate_fleet
+from jobs import job_queue, get_job, list_jobs, recover_interrupted_jobs, JOB_SCOPES
+from archive import (
+    list_generated_files, stream_zip, attachment_headers, archive_fingerprint, iter_file, ArchiveCache,
+    EXPORT_FORMATS, stream_zip_parallel, stream_tar_parallel
+)
+from pagination import ListQueryError, parse_list_args, fetch_list
+from hierarchy import TreeQueryError, parse_depth, build_tree
+from multiplex import BatchError, MAX_BATCH_REQUESTS, validate_batch, run_batch
+from listcache import CACHE_SCOPES, list_cache, bump_generation, bump_all
+from compression import init_app as init_compression
+from assets import AssetPipeline, serve_index, serve_asset
+from applog import init_app as init_logging
+from metrics import init_app as init_metrics, render_metrics, timed_iter
+from profiling import PROFILE_NAME_PATTERN, init_app as init_profiling, list_profiles
+from provisioning import (
+    MAX_BULK_SERVERS, DuplicateServers, ProvisionError, expand_range, find_existing, normalize_servers, parse_csv,
+    provision_servers
+)
+from templateimport import (
+    MAX_IMPORT_BYTES, MAX_IMPORT_FILES, TemplateImportError, import_templates, read_archive, read_directory,
+    resolve_directory, template_variables, write_template_files
+)
+
+logger = logging.getLogger(__name__)
+
+# 以python3 app.py启动时，multiprocessing的工作进程（fleet/templateimport的进程池）会按脚本路径
+# 把本文件重新导入为__mp_main__；工作进程只执行进程池函数，跳过日志线程、目录创建与前端资源构建等进程级初始化
+WORKER_REIMPORT = __name__ == '__mp_main__'
 
 # Flask应用初始化
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
@@ -22,25 +63,112 @@ CORS(app)
 # 配置路径
 BASE_DIR = Path(__file__).parent.parent
 DATABASE_PATH = BASE_DIR / 'config_system.db'
-UPLOAD_FOLDER = BASE_DIR / 'uploads'
-TEMPLATE_FOLDER = BASE_DIR / 'templates'
-DOWNLOAD_FOLDER = BASE_DIR / 'downloads'
-GENERATED_FOLDER = BASE_DIR / 'generated'
+# 各数据目录可通过环境变量指定（基准测试等场景使用独立目录）
+UPLOAD_FOLDER = Path(os.environ.get('UPLOAD_DIR', BASE_DIR / 'uploads'))
+TEMPLATE_FOLDER = Path(os.environ.get('TEMPLATE_DIR', BASE_DIR / 'templates'))
+DOWNLOAD_FOLDER = Path(os.environ.get('DOWNLOAD_DIR', BASE_DIR / 'downloads'))
+GENERATED_FOLDER = Path(os.environ.get('GENERATED_DIR', BASE_DIR / 'generated'))
+ASSET_FOLDER = BASE_DIR / 'assets'
+PROFILE_FOLDER = Path(os.environ.get('PROFILE_DIR', BASE_DIR / 'profiles'))
+
+app.config['DATABASE_PATH'] = os.environ.get('DATABASE_PATH', str(DATABASE_PATH))
+# 全服生成进程池大小（默认CPU核数）与每个任务包含的区服数
+app.config['FLEET_WORKERS'] = int(os.environ.get('FLEET_WORKERS', os.cpu_count() or 1))
+app.config['FLEET_CHUNK_SIZE'] = int(os.environ.get('FLEET_CHUNK_SIZE', 50))
+# 后台生成任务并发数
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+# 各工作进程检查排队任务的间隔（秒）
+app.config['JOB_POLL_INTERVAL'] = int(os.environ.get('JOB_POLL_INTERVAL', 30))
+# 运行中任务的租约时间（秒）：超过该时间没有心跳（执行进程被强制结束）时由其他进程重新执行
+app.config['JOB_LEASE_TIMEOUT'] = int(os.environ.get('JOB_LEASE_TIMEOUT', 90))
+# 下载ZIP包的压缩级别（0-9，0为仅存储）
+app.config['ZIP_COMPRESS_LEVEL'] = int(os.environ.get('ZIP_COMPRESS_LEVEL', 6))
+# 压缩包缓存上限：总大小（字节）与最长闲置时间（秒）
+app.config['ARCHIVE_CACHE_MAX_BYTES'] = int(os.environ.get('ARCHIVE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+app.config['ARCHIVE_CACHE_MAX_AGE'] = int(os.environ.get('ARCHIVE_CACHE_MAX_AGE', 24 * 3600))
+# 批量导出时并行压缩的线程数
+app.config['EXPORT_WORKERS'] = int(os.environ.get('EXPORT_WORKERS', os.cpu_count() or 1))
+# /api/batch 单次可合并的子请求数
+app.config['BATCH_MAX_REQUESTS'] = int(os.environ.get('BATCH_MAX_REQUESTS', MAX_BATCH_REQUESTS))
+# 列表接口缓存条目数上限（0为关闭缓存）
+app.config['LIST_CACHE_SIZE'] = int(os.environ.get('LIST_CACHE_SIZE', 512))
+list_cache.max_size = app.config['LIST_CACHE_SIZE']
+# API响应压缩：小于该字节数不压缩；压缩级别1-9
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+# 批量开服单次最多创建的区服数
+app.config['BULK_MAX_SERVERS'] = int(os.environ.get('BULK_MAX_SERVERS', MAX_BULK_SERVERS))
+# 模板批量导入：单次文件数与解压后总字节数上限、提取变量的进程数、可导入的服务器目录根
+app.config['IMPORT_MAX_FILES'] = int(os.environ.get('IMPORT_MAX_FILES', MAX_IMPORT_FILES))
+app.config['IMPORT_MAX_BYTES'] = int(os.environ.get('IMPORT_MAX_BYTES', MAX_IMPORT_BYTES))
+app.config['IMPORT_WORKERS'] = int(os.environ.get('IMPORT_WORKERS', os.cpu_count() or 1))
+app.config['IMPORT_ROOT'] = os.environ.get('IMPORT_ROOT', str(UPLOAD_FOLDER))
+# 日志级别（DEBUG/INFO/WARNING/ERROR）
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+# /metrics访问令牌（为空时不校验）；多进程部署时各进程的指标汇总目录（为空时只统计本进程）
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN', '')
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR', '')
+# 请求剖析：PROFILE_ROUTES为视图函数名（逗号分隔），按PROFILE_SAMPLE_RATE的比例剖析；
+# 管理员请求携带X-Profile头时总是剖析。模式cprofile输出pstats，sample输出折叠栈
+app.config['PROFILE_ROUTES'] = os.environ.get('PROFILE_ROUTES', '')
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 1 if app.config['PROFILE_ROUTES'] else 0))
+app.config['PROFILE_MODE'] = os.environ.get('PROFILE_MODE', 'cprofile')
+app.config['PROFILE_SAMPLE_INTERVAL'] = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+app.config['PROFILE_KEEP'] = int(os.environ.get('PROFILE_KEEP', 100))
+if not WORKER_REIMPORT:
+    init_logging(app)
+# 先于压缩注册：after_request按注册的逆序执行，计时覆盖压缩耗时
+init_metrics(app)
+init_db_app(app)
+init_compression(app)
+# 最后注册：剖析只覆盖视图函数及之后的处理
+request_profiler = init_profiling(app, PROFILE_FOLDER)
+
+# 前端资源：index.html中的内联样式/脚本提取为带哈希的文件并预压缩
+asset_pipeline = AssetPipeline(BASE_DIR / 'frontend' / 'index.html', ASSET_FOLDER)
+
+if not WORKER_REIMPORT:
+    # 确保目录存在
+    for folder in [UPLOAD_FOLDER, TEMPLATE_FOLDER, DOWNLOAD_FOLDER, GENERATED_FOLDER]:
+        os.makedirs(folder, exist_ok=True)
+
+    try:
+        asset_pipeline.build()
+    except OSError as e:
+        logger.error("前端资源构建失败: %s", e)
 
-# 确保目录存在
-for folder in [UPLOAD_FOLDER, TEMPLATE_FOLDER, DOWNLOAD_FOLDER, GENERATED_FOLDER]:
-    os.makedirs(folder, exist_ok=True)
+# 已打包的压缩包缓存（按区服目录内容指纹命名）
+archive_cache = ArchiveCache(
+    DOWNLOAD_FOLDER / 'archives',
+    max_bytes=app.config['ARCHIVE_CACHE_MAX_BYTES'],
+    max_age=app.config['ARCHIVE_CACHE_MAX_AGE']
+)
+
+# 批量导出的压缩线程池（zlib/lzma压缩时释放GIL，线程即可并行）
+export_executor = ThreadPoolExecutor(max_workers=app.config['EXPORT_WORKERS'], thread_name_prefix='export')
 
 # 根路由 - 服务前端页面
 @app.route('/')
 def index():
     """服务前端页面"""
-    return app.send_static_file('index.html')
+    try:
+        return serve_index(asset_pipeline)
+    except OSError as e:
+        # 构建失败（如输出目录不可写）时退回直接返回原始页面
+        logger.error("前端资源构建失败: %s", e)
+        return app.send_static_file('index.html')
+
+@app.route('/assets/<path:name>')
+def static_asset(name):
+    """带内容哈希的前端资源（长期缓存）"""
+    return serve_asset(asset_pipeline, name)
 
 # 数据库初始化
 def init_database():
     """初始化SQLite数据库"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = sqlite3.connect(app.config['DATABASE_PATH'])
+    # 启用WAL日志模式（持久化在数据库文件中），读写互不阻塞
+    conn.execute('PRAGMA journal_mode=WAL')
     cursor = conn.cursor()
     
     # 用户表
@@ -140,6 +268,16 @@ def init_database():
     ''', (admin_password,))
     
     conn.commit()
+    
+    # 执行结构迁移（索引等）
+    applied = run_migrations(conn)
+    if applied:
+        logger.info("数据库迁移完成: %s", applied)
+    
+    # 上次停止时仍在运行的后台任务重新排队
+    recovered = recover_interrupted_jobs(conn)
+    if recovered:
+        logger.info("重新排队中断的后台任务: %d", recovered)
     conn.close()
 
 # 用户认证装饰器
@@ -152,6 +290,29 @@ def login_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+# 管理员权限装饰器
+def admin_required(f):
+    """管理员验证装饰器"""
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': '需要登录'}), 401
+        if session.get('role') != 'admin':
+            return jsonify({'error': '需要管理员权限'}), 403
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+# 数据库错误统一返回JSON
+@app.errorhandler(sqlite3.OperationalError)
+def handle_database_error(e):
+    """回滚当前事务；写锁等待超时（database is locked）返回503，客户端可稍后重试"""
+    logger.error("数据库错误: %s %s: %s", request.method, request.path, e)
+    conn = g.get('db_conn')
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+    status = 503 if 'locked' in str(e) else 500
+    return jsonify({'error': f'数据库错误: {e}'}), status
+
 # 路由定义
 
 @app.route('/login', methods=['POST'])
@@ -161,16 +322,15 @@ def login():
     username = data.get('username')
     password = data.get('password')
     
-    print(f"DEBUG: 登录请求 - 用户名: {username}")
+    logger.debug("登录请求 - 用户名: %s", username)
     
     if not username or not password:
         return jsonify({'error': '用户名和密码不能为空'}), 400
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     password_hash = hashlib.sha256(password.encode()).hexdigest()
-    print(f"DEBUG: 输入密码哈希: {password_hash}")
     
     cursor.execute('''
         SELECT id, username, role, password_hash FROM users 
@@ -178,18 +338,14 @@ def login():
     ''', (username,))
     
     user = cursor.fetchone()
-    print(f"DEBUG: 查询到的用户: {user}")
     
     if user:
         stored_hash = user[3]  # password_hash 是第4个字段
-        print(f"DEBUG: 存储的密码哈希: {stored_hash}")
-        print(f"DEBUG: 密码匹配: {stored_hash == password_hash}")
         
         if stored_hash == password_hash:
             session['user_id'] = user[0]
             session['username'] = user[1]
             session['role'] = user[2]
-            conn.close()
             return jsonify({
                 'message': '登录成功',
                 'user': {
@@ -199,7 +355,7 @@ def login():
                 }
             })
     
-    conn.close()
+    logger.info("登录失败 - 用户名: %s", username)
     return jsonify({'error': '用户名或密码错误'}), 401
 
 @app.route('/logout', methods=['POST'])
@@ -209,31 +365,37 @@ def logout():
     return jsonify({'message': '登出成功'})
 
 # 项目管理API
+def cached_list(endpoint, scopes, compute):
+    """按(用户, 接口, 查询参数)缓存列表结果，scopes为结果依赖的数据类别"""
+    params = tuple(sorted(request.args.items(multi=True)))
+    return list_cache.get_or_compute(get_db(), session['user_id'], endpoint, params, scopes, compute)
+
 @app.route('/api/projects', methods=['GET'])
 @login_required
 def get_projects():
     """获取项目列表"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    conn = get_db()
     
-    cursor.execute('''
-        SELECT id, name, description, created_at, updated_at
-        FROM projects WHERE user_id = ?
-        ORDER BY updated_at DESC
-    ''', (session['user_id'],))
-    
-    projects = []
-    for row in cursor.fetchall():
-        projects.append({
-            'id': row[0],
-            'name': row[1],
-            'description': row[2],
-            'created_at': row[3],
-            'updated_at': row[4]
-        })
+    def query():
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, name, description, created_at, updated_at
+            FROM projects WHERE user_id = ?
+            ORDER BY updated_at DESC
+        ''', (session['user_id'],))
+        
+        projects = []
+        for row in cursor.fetchall():
+            projects.append({
+                'id': row[0],
+                'name': row[1],
+                'description': row[2],
+                'created_at': row[3],
+                'updated_at': row[4]
+            })
+        return projects
     
-    conn.close()
-    return jsonify(projects)
+    return jsonify(cached_list('projects', ('projects',), query))
 
 @app.route('/api/projects', methods=['POST'])
 @login_required
@@ -246,7 +408,7 @@ def create_project():
     if not name:
         return jsonify({'error': '项目名称不能为空'}), 400
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
@@ -256,6 +418,7 @@ def create_project():
         ''', (name, description, session['user_id']))
         
         project_id = cursor.lastrowid
+        bump_generation(conn, session['user_id'], 'projects')
         conn.commit()
         
         return jsonify({
@@ -265,8 +428,6 @@ def create_project():
     except Exception as e:
         conn.rollback()
         return jsonify({'error': f'创建项目失败: {str(e)}'}), 500
-    finally:
-        conn.close()
 
 @app.route('/api/projects/<int:project_id>', methods=['PUT'])
 @login_required
@@ -274,7 +435,7 @@ def update_project(project_id):
     """更新项目信息"""
     data = request.get_json()
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # 检查项目是否存在且属于当前用户
@@ -285,7 +446,6 @@ def update_project(project_id):
     project = cursor.fetchone()
     
     if not project or project[0] != session['user_id']:
-        conn.close()
         return jsonify({'error': '项目不存在或无权限'}), 404
     
     # 更新项目
@@ -308,8 +468,8 @@ def update_project(project_id):
         WHERE id = ?
     ''', update_values)
     
+    bump_generation(conn, session['user_id'], 'projects')
     conn.commit()
-    conn.close()
     
     return jsonify({'message': '项目更新成功'})
 
@@ -317,7 +477,7 @@ def update_project(project_id):
 @login_required
 def delete_project(project_id):
     """删除项目"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -326,11 +486,10 @@ def delete_project(project_id):
     ''', (project_id, session['user_id']))
     
     if cursor.rowcount == 0:
-        conn.close()
         return jsonify({'error': '项目不存在或无权限'}), 404
     
+    bump_generation(conn, session['user_id'], 'projects')
     conn.commit()
-    conn.close()
     
     return jsonify({'message': '项目删除成功'})
 
@@ -339,7 +498,7 @@ def delete_project(project_id):
 @login_required
 def get_project(project_id):
     """获取单个项目信息"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -348,7 +507,6 @@ def get_project(project_id):
     ''', (project_id, session['user_id']))
     
     project = cursor.fetchone()
-    conn.close()
     
     if not project:
         return jsonify({'error': '项目不存在或无权限'}), 404
@@ -366,7 +524,7 @@ def get_project(project_id):
 @login_required
 def get_games(project_id):
     """获取项目下的游戏列表"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -386,7 +544,6 @@ def get_games(project_id):
             'updated_at': row[4]
         })
     
-    conn.close()
     return jsonify(games)
 
 @app.route('/api/projects/<int:project_id>/games', methods=['POST'])
@@ -395,7 +552,7 @@ def create_game(project_id):
     """创建游戏"""
     data = request.get_json()
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -404,8 +561,8 @@ def create_game(project_id):
     ''', (project_id, data['name'], data.get('description', ''), session['user_id']))
     
     game_id = cursor.lastrowid
+    bump_generation(conn, session['user_id'], 'games')
     conn.commit()
-    conn.close()
     
     return jsonify({'id': game_id, 'message': '游戏创建成功'})
 
@@ -414,7 +571,7 @@ def create_game(project_id):
 @login_required
 def get_game(game_id):
     """获取单个游戏信息"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -423,7 +580,6 @@ def get_game(game_id):
     ''', (game_id, session['user_id']))
     
     game = cursor.fetchone()
-    conn.close()
     
     if not game:
         return jsonify({'error': '游戏不存在或无权限'}), 404
@@ -442,7 +598,7 @@ def get_game(game_id):
 @login_required
 def get_servers(game_id):
     """获取游戏下的区服列表"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -463,7 +619,6 @@ def get_servers(game_id):
             'updated_at': row[5]
         })
     
-    conn.close()
     return jsonify(servers)
 
 @app.route('/api/games/<int:game_id>/servers', methods=['POST'])
@@ -472,7 +627,7 @@ def create_server(game_id):
     """创建区服"""
     data = request.get_json()
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -481,17 +636,76 @@ def create_server(game_id):
     ''', (game_id, data['name'], data['server_id'], data.get('description', ''), session['user_id']))
     
     server_id = cursor.lastrowid
+    bump_generation(conn, session['user_id'], 'servers')
     conn.commit()
-    conn.close()
     
     return jsonify({'id': server_id, 'message': '区服创建成功'})
 
+# 批量创建区服
+@app.route('/api/games/<int:game_id>/servers/bulk', methods=['POST'])
+@login_required
+def bulk_create_servers(game_id):
+    """
+    批量开服，区服来源三选一：
+    JSON的servers列表、JSON的csv文本（或text/csv请求体、上传的CSV文件file）、JSON的range编号范围
+    可选on_duplicate（skip/error）与dry_run（只返回展开结果与重复的区服ID，不写入）
+    """
+    max_count = app.config['BULK_MAX_SERVERS']
+    try:
+        if request.mimetype == 'text/csv':
+            options = request.args
+            items = parse_csv(request.get_data(as_text=True))
+        elif 'file' in request.files:
+            options = request.form
+            items = parse_csv(request.files['file'].read().decode('utf-8-sig'))
+        else:
+            options = request.get_json(silent=True) or {}
+            if 'range' in options:
+                items = expand_range(options['range'], max_count)
+            elif 'csv' in options:
+                items = parse_csv(str(options['csv']))
+            else:
+                items = options.get('servers')
+        servers = normalize_servers(items, max_count)
+    except (ProvisionError, UnicodeDecodeError) as e:
+        return jsonify({'error': str(e)}), 400
+    on_duplicate = options.get('on_duplicate', 'skip')
+    dry_run = str(options.get('dry_run', '')).lower() in ('1', 'true')
+    
+    conn = get_db()
+    game = conn.execute('SELECT id FROM games WHERE id = ? AND user_id = ?', (game_id, session['user_id'])).fetchone()
+    if not game:
+        return jsonify({'error': '游戏不存在或无权限'}), 404
+    if dry_run:
+        existing = find_existing(conn, game_id, [s['server_id'] for s in servers])
+        return jsonify({'servers': servers, 'count': len(servers),
+                        'duplicates': [s['server_id'] for s in servers if s['server_id'] in existing]})
+    
+    try:
+        created, skipped = provision_servers(conn, session['user_id'], game_id, servers, on_duplicate)
+    except DuplicateServers as e:
+        conn.rollback()
+        return jsonify({'error': str(e), 'duplicates': e.server_ids}), 409
+    except ProvisionError as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 400
+    if created:
+        bump_generation(conn, session['user_id'], 'servers')
+    conn.commit()
+    
+    return jsonify({
+        'message': f'已创建{len(created)}个区服' + (f'，跳过{len(skipped)}个已存在的区服ID' if skipped else ''),
+        'created': len(created),
+        'skipped': skipped,
+        'servers': created
+    })
+
 # 模板管理API
 @app.route('/api/projects/<int:project_id>/games/<int:game_id>/templates', methods=['GET'])
 @login_required
 def get_config_templates(project_id, game_id):
     """获取游戏下的配置文件模板"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -512,7 +726,6 @@ def get_config_templates(project_id, game_id):
             'updated_at': row[5]
         })
     
-    conn.close()
     return jsonify(templates)
 
 @app.route('/api/projects/<int:project_id>/games/<int:game_id>/templates', methods=['POST'])
@@ -521,20 +734,18 @@ def create_config_template(project_id, game_id):
     """创建配置文件模板"""
     data = request.get_json()
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # 获取项目和游戏信息
     cursor.execute('SELECT name FROM projects WHERE id = ? AND user_id = ?', (project_id, session['user_id']))
     project = cursor.fetchone()
     if not project:
-        conn.close()
         return jsonify({'error': '项目不存在或无权限'}), 404
     
     cursor.execute('SELECT name FROM games WHERE id = ? AND user_id = ?', (game_id, session['user_id']))
     game = cursor.fetchone()
     if not game:
-        conn.close()
         return jsonify({'error': '游戏不存在或无权限'}), 404
     
     # 创建模板目录结构（绝对路径，且保留文件相对目录层级）
@@ -555,7 +766,6 @@ def create_config_template(project_id, game_id):
         with open(template_file_path, 'w', encoding='utf-8') as f:
             f.write(data.get('template_content', ''))
     except Exception as e:
-        conn.close()
         return jsonify({'error': f'创建模板文件失败: {str(e)}'}), 500
     
     # 保存到数据库
@@ -566,8 +776,8 @@ def create_config_template(project_id, game_id):
           data.get('template_content', ''), json.dumps(data.get('config_items', [])), session['user_id']))
     
     template_id = cursor.lastrowid
+    bump_generation(conn, session['user_id'], 'templates')
     conn.commit()
-    conn.close()
     
     return jsonify({
         'id': template_id, 
@@ -575,108 +785,185 @@ def create_config_template(project_id, game_id):
         'file_created': str(template_file_path)
     })
 
+# 批量导入模板
+@app.route('/api/projects/<int:project_id>/games/<int:game_id>/templates/import', methods=['POST'])
+@login_required
+def import_config_templates(project_id, game_id):
+    """
+    批量导入模板，来源二选一：上传的zip/tar压缩包（表单文件file），或JSON的directory（导入根目录下的相对路径）
+    文件相对路径作为file_path，已有同路径模板时更新；可选strip_components（去掉前几级目录）与dry_run（只返回导入计划）
+    """
+    conn = get_db()
+    project = conn.execute('SELECT name FROM projects WHERE id = ? AND user_id = ?',
+                           (project_id, session['user_id'])).fetchone()
+    if not project:
+        return jsonify({'error': '项目不存在或无权限'}), 404
+    game = conn.execute('SELECT name FROM games WHERE id = ? AND project_id = ? AND user_id = ?',
+                        (game_id, project_id, session['user_id'])).fetchone()
+    if not game:
+        return jsonify({'error': '游戏不存在或无权限'}), 404
+    
+    limits = {'max_files': app.config['IMPORT_MAX_FILES'], 'max_bytes': app.config['IMPORT_MAX_BYTES']}
+    try:
+        if 'file' in request.files:
+            options = request.form
+            if (request.content_length or 0) > limits['max_bytes']:
+                return jsonify({'error': f'上传文件超过{limits["max_bytes"]}字节'}), 413
+            # 上传的压缩包先落到上传目录，读取后删除
+            fd, upload_path = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix='.import')
+            os.close(fd)
+            try:
+                request.files['file'].save(upload_path)
+                files, skipped = read_archive(upload_path, options.get('strip_components'), **limits)
+            finally:
+                os.remove(upload_path)
+        else:
+            options = request.get_json(silent=True) or {}
+            if not options.get('directory'):
+                raise TemplateImportError('需要上传压缩包file或指定directory')
+            directory = resolve_directory(app.config['IMPORT_ROOT'], options['directory'])
+            files, skipped = read_directory(directory, options.get('strip_components'), **limits)
+    except TemplateImportError as e:
+        return jsonify({'error': str(e)}), 400
+    if not files:
+        return jsonify({'error': '没有可导入的文本文件', 'skipped': skipped}), 400
+    dry_run = str(options.get('dry_run', '')).lower() in ('1', 'true')
+    
+    summary = import_templates(conn, session['user_id'], project_id, game_id, files, config_items_for_variables,
+                               max_workers=app.config['IMPORT_WORKERS'], dry_run=dry_run)
+    changed_paths = {item['file_path'] for item in summary['created'] + summary['updated']}
+    if not dry_run:
+        # 文件先于提交写入，写入失败时数据库回滚
+        template_dir = TEMPLATE_FOLDER / safe_name(project[0]) / safe_name(game[0])
+        try:
+            write_template_files(template_dir, [(path, content) for path, content in files if path in changed_paths])
+        except OSError as e:
+            conn.rollback()
+            return jsonify({'error': f'写入模板文件失败: {str(e)}'}), 500
+        if changed_paths:
+            bump_generation(conn, session['user_id'], 'templates')
+        conn.commit()
+        for item in summary['updated']:
+            template_cache.invalidate(item['id'])
+    
+    counts = {key: len(items) for key, items in summary.items()}
+    return jsonify({
+        'message': (f'新建{counts["created"]}个、更新{counts["updated"]}个、未变化{counts["unchanged"]}个模板'
+                    + (f'，跳过{len(skipped)}个文件' if skipped else '')),
+        'dry_run': dry_run,
+        'counts': counts,
+        'skipped': skipped,
+        **summary
+    })
+
+# 列表接口字段定义（字段名 -> SQL表达式），供fields参数投影使用
+GAME_LIST_COLUMNS = {
+    'id': 'g.id',
+    'project_id': 'g.project_id',
+    'name': 'g.name',
+    'description': 'g.description',
+    'created_at': 'g.created_at',
+    'updated_at': 'g.updated_at',
+    'project_name': 'p.name'
+}
+
+SERVER_LIST_COLUMNS = {
+    'id': 's.id',
+    'game_id': 's.game_id',
+    'name': 's.name',
+    'server_id': 's.server_id',
+    'description': 's.description',
+    'created_at': 's.created_at',
+    'updated_at': 's.updated_at',
+    'game_name': 'g.name',
+    'project_name': 'p.name'
+}
+
+TEMPLATE_LIST_COLUMNS = {
+    'id': 't.id',
+    'project_id': 't.project_id',
+    'game_id': 't.game_id',
+    'name': 't.name',
+    'file_path': 't.file_path',
+    'config_items': 't.config_items',
+    'created_at': 't.created_at',
+    'updated_at': 't.updated_at',
+    'game_name': 'g.name',
+    'project_name': 'p.name'
+}
+
+def list_response(endpoint, scopes, columns, from_sql, alias, decoders=None):
+    """
+    通用列表查询：支持fields字段投影与limit/cursor游标分页
+    未传limit/cursor时返回完整数组（兼容旧前端），否则返回{items, next_cursor}
+    """
+    try:
+        fields, limit, after, paginated = parse_list_args(request.args, columns)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def query():
+        cursor = get_db().cursor()
+        return fetch_list(
+            cursor, columns, from_sql, f'{alias}.user_id = ?', (session['user_id'],), alias,
+            fields, limit=limit, after=after, decoders=decoders
+        )
+    
+    items, next_cursor = cached_list(endpoint, scopes, query)
+    
+    if not paginated:
+        return jsonify(items)
+    return jsonify({'items': items, 'next_cursor': next_cursor})
+
 # 获取所有游戏（用于前端简化调用）
 @app.route('/api/games', methods=['GET'])
 @login_required
 def get_all_games():
     """获取所有游戏列表"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT g.id, g.project_id, g.name, g.description, g.created_at, g.updated_at,
-               p.name as project_name
-        FROM games g
+    return list_response('games', ('games', 'projects'), GAME_LIST_COLUMNS, '''
+        games g
         LEFT JOIN projects p ON g.project_id = p.id
-        WHERE g.user_id = ?
-        ORDER BY g.created_at DESC
-    ''', (session['user_id'],))
-    
-    games = []
-    for row in cursor.fetchall():
-        games.append({
-            'id': row[0],
-            'project_id': row[1],
-            'name': row[2],
-            'description': row[3],
-            'created_at': row[4],
-            'updated_at': row[5],
-            'project_name': row[6]
-        })
-    
-    conn.close()
-    return jsonify(games)
+    ''', 'g')
 
 # 获取所有区服（用于前端简化调用）
 @app.route('/api/servers', methods=['GET'])
 @login_required
 def get_all_servers():
     """获取所有区服列表"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT s.id, s.game_id, s.name, s.server_id, s.description, s.created_at, s.updated_at,
-               g.name as game_name, p.name as project_name
-        FROM servers s
+    return list_response('servers', ('servers', 'games', 'projects'), SERVER_LIST_COLUMNS, '''
+        servers s
         LEFT JOIN games g ON s.game_id = g.id
         LEFT JOIN projects p ON g.project_id = p.id
-        WHERE s.user_id = ?
-        ORDER BY s.created_at DESC
-    ''', (session['user_id'],))
-    
-    servers = []
-    for row in cursor.fetchall():
-        servers.append({
-            'id': row[0],
-            'game_id': row[1],
-            'name': row[2],
-            'server_id': row[3],
-            'description': row[4],
-            'created_at': row[5],
-            'updated_at': row[6],
-            'game_name': row[7],
-            'project_name': row[8]
-        })
-    
-    conn.close()
-    return jsonify(servers)
+    ''', 's')
 
 # 获取所有模板（用于前端简化调用）
 @app.route('/api/templates', methods=['GET'])
 @login_required
 def get_all_templates():
     """获取所有配置文件模板列表"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT t.id, t.project_id, t.game_id, t.name, t.file_path, t.config_items, t.created_at, t.updated_at,
-               g.name as game_name, p.name as project_name
-        FROM config_templates t
+    return list_response('templates', ('templates', 'games', 'projects'), TEMPLATE_LIST_COLUMNS, '''
+        config_templates t
         LEFT JOIN games g ON t.game_id = g.id
         LEFT JOIN projects p ON t.project_id = p.id
-        WHERE t.user_id = ?
-        ORDER BY t.created_at DESC
-    ''', (session['user_id'],))
-    
-    templates = []
-    for row in cursor.fetchall():
-        templates.append({
-            'id': row[0],
-            'project_id': row[1],
-            'game_id': row[2],
-            'name': row[3],
-            'file_path': row[4],
-            'config_items': json.loads(row[5]) if row[5] else [],
-            'created_at': row[6],
-            'updated_at': row[7],
-            'game_name': row[8],
-            'project_name': row[9]
-        })
-    
-    conn.close()
-    return jsonify(templates)
+    ''', 't', decoders={'config_items': lambda v: json.loads(v) if v else []})
+
+# 层级树（项目 -> 游戏 -> 区服 -> 模板摘要）
+@app.route('/api/tree', methods=['GET'])
+@login_required
+def get_tree():
+    """一次返回用户的完整层级，支持project_id/game_id范围与depth深度限制"""
+    try:
+        depth = parse_depth(request.args.get('depth'))
+    except TreeQueryError as e:
+        return jsonify({'error': str(e)}), 400
+    project_id = request.args.get('project_id', type=int)
+    game_id = request.args.get('game_id', type=int)
+    
+    conn = get_db()
+    tree = cached_list('tree', CACHE_SCOPES, lambda: build_tree(
+        conn, session['user_id'], project_id=project_id, game_id=game_id, depth=depth
+    ))
+    return jsonify(tree)
 
 # 编辑游戏
 @app.route('/api/games/<int:game_id>', methods=['PUT'])
@@ -685,7 +972,7 @@ def update_game(game_id):
     """更新游戏信息"""
     data = request.get_json()
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -695,11 +982,10 @@ def update_game(game_id):
     ''', (data['name'], data.get('description', ''), game_id, session['user_id']))
     
     if cursor.rowcount == 0:
-        conn.close()
         return jsonify({'error': '游戏不存在或无权限'}), 404
     
+    bump_generation(conn, session['user_id'], 'games')
     conn.commit()
-    conn.close()
     
     return jsonify({'message': '游戏更新成功'})
 
@@ -708,7 +994,7 @@ def update_game(game_id):
 @login_required
 def delete_game(game_id):
     """删除游戏"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -717,11 +1003,10 @@ def delete_game(game_id):
     ''', (game_id, session['user_id']))
     
     if cursor.rowcount == 0:
-        conn.close()
         return jsonify({'error': '游戏不存在或无权限'}), 404
     
+    bump_generation(conn, session['user_id'], 'games')
     conn.commit()
-    conn.close()
     
     return jsonify({'message': '游戏删除成功'})
 
@@ -730,7 +1015,7 @@ def delete_game(game_id):
 @login_required
 def get_server(server_id):
     """获取单个服务器信息"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -739,7 +1024,6 @@ def get_server(server_id):
     ''', (server_id, session['user_id']))
     
     server = cursor.fetchone()
-    conn.close()
     
     if not server:
         return jsonify({'error': '服务器不存在或无权限'}), 404
@@ -761,7 +1045,7 @@ def update_server(server_id):
     """更新区服信息"""
     data = request.get_json()
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -771,11 +1055,10 @@ def update_server(server_id):
     ''', (data['name'], data['server_id'], data.get('description', ''), server_id, session['user_id']))
     
     if cursor.rowcount == 0:
-        conn.close()
         return jsonify({'error': '区服不存在或无权限'}), 404
     
+    bump_generation(conn, session['user_id'], 'servers')
     conn.commit()
-    conn.close()
     
     return jsonify({'message': '区服更新成功'})
 
@@ -784,7 +1067,7 @@ def update_server(server_id):
 @login_required
 def delete_server(server_id):
     """删除区服"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -793,11 +1076,12 @@ def delete_server(server_id):
     ''', (server_id, session['user_id']))
     
     if cursor.rowcount == 0:
-        conn.close()
         return jsonify({'error': '区服不存在或无权限'}), 404
     
+    # 生成记录随区服删除，不再被引用的内容一并释放
+    delete_generated_records(conn, [server_id])
+    bump_generation(conn, session['user_id'], 'servers')
     conn.commit()
-    conn.close()
     
     return jsonify({'message': '区服删除成功'})
 
@@ -806,7 +1090,7 @@ def delete_server(server_id):
 @login_required
 def get_template(template_id):
     """获取单个模板信息"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -815,7 +1099,6 @@ def get_template(template_id):
     ''', (template_id, session['user_id']))
     
     template = cursor.fetchone()
-    conn.close()
     
     if not template:
         return jsonify({'error': '模板不存在或无权限'}), 404
@@ -839,7 +1122,7 @@ def update_template(template_id):
     """更新配置文件模板"""
     data = request.get_json()
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # 获取模板信息
@@ -850,7 +1133,6 @@ def update_template(template_id):
     
     template_info = cursor.fetchone()
     if not template_info:
-        conn.close()
         return jsonify({'error': '模板不存在或无权限'}), 404
     
     project_id, game_id, old_file_path = template_info
@@ -862,7 +1144,6 @@ def update_template(template_id):
     game = cursor.fetchone()
     
     if not project or not game:
-        conn.close()
         return jsonify({'error': '项目或游戏不存在'}), 404
     
     # 创建模板目录结构（绝对路径，且保留文件相对目录层级）
@@ -886,14 +1167,13 @@ def update_template(template_id):
             try:
                 os.remove(old_template_file_path)
             except Exception as e:
-                print(f"删除旧模板文件失败: {e}")
+                logger.warning("删除旧模板文件失败: %s", e)
     
     # 保存模板内容到文件
     try:
         with open(template_file_path, 'w', encoding='utf-8') as f:
             f.write(data.get('template_content', ''))
     except Exception as e:
-        conn.close()
         return jsonify({'error': f'更新模板文件失败: {str(e)}'}), 500
     
     # 解析模板内容中的配置项
@@ -907,8 +1187,9 @@ def update_template(template_id):
     ''', (data['name'], new_file_path, data.get('template_content', ''), 
           json.dumps(config_items), template_id, session['user_id']))
     
+    bump_generation(conn, session['user_id'], 'templates')
     conn.commit()
-    conn.close()
+    template_cache.invalidate(template_id)
     
     return jsonify({
         'message': '模板更新成功',
@@ -920,7 +1201,7 @@ def update_template(template_id):
 @login_required
 def delete_template(template_id):
     """删除配置文件模板"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # 获取模板信息
@@ -931,7 +1212,6 @@ def delete_template(template_id):
     
     template_info = cursor.fetchone()
     if not template_info:
-        conn.close()
         return jsonify({'error': '模板不存在或无权限'}), 404
     
     project_id, game_id, file_path = template_info
@@ -951,7 +1231,7 @@ def delete_template(template_id):
             try:
                 os.remove(template_file_path)
             except Exception as e:
-                print(f"删除模板文件失败: {e}")
+                logger.warning("删除模板文件失败: %s", e)
     
     # 从数据库删除
     cursor.execute('''
@@ -959,8 +1239,9 @@ def delete_template(template_id):
         WHERE id = ? AND user_id = ?
     ''', (template_id, session['user_id']))
     
+    bump_generation(conn, session['user_id'], 'templates')
     conn.commit()
-    conn.close()
+    template_cache.invalidate(template_id)
     
     return jsonify({'message': '模板删除成功'})
 
@@ -974,35 +1255,30 @@ def generate_config():
     template_id = data.get('template_id')
     config_data = data.get('config_data', {})
     
-    print(f"DEBUG: 收到生成请求 - server_id: {server_id}, template_id: {template_id}")
-    print(f"DEBUG: 配置数据: {config_data}")
+    logger.debug("收到生成请求 - server_id: %s, template_id: %s, 配置项: %d",
+                 server_id, template_id, len(config_data))
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # 获取模板信息
     cursor.execute('''
-        SELECT template_content, file_path FROM config_templates 
+        SELECT template_content, file_path, updated_at FROM config_templates 
         WHERE id = ? AND user_id = ?
     ''', (template_id, session['user_id']))
     
     template = cursor.fetchone()
     if not template:
-        print(f"DEBUG: 模板不存在 - template_id: {template_id}, user_id: {session['user_id']}")
-        conn.close()
+        logger.debug("模板不存在 - template_id: %s, user_id: %s", template_id, session['user_id'])
         return jsonify({'error': '模板不存在或无权限'}), 404
     
     template_content = template[0]
     file_path = template[1]
-    print(f"DEBUG: 模板内容长度: {len(template_content)}, 文件路径: {file_path}")
     
-    # 替换模板中的变量
-    generated_content = template_content
-    for key, value in config_data.items():
-        placeholder = f'{{{{ {key} }}}}'  # 使用两个大括号格式
-        generated_content = generated_content.replace(placeholder, str(value))
-    print(f"DEBUG: 变量替换完成，生成内容长度: {len(generated_content)}")
-    print(f"DEBUG: 替换后的内容预览: {generated_content[:200]}...")
+    # 替换模板中的变量（编译结果按模板ID+内容哈希缓存）
+    generated_content = render_template(template_content, config_data, template_id)
+    logger.debug("变量替换完成 - 文件路径: %s, 模板长度: %d, 生成内容长度: %d",
+                 file_path, len(template_content), len(generated_content))
     
     # 计算生成文件的实际落盘路径：generated/{项目}/{游戏}/{区服名或ID}/{file_path}
     cursor.execute('''
@@ -1014,11 +1290,9 @@ def generate_config():
     ''', (server_id, session['user_id']))
     sgp = cursor.fetchone()
     if not sgp:
-        print(f"DEBUG: 区服不存在 - server_id: {server_id}, user_id: {session['user_id']}")
-        conn.close()
+        logger.debug("区服不存在 - server_id: %s, user_id: %s", server_id, session['user_id'])
         return jsonify({'error': '区服不存在或无权限'}), 404
     server_name, server_sid, game_name, project_name = sgp
-    print(f"DEBUG: 区服信息 - 项目: {project_name}, 游戏: {game_name}, 区服: {server_name}/{server_sid}")
     
     project_safe = project_name.replace(' ', '_').replace('/', '_')
     game_safe = game_name.replace(' ', '_').replace('/', '_')
@@ -1026,49 +1300,282 @@ def generate_config():
     rel_path = Path(file_path)
     output_dir = GENERATED_FOLDER / project_safe / game_safe / server_dir_name / rel_path.parent
     
-    print(f"DEBUG: 创建目录: {output_dir}")
-    print(f"DEBUG: GENERATED_FOLDER: {GENERATED_FOLDER}")
-    print(f"DEBUG: GENERATED_FOLDER 存在: {GENERATED_FOLDER.exists()}")
-    
     try:
         os.makedirs(output_dir, exist_ok=True)
-        print(f"DEBUG: 目录创建成功: {output_dir}")
-        print(f"DEBUG: 目录存在: {output_dir.exists()}")
     except Exception as e:
-        print(f"DEBUG: 目录创建失败: {str(e)}")
-        conn.close()
+        logger.error("创建目录失败: %s: %s", output_dir, e)
         return jsonify({'error': f'创建目录失败: {str(e)}'}), 500
     
-    output_file_path = output_dir / rel_path.name
-    print(f"DEBUG: 写入文件: {output_file_path}")
+    # 内容与清单记录一致时跳过写文件和生成记录
+    server_dir = GENERATED_FOLDER / project_safe / game_safe / server_dir_name
+    manifest = ServerManifest(server_dir)
     
     try:
-        with open(output_file_path, 'w', encoding='utf-8') as f:
-            f.write(generated_content)
-        print(f"DEBUG: 文件写入成功: {output_file_path}")
-        print(f"DEBUG: 文件存在: {output_file_path.exists()}")
-        print(f"DEBUG: 文件大小: {output_file_path.stat().st_size if output_file_path.exists() else 'N/A'}")
+        changed, output_file_path = manifest.write(file_path, generated_content, template_id, template[2])
+        manifest.save()
+        logger.debug("文件写入完成: %s, 内容变化: %s", output_file_path, changed)
     except Exception as e:
-        print(f"DEBUG: 文件写入失败: {str(e)}")
-        conn.close()
+        logger.error("写入生成文件失败: %s: %s", server_dir / file_path, e)
         return jsonify({'error': f'写入生成文件失败: {str(e)}'}), 500
 
-    # 保存生成记录到数据库（仍保存模板相对路径便于查询）
-    cursor.execute('''
-        INSERT INTO config_files (server_id, file_name, file_path, template_content, generated_content)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (server_id, rel_path.name, file_path, template_content, generated_content))
-    
-    conn.commit()
-    conn.close()
+    if changed:
+        # 保存生成记录到数据库（仍保存模板相对路径便于查询，内容存入去重压缩的blobs表）
+        cursor.execute('''
+            INSERT INTO config_files (server_id, file_name, file_path, template_hash, generated_hash)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (server_id, rel_path.name, file_path,
+              put_blob(conn, template_content), put_blob(conn, generated_content)))
+        
+        conn.commit()
     
     return jsonify({
         'message': '配置文件生成成功',
         'generated_content': generated_content,
         'file_path': file_path,
-        'output_file': str(output_file_path)
+        'output_file': str(output_file_path),
+        'changed': changed
+    })
+
+def parse_id_list(values):
+    """请求中的ID列表：元素为整数或数字字符串（如"12"），统一转换为整数；含其他值时抛出ValueError"""
+    ids = []
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(value)
+        ids.append(int(value))
+    return ids
+
+# 批量生成配置文件
+@app.route('/api/generate-batch', methods=['POST'])
+@login_required
+def generate_batch():
+    """批量生成配置文件：多个区服 × 多个模板，一次事务记录全部结果"""
+    data = request.get_json() or {}
+    server_ids = data.get('server_ids') or []
+    template_ids = data.get('template_ids', 'all')
+    config_data = data.get('config_data', {})
+    server_config_data = data.get('server_config_data', {})
+    template_config_data = data.get('template_config_data', {})
+    fill_defaults = bool(data.get('fill_defaults', False))
+    include_content = bool(data.get('include_content', False))
+    
+    if not isinstance(server_ids, list) or not server_ids:
+        return jsonify({'error': 'server_ids不能为空'}), 400
+    if template_ids != 'all' and (not isinstance(template_ids, list) or not template_ids):
+        return jsonify({'error': 'template_ids必须是非空列表或"all"'}), 400
+    if not isinstance(template_config_data, dict) or not all(isinstance(v, dict) for v in template_config_data.values()):
+        return jsonify({'error': 'template_config_data必须是 {模板ID: 配置} 对象'}), 400
+    try:
+        server_ids = parse_id_list(server_ids)
+        if template_ids != 'all':
+            template_ids = parse_id_list(template_ids)
+    except ValueError:
+        return jsonify({'error': 'server_ids与template_ids的元素必须是整数'}), 400
+    
+    conn = get_db()
+    user_id = session['user_id']
+    
+    # 集合查询：区服（含游戏/项目）与模板各一轮
+    servers = load_servers(conn, user_id, server_ids)
+    if template_ids == 'all':
+        game_ids = sorted({s['game_id'] for s in servers.values()})
+        templates = load_templates(conn, user_id, game_ids=game_ids)
+    else:
+        templates = load_templates(conn, user_id, template_ids=template_ids)
+        found = {t['id'] for t in templates}
+        missing_templates = [tid for tid in template_ids if tid not in found]
+    
+    results = []
+    records = []
+    file_counts = {'written': 0, 'unchanged': 0, 'removed': 0}
+    for sid in server_ids:
+        server = servers.get(sid)
+        if not server:
+            results.append({'server_id': sid, 'status': 'error', 'error': '区服不存在或无权限'})
+            continue
+        
+        data_for_server = dict(config_data)
+        data_for_server.update(server_config_data.get(str(sid), {}))
+        server_dir = server_output_dir(GENERATED_FOLDER, server['project_name'], server['game_name'],
+                                       server['name'], server['server_id'])
+        manifest = ServerManifest(server_dir)
+        generated_paths = []
+        
+        if template_ids != 'all':
+            for tid in missing_templates:
+                results.append({'server_id': sid, 'template_id': tid, 'status': 'error', 'error': '模板不存在或无权限'})
+        
+        for template in templates:
+            if template_ids == 'all' and template['game_id'] != server['game_id']:
+                continue
+            item = {'server_id': sid, 'template_id': template['id'], 'template_name': template['name'],
+                    'file_path': template['file_path']}
+            generated_paths.append(template['file_path'])
+            data_for_template = data_for_server
+            if str(template['id']) in template_config_data:
+                data_for_template = dict(data_for_server)
+                data_for_template.update(template_config_data[str(template['id'])])
+            try:
+                generated_content = render_for_server(
+                    template, data_for_template, get_default_value if fill_defaults else None
+                )
+                changed, output_file_path = manifest.write(
+                    template['file_path'], generated_content, template['id'], template['updated_at']
+                )
+            except Exception as e:
+                item.update({'status': 'error', 'error': f'生成失败: {str(e)}'})
+                results.append(item)
+                continue
+            
+            # 内容未变化的文件不重复记录
+            if changed:
+                records.append((sid, template['file_path'], template['template_content'], generated_content))
+            item.update({'status': 'ok', 'changed': changed, 'output_file': str(output_file_path)})
+            if include_content:
+                item['generated_content'] = generated_content
+            results.append(item)
+        
+        # 生成全部模板时，清理已不存在的模板留下的文件
+        if template_ids == 'all':
+            manifest.remove_missing(generated_paths)
+        manifest.save()
+        for key, value in manifest.counts().items():
+            file_counts[key] += value
+    
+    # 全部生成记录在同一个事务中提交
+    try:
+        record_generated(conn, records)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': f'保存生成记录失败: {str(e)}', 'results': results}), 500
+    
+    succeeded = sum(1 for r in results if r['status'] == 'ok')
+    return jsonify({
+        'message': f'批量生成完成：成功 {succeeded} 个，失败 {len(results) - succeeded} 个',
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'files': file_counts,
+        'results': results
     })
 
+def parse_fleet_workers(value):
+    """请求中的workers参数：缺省为FLEET_WORKERS，截断到1..FLEET_WORKERS，不是整数时抛出ValueError"""
+    limit = max(1, app.config['FLEET_WORKERS'])
+    if value is None:
+        return limit
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(value)
+    return max(1, min(int(value), limit))
+
+# 全服重新生成
+@app.route('/api/regenerate-fleet', methods=['POST'])
+@login_required
+def regenerate_fleet_configs():
+    """重新生成整个游戏或项目下所有区服的配置文件（多进程并行）"""
+    data = request.get_json() or {}
+    game_id = data.get('game_id')
+    project_id = data.get('project_id')
+    
+    if game_id is None and project_id is None:
+        return jsonify({'error': '需要指定game_id或project_id'}), 400
+    try:
+        workers = parse_fleet_workers(data.get('workers'))
+    except ValueError:
+        return jsonify({'error': 'workers必须是整数'}), 400
+    
+    conn = get_db()
+    
+    try:
+        result = regenerate_fleet(
+            conn, session['user_id'], GENERATED_FOLDER,
+            game_id=game_id, project_id=project_id,
+            config_data=data.get('config_data', {}),
+            server_config_data=data.get('server_config_data', {}),
+            default_value=get_default_value if data.get('fill_defaults') else None,
+            max_workers=workers,
+            chunk_size=app.config['FLEET_CHUNK_SIZE']
+        )
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': f'全服生成失败: {str(e)}'}), 500
+    
+    files = result['files']
+    result['message'] = (f"全服生成完成：{result['servers']} 个区服，写入 {files['written']} 个文件，"
+                         f"未变化 {files['unchanged']} 个，删除 {files['removed']} 个")
+    return jsonify(result)
+
+# 后台生成任务
+def run_generation_job(conn, job, progress):
+    """执行后台生成任务（在任务线程中调用）"""
+    params = job['params']
+    scope_kwargs = {f"{job['scope']}_id": job['scope_id']}
+    return regenerate_fleet(
+        conn, job['user_id'], GENERATED_FOLDER,
+        config_data=params.get('config_data', {}),
+        server_config_data=params.get('server_config_data', {}),
+        default_value=get_default_value if params.get('fill_defaults') else None,
+        max_workers=parse_fleet_workers(params.get('workers')),
+        chunk_size=app.config['FLEET_CHUNK_SIZE'],
+        progress=progress,
+        **scope_kwargs
+    )
+
+job_queue.init_app(app, run_generation_job)
+
+@app.before_request
+def resume_pending_jobs():
+    """定期接手排队中的后台任务（含其他工作进程留下的任务）"""
+    job_queue.poll()
+
+@app.route('/api/jobs', methods=['POST'])
+@login_required
+def create_job():
+    """创建后台生成任务（范围：server / game / project）"""
+    data = request.get_json() or {}
+    scope = data.get('scope')
+    scope_id = data.get('scope_id')
+    
+    if scope not in JOB_SCOPES:
+        return jsonify({'error': f'scope必须是 {", ".join(JOB_SCOPES)} 之一'}), 400
+    if not isinstance(scope_id, int):
+        return jsonify({'error': 'scope_id必须是整数'}), 400
+    try:
+        workers = parse_fleet_workers(data.get('workers'))
+    except ValueError:
+        return jsonify({'error': 'workers必须是整数'}), 400
+    
+    params = {
+        'workers': workers,
+        'config_data': data.get('config_data', {}),
+        'server_config_data': data.get('server_config_data', {}),
+        'fill_defaults': bool(data.get('fill_defaults', False))
+    }
+    job_id = job_queue.submit(get_db(), session['user_id'], scope, scope_id, params)
+    
+    return jsonify({'id': job_id, 'state': 'queued', 'message': '生成任务已提交'}), 202
+
+@app.route('/api/jobs', methods=['GET'])
+@login_required
+def get_jobs():
+    """获取最近的后台任务列表"""
+    return jsonify(list_jobs(get_db(), session['user_id']))
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_job_status(job_id):
+    """查询后台任务状态与进度"""
+    job = get_job(get_db(), job_id, session['user_id'])
+    if not job:
+        return jsonify({'error': '任务不存在或无权限'}), 404
+    
+    job['progress'] = {
+        'total': job['total'],
+        'done': job['done'],
+        'percent': round(job['done'] * 100 / job['total'], 1) if job['total'] else 0.0
+    }
+    return jsonify(job)
+
 # 获取生成目录路径
 @app.route('/api/get-generated-path', methods=['POST'])
 @login_required
@@ -1121,11 +1628,11 @@ def open_folder():
         return jsonify({'error': f'打开文件夹失败: {str(e)}'}), 500
 
 # 下载生成文件的ZIP包
-@app.route('/api/download-generated-zip', methods=['POST'])
+@app.route('/api/download-generated-zip', methods=['GET', 'POST'])
 @login_required
 def download_generated_zip():
-    """下载生成文件的ZIP包"""
-    data = request.get_json()
+    """下载生成文件的ZIP包（按目录内容缓存，支持ETag条件请求）"""
+    data = request.args if request.method == 'GET' else (request.get_json() or {})
     project_name = data.get('project_name')
     game_name = data.get('game_name')
     server_name = data.get('server_name')
@@ -1134,55 +1641,100 @@ def download_generated_zip():
         return jsonify({'error': '缺少必要参数'}), 400
     
     try:
-        import zipfile
-        import tempfile
-        
-        # 构建生成目录路径
-        project_safe = project_name.replace(' ', '_').replace('/', '_')
-        game_safe = game_name.replace(' ', '_').replace('/', '_')
-        server_dir_name = server_name.replace(' ', '_').replace('/', '_')
-        
-        generated_path = GENERATED_FOLDER / project_safe / game_safe / server_dir_name
-        
-        print(f"DEBUG: 查找生成目录: {generated_path}")
-        if not generated_path.exists():
-            print(f"DEBUG: 生成目录不存在，尝试创建: {generated_path}")
-            try:
-                os.makedirs(generated_path, exist_ok=True)
-                print(f"DEBUG: 目录创建成功: {generated_path}")
-            except Exception as e:
-                print(f"DEBUG: 目录创建失败: {str(e)}")
-                return jsonify({'error': f'生成目录不存在且无法创建: {str(e)}'}), 404
-        
-        # 检查目录中是否有文件
-        files_in_dir = list(generated_path.rglob('*'))
-        files_only = [f for f in files_in_dir if f.is_file()]
-        
-        if not files_only:
-            return jsonify({'error': '生成目录中没有配置文件，请先生成配置文件'}), 404
-        
-        print(f"DEBUG: 找到 {len(files_only)} 个文件，开始创建ZIP包")
-        
-        # 创建临时ZIP文件
-        temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
-        
-        with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_path in files_only:
-                # 保持相对路径结构
-                arcname = file_path.relative_to(generated_path)
-                zipf.write(file_path, arcname)
-                print(f"DEBUG: 添加文件到ZIP: {arcname}")
-        
-        print(f"DEBUG: ZIP包创建成功: {temp_zip.name}")
-        
-        return send_file(
-            temp_zip.name,
-            as_attachment=True,
-            download_name=f'{project_name}_{game_name}_{server_name}_configs.zip',
-            mimetype='application/zip'
-        )
-    except Exception as e:
-        return jsonify({'error': f'创建ZIP包失败: {str(e)}'}), 500
+        compress_level = int(data.get('compress_level', app.config['ZIP_COMPRESS_LEVEL']))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'compress_level必须是0-9的整数'}), 400
+    if not 0 <= compress_level <= 9:
+        return jsonify({'error': 'compress_level必须是0-9的整数'}), 400
+    
+    # 构建生成目录路径
+    project_safe = project_name.replace(' ', '_').replace('/', '_')
+    game_safe = game_name.replace(' ', '_').replace('/', '_')
+    server_dir_name = server_name.replace(' ', '_').replace('/', '_')
+    
+    generated_path = GENERATED_FOLDER / project_safe / game_safe / server_dir_name
+    
+    files = list_generated_files(generated_path) if generated_path.is_dir() else []
+    
+    if not files:
+        return jsonify({'error': '生成目录中没有配置文件，请先生成配置文件'}), 404
+    
+    # 目录内容未变化时压缩包字节完全相同，指纹即强ETag
+    etag = archive_fingerprint(files, compress_level)
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+    
+    headers = attachment_headers(f'{project_name}_{game_name}_{server_name}_configs.zip')
+    headers['ETag'] = f'"{etag}"'
+    
+    cached_path = archive_cache.lookup(etag)
+    if cached_path:
+        logger.debug("命中压缩包缓存: %s", cached_path)
+        headers['Content-Length'] = str(os.path.getsize(cached_path))
+        return Response(iter_file(cached_path), mimetype='application/zip', headers=headers)
+    
+    logger.debug("流式输出ZIP包: %s, 文件数: %d", generated_path, len(files))
+    
+    return Response(
+        timed_iter(archive_cache.store_stream(etag, stream_zip(files, compress_level)), 'archive'),
+        mimetype='application/zip',
+        headers=headers
+    )
+
+# 批量导出整个游戏/项目的生成文件
+@app.route('/api/export', methods=['GET', 'POST'])
+@login_required
+def export_generated():
+    """将整个游戏或项目的生成目录打成一个压缩包（成员并行压缩，流式输出）"""
+    data = request.args if request.method == 'GET' else (request.get_json() or {})
+    export_format = data.get('format', 'zip')
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format必须是 {", ".join(EXPORT_FORMATS)} 之一'}), 400
+    try:
+        project_id = int(data['project_id'])
+        game_id = int(data['game_id']) if data.get('game_id') else None
+        compress_level = int(data.get('compress_level', app.config['ZIP_COMPRESS_LEVEL']))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': '需要整数参数project_id，可选game_id、compress_level'}), 400
+    if not 0 <= compress_level <= 9:
+        return jsonify({'error': 'compress_level必须是0-9的整数'}), 400
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT name FROM projects WHERE id = ? AND user_id = ?', (project_id, session['user_id']))
+    project = cursor.fetchone()
+    if not project:
+        return jsonify({'error': '项目不存在或无权限'}), 404
+    project_safe = project[0].replace(' ', '_').replace('/', '_')
+    
+    if game_id is not None:
+        cursor.execute('SELECT name FROM games WHERE id = ? AND project_id = ? AND user_id = ?',
+                       (game_id, project_id, session['user_id']))
+        game = cursor.fetchone()
+        if not game:
+            return jsonify({'error': '游戏不存在或无权限'}), 404
+        game_safe = game[0].replace(' ', '_').replace('/', '_')
+        export_root = GENERATED_FOLDER / project_safe / game_safe
+        archive_name = f'{project[0]}_{game[0]}_configs'
+        prefix = f'{game_safe}/'
+    else:
+        export_root = GENERATED_FOLDER / project_safe
+        archive_name = f'{project[0]}_configs'
+        prefix = f'{project_safe}/'
+    
+    files = list_generated_files(export_root, prefix) if export_root.is_dir() else []
+    if not files:
+        return jsonify({'error': '没有可导出的生成文件，请先生成配置文件'}), 404
+    
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    if export_format == 'zip':
+        chunks = stream_zip_parallel(files, compress_level, export_executor)
+    else:
+        chunks = stream_tar_parallel(files, export_format.split('.')[1], compress_level, export_executor)
+    
+    return Response(timed_iter(chunks, 'archive'), mimetype=mimetype, headers=attachment_headers(archive_name + extension))
 
 # 修改用户个人信息
 @app.route('/api/user/profile', methods=['PUT'])
@@ -1196,7 +1748,7 @@ def update_profile():
     if not nickname:
         return jsonify({'error': '昵称不能为空'}), 400
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
@@ -1204,14 +1756,12 @@ def update_profile():
         cursor.execute('UPDATE users SET username = ?, email = ? WHERE id = ?', 
                       (nickname, email, session['user_id']))
         conn.commit()
-        conn.close()
         
         # 更新session中的用户名
         session['username'] = nickname
         
         return jsonify({'message': '个人信息更新成功'})
     except Exception as e:
-        conn.close()
         return jsonify({'error': f'更新失败: {str(e)}'}), 500
 
 # 修改用户密码
@@ -1219,50 +1769,37 @@ def update_profile():
 @login_required
 def change_password():
     """修改用户密码"""
-    print(f"DEBUG: 收到密码修改请求")
-    print(f"DEBUG: session: {session}")
-    print(f"DEBUG: user_id in session: {'user_id' in session}")
-    
     data = request.get_json()
-    print(f"DEBUG: 请求数据: {data}")
     
     current_password = data.get('currentPassword')
     new_password = data.get('newPassword')
     
     if not current_password or not new_password:
-        print(f"DEBUG: 缺少必要参数")
         return jsonify({'error': '缺少必要参数'}), 400
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # 验证当前密码
     cursor.execute('SELECT password_hash FROM users WHERE id = ?', (session['user_id'],))
     user = cursor.fetchone()
-    print(f"DEBUG: 查询到的用户: {user}")
     
     if not user:
-        print(f"DEBUG: 用户不存在")
-        conn.close()
         return jsonify({'error': '用户不存在'}), 404
     
     # 验证当前密码（使用哈希比较）
     import hashlib
     current_password_hash = hashlib.sha256(current_password.encode()).hexdigest()
     if user[0] != current_password_hash:
-        print(f"DEBUG: 当前密码错误")
-        print(f"DEBUG: 数据库密码: {user[0]}")
-        print(f"DEBUG: 输入密码哈希: {current_password_hash}")
-        conn.close()
+        logger.info("修改密码失败，当前密码错误 - user_id: %s", session['user_id'])
         return jsonify({'error': '当前密码错误'}), 400
     
     # 更新密码（使用哈希）
     new_password_hash = hashlib.sha256(new_password.encode()).hexdigest()
     cursor.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_password_hash, session['user_id']))
     conn.commit()
-    conn.close()
     
-    print(f"DEBUG: 密码修改成功")
+    logger.info("密码修改成功 - user_id: %s", session['user_id'])
     return jsonify({'message': '密码修改成功'})
 
 # 清空所有数据
@@ -1270,7 +1807,7 @@ def change_password():
 @login_required
 def clear_all_data():
     """清空所有数据"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     try:
@@ -1279,6 +1816,7 @@ def clear_all_data():
         
         # 删除所有数据
         cursor.execute('DELETE FROM config_files')
+        cursor.execute('DELETE FROM blobs')
         cursor.execute('DELETE FROM config_templates')
         cursor.execute('DELETE FROM servers')
         cursor.execute('DELETE FROM games')
@@ -1286,21 +1824,66 @@ def clear_all_data():
         
         # 重置自增ID
         cursor.execute('DELETE FROM sqlite_sequence WHERE name IN ("projects", "games", "servers", "config_templates", "config_files")')
+        bump_all(conn)
         
         conn.commit()
-        conn.close()
         
         return jsonify({'message': '数据清空成功'})
     except Exception as e:
-        conn.close()
         return jsonify({'error': f'清空数据失败: {str(e)}'}), 500
 
+# 合并请求
+@app.route('/api/batch', methods=['POST'])
+@login_required
+def batch_requests():
+    """依次执行多个子请求并一次返回全部结果，子请求共享同一个数据库连接"""
+    data = request.get_json(silent=True) or {}
+    try:
+        items = validate_batch(data.get('requests'), app.config['BATCH_MAX_REQUESTS'])
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db()
+    headers = {'Cookie': request.headers['Cookie']} if 'Cookie' in request.headers else {}
+    results = run_batch(app, items, headers, on_error=lambda e: conn.rollback())
+    return jsonify({'results': results})
+
+# 运行指标（Prometheus文本格式）
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """请求数、路由耗时直方图与各阶段耗时"""
+    token = app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': '未授权'}), 401
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+# 请求剖析结果列表
+@app.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def get_profiles():
+    """剖析文件列表（最新的在前）与当前剖析设置"""
+    return jsonify({
+        'settings': request_profiler.settings(),
+        'profiles': list_profiles(str(PROFILE_FOLDER))
+    })
+
+# 下载剖析文件
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+@admin_required
+def download_profile(name):
+    """下载pstats或折叠栈文件"""
+    if not PROFILE_NAME_PATTERN.match(name):
+        return jsonify({'error': '剖析文件不存在'}), 404
+    if not (PROFILE_FOLDER / name).is_file():
+        return jsonify({'error': '剖析文件不存在'}), 404
+    return send_from_directory(PROFILE_FOLDER, name, as_attachment=True)
+
 # 调试API - 查看数据库状态
 @app.route('/api/debug/status', methods=['GET'])
 @login_required
 def debug_status():
     """调试API - 查看数据库状态"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # 获取各种数据统计
@@ -1329,7 +1912,6 @@ def debug_status():
     ''', (session['user_id'],))
     recent_templates = cursor.fetchall()
     
-    conn.close()
     
     return jsonify({
         'user_id': session['user_id'],
@@ -1339,6 +1921,12 @@ def debug_status():
             'servers': server_count,
             'templates': template_count
         },
+        'db_pool': get_pool().stats(),
+        'blob_store': blob_stats(conn),
+        'template_cache': template_cache.stats(),
+        'list_cache': list_cache.stats(),
+        'static_assets': asset_pipeline.stats(),
+        'archive_cache': archive_cache.stats(),
         'recent_templates': [
             {
                 'id': t[0],
@@ -1354,24 +1942,16 @@ def debug_status():
 # 辅助函数
 def get_template_config_items(template_content):
     """解析模板内容中的配置项"""
-    import re
-    variables = re.findall(r'\{\{([^}]+)\}\}', template_content)
-    
-    config_items = []
-    seen = set()
-    
-    for var in variables:
-        var = var.strip()
-        if var not in seen:
-            seen.add(var)
-            config_items.append({
-                'key': var,
-                'label': generate_friendly_label(var),
-                'type': 'text',
-                'default_value': get_default_value(var)
-            })
-    
-    return config_items
+    return config_items_for_variables(template_variables(template_content))
+
+def config_items_for_variables(variables):
+    """由变量名列表生成配置项"""
+    return [{
+        'key': var,
+        'label': generate_friendly_label(var),
+        'type': 'text',
+        'default_value': get_default_value(var)
+    } for var in variables]
 
 def generate_friendly_label(var_name):
     """根据变量名生成友好的标签"""
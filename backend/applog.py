@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志 - 分级输出，请求线程只把日志记录放入队列，由后台线程统一格式化写出；每条日志带请求ID
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import uuid
+
+from flask import g, has_request_context, request
+
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(process)d] [%(request_id)s] %(name)s: %(message)s'
+REQUEST_ID_HEADER = 'X-Request-ID'
+# 上游传入的请求ID只接受短的安全字符，避免日志注入
+REQUEST_ID_PATTERN = re.compile(r'[\w.-]{1,64}')
+
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """为日志记录附加当前请求ID（请求之外为'-'）"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id', '-') if has_request_context() else '-'
+        return True
+
+
+def setup_logging(level=None, stream=None):
+    """
+    配置根日志：QueueHandler（请求线程不做IO）+ 后台QueueListener写出到stream
+    重复调用时只调整日志级别
+    """
+    global _listener
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # 请求ID必须在请求线程中取得，过滤器挂在入队一侧
+    queue_handler.addFilter(RequestIdFilter())
+    root.addHandler(queue_handler)
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def assign_request_id():
+    """before_request：沿用上游传入的请求ID，否则生成新的"""
+    incoming = request.headers.get(REQUEST_ID_HEADER, '')
+    g.request_id = incoming if REQUEST_ID_PATTERN.fullmatch(incoming) else uuid.uuid4().hex[:16]
+
+
+def add_request_id_header(response):
+    """after_request：响应中返回请求ID，便于对照日志排查"""
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+
+def init_app(app):
+    """注册请求ID钩子并初始化日志"""
+    setup_logging(app.config.get('LOG_LEVEL'))
+    app.before_request(assign_request_id)
+    app.after_request(add_request_id_header)
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压缩包打包 - 边压缩边输出的流式ZIP，以及按目录内容指纹缓存的压缩包
+"""
+
+import gzip
+import hashlib
+import lzma
+import os
+import struct
+import tarfile
+import threading
+import time
+import unicodedata
+import uuid
+import zipfile
+import zlib
+from collections import deque
+from urllib.parse import quote
+
+from generation import MANIFEST_NAME, ServerManifest
+
+# 读取源文件与向客户端输出的块大小
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def list_generated_files(root, prefix=''):
+    """列出生成目录下的全部文件，返回[(绝对路径, 包内相对路径)]，按路径排序"""
+    root = str(root)
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            # 清单及其锁文件、临时文件不打包
+            if name.startswith(MANIFEST_NAME):
+                continue
+            path = os.path.join(dirpath, name)
+            files.append((path, prefix + os.path.relpath(path, root).replace(os.sep, '/')))
+    return files
+
+
+class _ChunkSink:
+    """zipfile的输出目标：只追加、不可定位，数据由生成器分块取走"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """取出已缓冲的数据"""
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+    @property
+    def size(self):
+        """已缓冲未取走的字节数"""
+        return len(self._buffer)
+
+
+def stream_zip(files, compress_level=6):
+    """
+    流式生成ZIP数据
+    files: [(绝对路径, 包内相对路径)]；compress_level为0时只存储不压缩
+    """
+    sink = _ChunkSink()
+    compression = zipfile.ZIP_DEFLATED if compress_level > 0 else zipfile.ZIP_STORED
+    # 输出不可定位时zipfile自动使用数据描述符，无需回写文件头
+    with zipfile.ZipFile(sink, 'w', compression=compression) as zipf:
+        for path, arcname in files:
+            zinfo = zipfile.ZipInfo.from_file(path, arcname)
+            zinfo.compress_type = compression
+            # ZipFile.write内部也是这样设置压缩级别（open写模式不接受该参数）
+            zinfo._compresslevel = compress_level if compression == zipfile.ZIP_DEFLATED else None
+            with open(path, 'rb') as src, zipf.open(zinfo, 'w') as dest:
+                while True:
+                    block = src.read(STREAM_CHUNK_SIZE)
+                    if not block:
+                        break
+                    dest.write(block)
+                    if sink.size >= STREAM_CHUNK_SIZE:
+                        yield sink.drain()
+            if sink.size:
+                yield sink.drain()
+    # 写入中央目录
+    if sink.size:
+        yield sink.drain()
+
+
+def iter_file(path):
+    """分块读取文件内容"""
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(STREAM_CHUNK_SIZE)
+            if not block:
+                break
+            yield block
+
+
+def attachment_headers(download_name):
+    """生成Content-Disposition头，非ASCII文件名使用RFC 5987编码"""
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        quoted = quote(download_name, safe="!#$&+^`|~")
+        return {'Content-Disposition': f"attachment; filename=\"{simple}\"; filename*=UTF-8''{quoted}"}
+    return {'Content-Disposition': f'attachment; filename="{download_name}"'}
+
+
+def _manifest_for(directory, manifests):
+    """文件所在区服目录的清单记录（向上逐级查找.manifest.json，按目录缓存），找不到时返回None"""
+    if directory in manifests:
+        return manifests[directory]
+    if os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+        result = (directory, ServerManifest(directory).entries)
+    else:
+        parent = os.path.dirname(directory)
+        result = _manifest_for(parent, manifests) if parent != directory else None
+    manifests[directory] = result
+    return result
+
+
+def file_content_hash(path, manifests):
+    """
+    文件内容的sha256：清单记录的大小与修改时间和磁盘一致时直接使用清单中的哈希，
+    否则（不是生成的文件或被手动修改过）读取文件计算
+    """
+    stat = os.stat(path)
+    found = _manifest_for(os.path.dirname(path), manifests)
+    if found:
+        server_dir, entries = found
+        entry = entries.get(os.path.relpath(path, server_dir).replace(os.sep, '/'))
+        if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+            return entry['hash']
+    digest = hashlib.sha256()
+    for block in iter_file(path):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def archive_fingerprint(files, compress_level):
+    """
+    根据各文件的内容哈希（取自生成清单）计算压缩包指纹（作为缓存键和ETag）
+    成员头中的修改时间与权限也写入压缩包，一并计入，保证指纹相同时压缩包字节相同
+    """
+    digest = hashlib.sha256(f'zip:{compress_level}'.encode())
+    manifests = {}
+    for path, arcname in files:
+        zinfo = zipfile.ZipInfo.from_file(path, arcname)
+        digest.update(f'\0{arcname}\0{file_content_hash(path, manifests)}'
+                      f'\0{zinfo.date_time}\0{zinfo.external_attr}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ArchiveCache:
+    """磁盘上的压缩包缓存，按总大小和存放时间淘汰（最久未使用的先淘汰）"""
+
+    def __init__(self, folder, max_bytes=512 * 1024 * 1024, max_age=24 * 3600):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def path_for(self, key):
+        return os.path.join(str(self.folder), f'{key}.zip')
+
+    def lookup(self, key):
+        """命中时返回缓存文件路径并刷新使用时间，否则返回None"""
+        path = self.path_for(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        if time.time() - stat.st_mtime > self.max_age:
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(path)
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def store_stream(self, key, chunks):
+        """边向客户端输出边写入缓存；输出完整结束后才放入缓存，中途断开则丢弃"""
+        os.makedirs(str(self.folder), exist_ok=True)
+        tmp_path = self.path_for(key) + f'.{uuid.uuid4().hex}.tmp'
+        completed = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, self.path_for(key))
+            completed = True
+        finally:
+            if not completed:
+                self._remove(tmp_path)
+        self.evict()
+
+    def evict(self):
+        """删除过期文件，总大小超限时从最久未使用的开始删除"""
+        entries = []
+        now = time.time()
+        try:
+            names = os.listdir(str(self.folder))
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith('.zip'):
+                continue
+            path = os.path.join(str(self.folder), name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                self._remove(path, evicted=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path, evicted=True)
+            total -= size
+
+    def _remove(self, path, evicted=False):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        if evicted:
+            with self._lock:
+                self.evicted += 1
+
+    def stats(self):
+        """缓存命中与占用统计"""
+        files = 0
+        size = 0
+        try:
+            for entry in os.scandir(str(self.folder)):
+                if entry.name.endswith('.zip'):
+                    files += 1
+                    size += entry.stat().st_size
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evicted': self.evicted,
+                'files': files,
+                'bytes': size,
+                'max_bytes': self.max_bytes,
+                'max_age': self.max_age
+            }
+
+
+# 批量导出支持的格式
+EXPORT_FORMATS = {
+    'zip': ('application/zip', '.zip'),
+    'tar.gz': ('application/gzip', '.tar.gz'),
+    'tar.xz': ('application/x-xz', '.tar.xz'),
+}
+
+# tar格式按块并行压缩，每块输出为独立的gzip/xz成员，拼接后仍是合法的压缩流
+TAR_BLOCK_SIZE = 1024 * 1024
+
+
+def _ordered_map(executor, func, items, window):
+    """在线程池中并行执行，按提交顺序产出结果，同时最多window个任务在途"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _dos_datetime(timestamp):
+    """转换为ZIP使用的DOS日期时间"""
+    t = time.localtime(timestamp)
+    year = max(t.tm_year, 1980)
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+        ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def _compress_member(args):
+    """读取并压缩单个文件（在工作线程中执行，zlib压缩时释放GIL）"""
+    path, arcname, compress_level = args
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) >= 0xFFFFFFFF:
+        raise ValueError(f'文件过大，无法加入ZIP: {arcname}')
+    crc = zlib.crc32(data)
+    if compress_level > 0:
+        compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+        method = zipfile.ZIP_DEFLATED
+    else:
+        payload, method = data, zipfile.ZIP_STORED
+    return arcname, stat, crc, len(data), method, payload
+
+
+def stream_zip_parallel(files, compress_level, executor, window=16):
+    """
+    并行压缩成员文件并按顺序流式输出ZIP
+    各成员压缩相互独立，压缩在线程池中完成，主线程只负责拼装文件头
+    """
+    offset = 0
+    central = []
+    tasks = ((path, arcname, compress_level) for path, arcname in files)
+    for arcname, stat, crc, size, method, payload in _ordered_map(executor, _compress_member, tasks, window):
+        name = arcname.encode('utf-8')
+        dos_time, dos_date = _dos_datetime(stat.st_mtime)
+        header = struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, 0x800, method, dos_time, dos_date,
+                             crc, len(payload), size, len(name), 0)
+        central.append((name, method, dos_time, dos_date, crc, len(payload), size, stat.st_mode, offset))
+        yield header + name
+        yield payload
+        offset += len(header) + len(name) + len(payload)
+
+    # 中央目录（偏移超过4GB时使用zip64扩展字段）
+    cd_start = offset
+    cd = bytearray()
+    for name, method, dos_time, dos_date, crc, csize, size, mode, local_offset in central:
+        extra = b''
+        if local_offset >= 0xFFFFFFFF:
+            extra = struct.pack('<HHQ', 0x0001, 8, local_offset)
+            local_offset = 0xFFFFFFFF
+        cd += struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | 45, 45 if extra else 20, 0x800,
+                          method, dos_time, dos_date, crc, csize, size, len(name), len(extra), 0, 0, 0,
+                          (mode & 0xFFFF) << 16, local_offset)
+        cd += name + extra
+        if len(cd) >= STREAM_CHUNK_SIZE:
+            offset += len(cd)
+            yield bytes(cd)
+            cd.clear()
+    offset += len(cd)
+    cd_size = offset - cd_start
+    count = len(central)
+    if count >= 0xFFFF or cd_start >= 0xFFFFFFFF or cd_size >= 0xFFFFFFFF:
+        cd += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, cd_size, cd_start)
+        cd += struct.pack('<IIQI', 0x07064b50, 0, offset, 1)
+        cd += struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, 0xFFFF, 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF, 0)
+    else:
+        cd += struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count, cd_size, cd_start, 0)
+    yield bytes(cd)
+
+
+def _iter_tar_blocks(files, block_size):
+    """生成未压缩的tar流，按block_size切块"""
+    sink = _ChunkSink()
+    with tarfile.open(fileobj=sink, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+        for path, arcname in files:
+            tarinfo = tar.gettarinfo(path, arcname)
+            with open(path, 'rb') as f:
+                tar.addfile(tarinfo, f)
+            while sink.size >= block_size:
+                data = sink.drain()
+                for i in range(0, len(data) - block_size + 1, block_size):
+                    yield data[i:i + block_size]
+                rest = len(data) % block_size
+                if rest:
+                    sink.write(data[-rest:])
+    if sink.size:
+        yield sink.drain()
+
+
+def stream_tar_parallel(files, codec, compress_level, executor, window=16, block_size=TAR_BLOCK_SIZE):
+    """并行压缩tar流的各个块，codec为gz或xz"""
+    if codec == 'gz':
+        level = compress_level if compress_level > 0 else 1
+        compress = lambda block: gzip.compress(block, compresslevel=level, mtime=0)
+    else:
+        preset = min(compress_level, 9)
+        compress = lambda block: lzma.compress(block, format=lzma.FORMAT_XZ, preset=preset)
+    yield from _ordered_map(executor, compress, _iter_tar_blocks(files, block_size), window)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前端静态资源 - 启动时把index.html中的内联样式/脚本提取为带内容哈希的文件并预压缩，
+资源文件长期缓存，index.html使用ETag重新验证
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+
+from flask import Response, abort, request
+
+ASSET_URL_PREFIX = '/assets/'
+
+# 只提取不带属性的内联<style>/<script>，外部引用（如CDN）保持不变
+INLINE_PATTERN = re.compile(r'<(style|script)>(.*?)</\1>', re.S)
+ASSET_NAME_PATTERN = re.compile(r'^(style|script)\.[0-9a-f]{16}\.(css|js)$')
+
+CONTENT_TYPES = {
+    'css': 'text/css; charset=utf-8',
+    'js': 'application/javascript; charset=utf-8',
+    'html': 'text/html; charset=utf-8'
+}
+
+# 文件名带内容哈希，内容变化时URL随之变化，可以永久缓存
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def content_digest(data):
+    """内容哈希（用于文件名和ETag）"""
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+class StaticFile:
+    """内存中的资源：原始内容、gzip预压缩内容与ETag"""
+
+    def __init__(self, data, content_type, level):
+        self.data = data
+        self.content_type = content_type
+        self.etag = content_digest(data)
+        gz = gzip.compress(data, compresslevel=level, mtime=0)
+        # 压缩无收益时不提供gzip版本
+        self.gz = gz if len(gz) < len(data) else None
+
+
+def extract_inline_assets(html):
+    """提取内联样式/脚本，返回(改写后的html, [(文件名, 扩展名, 内容)])"""
+    assets = []
+
+    def replace(match):
+        tag, body = match.group(1), match.group(2)
+        ext = 'css' if tag == 'style' else 'js'
+        data = body.strip('\n').encode('utf-8') + b'\n'
+        name = f'{tag}.{content_digest(data)}.{ext}'
+        assets.append((name, ext, data))
+        if tag == 'style':
+            return f'<link rel="stylesheet" href="{ASSET_URL_PREFIX}{name}">'
+        return f'<script src="{ASSET_URL_PREFIX}{name}"></script>'
+
+    return INLINE_PATTERN.sub(replace, html), assets
+
+
+def _write_atomic(path, data):
+    """先写临时文件再替换，多进程同时构建时不会读到半个文件"""
+    tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class AssetPipeline:
+    """index.html构建结果；源文件修改后下次请求时自动重新构建"""
+
+    def __init__(self, source_path, output_dir, compress_level=9):
+        self.source_path = Path(source_path)
+        self.output_dir = Path(output_dir)
+        self.compress_level = compress_level
+        self.index = None
+        self.assets = {}
+        self._mtime_ns = None
+        self._lock = threading.Lock()
+
+    def build(self):
+        """提取并预压缩资源，写入输出目录（同时作为构建产物便于前置Web服务器直接提供）"""
+        stat = self.source_path.stat()
+        html = self.source_path.read_text(encoding='utf-8')
+        index_html, extracted = extract_inline_assets(html)
+
+        assets = {}
+        os.makedirs(self.output_dir, exist_ok=True)
+        for name, ext, data in extracted:
+            asset = StaticFile(data, CONTENT_TYPES[ext], self.compress_level)
+            assets[name] = asset
+            _write_atomic(self.output_dir / name, data)
+            if asset.gz is not None:
+                _write_atomic(self.output_dir / f'{name}.gz', asset.gz)
+
+        # 清理上一次构建留下的旧资源
+        for path in self.output_dir.iterdir():
+            base = path.name[:-3] if path.name.endswith('.gz') else path.name
+            if ASSET_NAME_PATTERN.match(base) and base not in assets:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+        self.index = StaticFile(index_html.encode('utf-8'), CONTENT_TYPES['html'], self.compress_level)
+        self.assets = assets
+        self._mtime_ns = stat.st_mtime_ns
+
+    def ensure_current(self):
+        """源文件变化（或尚未构建）时重新构建"""
+        try:
+            mtime_ns = self.source_path.stat().st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if self.index is not None and mtime_ns == self._mtime_ns:
+            return
+        with self._lock:
+            if self.index is None or mtime_ns != self._mtime_ns:
+                self.build()
+
+    def stats(self):
+        """构建结果统计"""
+        files = list(self.assets.values()) + ([self.index] if self.index else [])
+        return {
+            'assets': sorted(self.assets),
+            'bytes': sum(len(f.data) for f in files),
+            'gzip_bytes': sum(len(f.gz or f.data) for f in files)
+        }
+
+
+def file_response(static_file, cache_control):
+    """按If-None-Match与Accept-Encoding返回资源（304 / gzip / 原始内容）"""
+    use_gzip = static_file.gz is not None and bool(request.accept_encodings['gzip'])
+    # 不同编码是不同的表示，ETag带上编码后缀
+    etag = static_file.etag + ('-gzip' if use_gzip else '')
+    headers = {'Cache-Control': cache_control, 'ETag': f'"{etag}"'}
+    if static_file.gz is not None:
+        headers['Vary'] = 'Accept-Encoding'
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(static_file.gz, content_type=static_file.content_type, headers=headers)
+    return Response(static_file.data, content_type=static_file.content_type, headers=headers)
+
+
+def serve_index(pipeline):
+    """返回构建后的index.html，每次使用前重新验证"""
+    pipeline.ensure_current()
+    return file_response(pipeline.index, REVALIDATE_CACHE_CONTROL)
+
+
+def serve_asset(pipeline, name):
+    """返回带哈希的资源文件，长期缓存"""
+    pipeline.ensure_current()
+    asset = pipeline.assets.get(name)
+    if asset is None:
+        abort(404)
+    return file_response(asset, IMMUTABLE_CACHE_CONTROL)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容寻址的压缩存储 - 相同内容只保存一份（sha256 -> 压缩数据，带引用计数）
+"""
+
+import hashlib
+import lzma
+import zlib
+from collections import Counter
+
+# 超过该大小使用lzma（压缩率更高），否则使用zlib（速度更快）
+LZMA_THRESHOLD = 256 * 1024
+
+
+def content_hash(data):
+    """计算内容哈希"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _compress(data):
+    """压缩数据，返回(codec, payload)；压缩无收益时原样保存"""
+    if len(data) >= LZMA_THRESHOLD:
+        codec, payload = 'lzma', lzma.compress(data, preset=6)
+    else:
+        codec, payload = 'zlib', zlib.compress(data, 6)
+    if len(payload) >= len(data):
+        return 'raw', data
+    return codec, payload
+
+
+def _decompress(codec, payload):
+    """按编码方式解压"""
+    if codec == 'zlib':
+        return zlib.decompress(payload)
+    if codec == 'lzma':
+        return lzma.decompress(payload)
+    return bytes(payload)
+
+
+def prepare_blob(text):
+    """计算哈希并压缩内容（不访问数据库，可在工作进程中执行），返回(hash, codec, size, payload)"""
+    data = text.encode('utf-8')
+    codec, payload = _compress(data)
+    return content_hash(data), codec, len(data), payload
+
+
+def put_prepared_blob(conn, prepared):
+    """保存prepare_blob的结果并增加引用计数，返回内容哈希"""
+    digest, codec, size, payload = prepared
+    cursor = conn.execute('UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?', (digest,))
+    if cursor.rowcount == 0:
+        conn.execute('''
+            INSERT INTO blobs (hash, codec, size, stored_size, data, refcount)
+            VALUES (?, ?, ?, ?, ?, 1)
+        ''', (digest, codec, size, len(payload), payload))
+    return digest
+
+
+def put_blob(conn, text):
+    """保存文本内容并增加引用计数，返回内容哈希；None原样返回"""
+    if text is None:
+        return None
+    data = text.encode('utf-8')
+    digest = content_hash(data)
+    cursor = conn.execute('UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?', (digest,))
+    if cursor.rowcount == 0:
+        codec, payload = _compress(data)
+        conn.execute('''
+            INSERT INTO blobs (hash, codec, size, stored_size, data, refcount)
+            VALUES (?, ?, ?, ?, ?, 1)
+        ''', (digest, codec, len(data), len(payload), payload))
+    return digest
+
+
+def get_blob(conn, digest):
+    """按哈希读取文本内容，不存在时返回None"""
+    if digest is None:
+        return None
+    row = conn.execute('SELECT codec, data FROM blobs WHERE hash = ?', (digest,)).fetchone()
+    if not row:
+        return None
+    return _decompress(row[0], row[1]).decode('utf-8')
+
+
+def release_blobs(conn, digests):
+    """按出现次数减少引用计数（None忽略），计数归零的内容删除"""
+    counts = Counter(digest for digest in digests if digest is not None)
+    if not counts:
+        return
+    conn.executemany('UPDATE blobs SET refcount = refcount - ? WHERE hash = ?',
+                     [(count, digest) for digest, count in counts.items()])
+    conn.executemany('DELETE FROM blobs WHERE hash = ? AND refcount <= 0', [(digest,) for digest in counts])
+
+
+def release_blob(conn, digest):
+    """减少引用计数，计数归零时删除内容"""
+    release_blobs(conn, [digest])
+
+
+def blob_stats(conn):
+    """统计存储占用情况"""
+    row = conn.execute('''
+        SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0),
+               COALESCE(SUM(size * refcount), 0)
+        FROM blobs
+    ''').fetchone()
+    count, size, stored_size, logical_size = row
+    return {
+        'blobs': count,
+        'unique_bytes': size,
+        'stored_bytes': stored_size,
+        'logical_bytes': logical_size,
+        'saved_bytes': logical_size - stored_size
+    }
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API响应压缩与条件请求 - 按Accept-Encoding协商gzip/deflate，GET请求附带内容哈希ETag并支持304
+"""
+
+import gzip
+import hashlib
+import zlib
+
+from flask import Response, request
+
+# 可压缩的响应类型
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/javascript', 'text/')
+ENCODINGS = ('gzip', 'deflate')
+
+
+def _compressible(response):
+    """只处理普通（非流式）响应中的文本/JSON内容"""
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    mimetype = response.mimetype or ''
+    return any(mimetype.startswith(m) for m in COMPRESSIBLE_MIMETYPES)
+
+
+def _encode(body, encoding, level):
+    """按协商结果压缩响应体"""
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    return zlib.compress(body, level)
+
+
+def _negotiate(response, body, min_size):
+    """选择内容编码，不需要压缩时返回None"""
+    if len(body) < min_size or response.headers.get('Content-Encoding'):
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+def process_response(response, app):
+    """after_request钩子：为/api/下的响应协商压缩并处理ETag"""
+    if not request.path.startswith('/api/') or response.status_code != 200 or not _compressible(response):
+        return response
+
+    body = response.get_data()
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    encoding = _negotiate(response, body, min_size)
+    varies = len(body) >= min_size
+    if varies:
+        response.vary.add('Accept-Encoding')
+
+    if request.method in ('GET', 'HEAD') and 'ETag' not in response.headers:
+        # 不同编码是不同的表示，ETag带上编码后缀
+        etag = hashlib.sha256(body).hexdigest()[:32] + (f'-{encoding}' if encoding else '')
+        if request.if_none_match.contains(etag):
+            not_modified = Response(status=304)
+            not_modified.set_etag(etag)
+            not_modified.headers['Cache-Control'] = 'private, no-cache'
+            if varies:
+                not_modified.vary.add('Accept-Encoding')
+            return not_modified
+        response.set_etag(etag)
+        # 浏览器可以缓存，但每次使用前需要携带If-None-Match重新验证
+        response.headers.setdefault('Cache-Control', 'private, no-cache')
+
+    if encoding:
+        response.set_data(_encode(body, encoding, app.config['COMPRESS_LEVEL']))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """注册响应压缩钩子"""
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.after_request(lambda response: process_response(response, app))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库连接层 - SQLite连接池
+"""
+
+import sqlite3
+import threading
+from collections import deque
+from flask import g, current_app
+
+from metrics import TimedConnection
+
+# 连接级PRAGMA（每个新连接执行一次）
+CONNECTION_PRAGMAS = (
+    ('synchronous', 'NORMAL'),   # WAL模式下NORMAL已足够安全
+    ('cache_size', -16000),      # 负数表示KB，约16MB页缓存
+    ('busy_timeout', 5000),      # 写锁竞争时等待5秒而不是立即报错
+    ('temp_store', 'MEMORY'),
+)
+
+_pool_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """可复用的SQLite连接池（线程安全）"""
+
+    def __init__(self, database_path, max_idle=8):
+        self.database_path = str(database_path)
+        self.max_idle = max_idle
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._wal_checked = False
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def _connect(self):
+        """创建新连接并设置PRAGMA"""
+        # 连接会在不同线程间复用（同一时刻只被一个请求持有），因此关闭线程检查
+        # TimedConnection统计SQL耗时（/metrics中的sql阶段）
+        conn = sqlite3.connect(self.database_path, timeout=5, check_same_thread=False, factory=TimedConnection)
+        if not self._wal_checked:
+            # journal_mode=WAL 持久化在数据库文件中，只需设置一次
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._wal_checked = True
+        for name, value in CONNECTION_PRAGMAS:
+            conn.execute(f'PRAGMA {name}={value}')
+        return conn
+
+    def acquire(self):
+        """获取连接，优先复用空闲连接"""
+        with self._lock:
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            self.misses += 1
+        return self._connect()
+
+    def release(self, conn):
+        """归还连接，未提交的事务一律回滚"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        self._discard(conn)
+
+    def _discard(self, conn):
+        """关闭不再复用的连接"""
+        with self._lock:
+            self.discarded += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        """连接池命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+                'idle': len(self._idle),
+                'max_idle': self.max_idle,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+def get_pool(app=None):
+    """获取应用绑定的连接池"""
+    app = app or current_app
+    pool = app.extensions.get('db_pool')
+    if pool is not None and pool.database_path == str(app.config['DATABASE_PATH']):
+        return pool
+    with _pool_lock:
+        pool = app.extensions.get('db_pool')
+        if pool is None or pool.database_path != str(app.config['DATABASE_PATH']):
+            # 数据库路径变更（如测试时替换）后重建连接池
+            if pool is not None:
+                pool.close_all()
+            pool = ConnectionPool(app.config['DATABASE_PATH'], app.config.get('DB_POOL_MAX_IDLE', 8))
+            app.extensions['db_pool'] = pool
+        return pool
+
+
+def get_db():
+    """获取当前应用上下文的数据库连接（同一请求内复用）"""
+    if 'db_conn' not in g:
+        g.db_conn = get_pool().acquire()
+    return g.db_conn
+
+
+def release_db(exception=None):
+    """应用上下文销毁时归还连接"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+def init_app(app):
+    """注册连接池到Flask应用"""
+    app.teardown_appcontext(release_db)
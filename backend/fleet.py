@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全服重新生成 - 将整个游戏/项目的渲染与落盘分发到进程池并行执行
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from blobstore import prepare_blob, put_prepared_blob
+from generation import load_templates, server_output_dir, ServerManifest
+from metrics import collect_stages, record_stages
+from renderer import CompiledTemplate, TemplateCache
+
+DEFAULT_CHUNK_SIZE = 50
+
+# 进程池在多线程的Web/任务进程中创建，直接fork会继承其他线程持有的锁（日志队列、连接池、指标）而死锁；
+# 改由单线程的forkserver进程派生工作进程，forkserver预先导入工作进程用到的模块
+POOL_CONTEXT = multiprocessing.get_context('forkserver')
+POOL_CONTEXT.set_forkserver_preload(['fleet', 'templateimport'])
+
+# 工作进程内的全局状态，由_init_worker在进程启动时设置一次
+_worker_templates = None
+_worker_defaults = None
+_worker_base_folder = None
+_worker_cache = None
+
+
+def _init_worker(templates_by_game, defaults, base_folder):
+    """工作进程初始化：模板只随进程传输一次，而不是每个任务传一次"""
+    global _worker_templates, _worker_defaults, _worker_base_folder, _worker_cache
+    _worker_templates = templates_by_game
+    _worker_defaults = defaults
+    _worker_base_folder = base_folder
+    _worker_cache = TemplateCache(max_size=max(256, sum(len(t) for t in templates_by_game.values())))
+
+
+def _render_chunk(tasks):
+    """渲染一批区服的全部模板，只写入内容变化的文件，返回(生成记录, 错误列表, 文件计数, 阶段耗时)"""
+    # 工作进程中的阶段耗时随结果带回主进程记录
+    with collect_stages() as stage_totals:
+        records, errors, counts = _render_servers(tasks)
+    return records, errors, counts, stage_totals
+
+
+def _render_servers(tasks):
+    """渲染并落盘一批区服"""
+    records = []
+    errors = []
+    counts = {'written': 0, 'unchanged': 0, 'removed': 0}
+    for server, config_data in tasks:
+        server_dir = server_output_dir(_worker_base_folder, server['project_name'], server['game_name'],
+                                       server['name'], server['server_id'])
+        manifest = ServerManifest(server_dir)
+        templates = _worker_templates.get(server['game_id'], [])
+        for template in templates:
+            try:
+                compiled = _worker_cache.get(template['id'], template['template_content'])
+                data = config_data
+                if _worker_defaults is not None:
+                    data = dict(config_data)
+                    for key in compiled.variables:
+                        if key not in data:
+                            data[key] = _worker_defaults.get(key, '')
+                generated_content = compiled.render(data)
+                changed, _ = manifest.write(template['file_path'], generated_content,
+                                            template['id'], template['updated_at'])
+            except Exception as e:
+                errors.append({'server_id': server['id'], 'template_id': template['id'], 'error': str(e)})
+                continue
+            if changed:
+                # 哈希与压缩也在工作进程中完成，主进程只负责写库
+                records.append((server['id'], template['id'], template['file_path'], prepare_blob(generated_content)))
+        try:
+            manifest.remove_missing(t['file_path'] for t in templates)
+            manifest.save()
+        except OSError as e:
+            errors.append({'server_id': server['id'], 'error': f'更新清单失败: {str(e)}'})
+        for key, value in manifest.counts().items():
+            counts[key] += value
+    return records, errors, counts
+
+
+def load_scope_servers(conn, user_id, game_id=None, project_id=None, server_id=None):
+    """加载单个区服，或游戏/项目范围内的全部区服"""
+    if server_id is not None:
+        where, param = 's.id = ?', server_id
+    elif game_id is not None:
+        where, param = 'g.id = ?', game_id
+    else:
+        where, param = 'g.project_id = ?', project_id
+    rows = conn.execute(f'''
+        SELECT s.id, s.name, s.server_id, s.game_id, g.name, g.project_id, p.name
+        FROM servers s
+        JOIN games g ON s.game_id = g.id
+        JOIN projects p ON g.project_id = p.id
+        WHERE {where} AND s.user_id = ?
+        ORDER BY s.id
+    ''', (param, user_id)).fetchall()
+    return [{
+        'id': row[0],
+        'name': row[1],
+        'server_id': row[2],
+        'game_id': row[3],
+        'game_name': row[4],
+        'project_id': row[5],
+        'project_name': row[6]
+    } for row in rows]
+
+
+def regenerate_fleet(conn, user_id, base_folder, game_id=None, project_id=None, server_id=None,
+                     config_data=None, server_config_data=None, default_value=None,
+                     max_workers=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    重新生成单个区服或游戏/项目下所有区服的全部模板
+    default_value: 为未赋值变量提供默认值的函数（可选）
+    progress: 每完成一批区服时回调 progress(done_servers, total_servers)
+    返回汇总结果字典
+    """
+    started = time.time()
+    config_data = config_data or {}
+    server_config_data = server_config_data or {}
+
+    servers = load_scope_servers(conn, user_id, game_id=game_id, project_id=project_id, server_id=server_id)
+    game_ids = sorted({s['game_id'] for s in servers})
+    templates = load_templates(conn, user_id, game_ids=game_ids) if game_ids else []
+
+    templates_by_game = {}
+    for template in templates:
+        templates_by_game.setdefault(template['game_id'], []).append(template)
+
+    defaults = None
+    if default_value is not None:
+        # 默认值在主进程中预先计算，避免工作进程依赖Flask应用
+        keys = {key for t in templates for key in CompiledTemplate(t['template_content']).variables}
+        defaults = {key: default_value(key) for key in keys}
+
+    tasks = []
+    for server in servers:
+        data_for_server = dict(config_data)
+        data_for_server.update(server_config_data.get(str(server['id']), {}))
+        tasks.append((server, data_for_server))
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(chunks) or 1))
+    records = []
+    errors = []
+    file_counts = {'written': 0, 'unchanged': 0, 'removed': 0}
+    done = 0
+    if chunks:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT, initializer=_init_worker,
+                                 initargs=(templates_by_game, defaults, str(base_folder))) as executor:
+            futures = {executor.submit(_render_chunk, chunk): len(chunk) for chunk in chunks}
+            for future in as_completed(futures):
+                chunk_records, chunk_errors, chunk_counts, stage_totals = future.result()
+                record_stages(stage_totals)
+                records.extend(chunk_records)
+                errors.extend(chunk_errors)
+                for key, value in chunk_counts.items():
+                    file_counts[key] += value
+                done += futures[future]
+                if progress:
+                    progress(done, len(servers))
+
+    # 全部生成记录一次事务写入
+    template_blobs = {t['id']: prepare_blob(t['template_content']) for t in templates}
+    conn.executemany('''
+        INSERT INTO config_files (server_id, file_name, file_path, template_hash, generated_hash)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [
+        (server_id, Path(file_path).name, file_path,
+         put_prepared_blob(conn, template_blobs[template_id]), put_prepared_blob(conn, generated))
+        for server_id, template_id, file_path, generated in records
+    ])
+    conn.commit()
+
+    return {
+        'servers': len(servers),
+        'templates': len(templates),
+        'files': file_counts,
+        'errors': errors,
+        'workers': workers,
+        'chunks': len(chunks),
+        'elapsed': round(time.time() - started, 3)
+    }
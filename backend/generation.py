@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配置生成核心 - 批量加载区服/模板、渲染、落盘与生成记录
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+
+from blobstore import put_blob, release_blobs
+from metrics import stage
+from renderer import render_template, template_cache
+
+# SQLite单条语句的参数个数上限较低，IN查询分批执行
+IN_CHUNK_SIZE = 500
+
+# 区服生成目录下的清单文件：相对路径 -> 内容哈希/大小/模板版本
+MANIFEST_NAME = '.manifest.json'
+# 清单的进程间锁文件（与清单的临时文件一样以MANIFEST_NAME开头，打包时一并排除）
+MANIFEST_LOCK_NAME = MANIFEST_NAME + '.lock'
+
+# 各区服目录的进程内清单锁，不再使用的锁随引用释放
+_manifest_locks = weakref.WeakValueDictionary()
+_manifest_locks_guard = threading.Lock()
+
+
+def safe_name(name):
+    """目录名中的空格和斜杠替换为下划线"""
+    return name.replace(' ', '_').replace('/', '_')
+
+
+def chunked(items, size=IN_CHUNK_SIZE):
+    """按固定大小切分列表"""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def server_output_dir(base_folder, project_name, game_name, server_name, server_sid):
+    """区服生成目录：{base}/{项目}/{游戏}/{区服名或ID}"""
+    return Path(base_folder) / safe_name(project_name) / safe_name(game_name) / (server_name or server_sid)
+
+
+def load_servers(conn, user_id, server_ids):
+    """按ID批量加载区服及其所属游戏、项目信息，返回 {id: dict}"""
+    servers = {}
+    for chunk in chunked(server_ids):
+        placeholders = ', '.join('?' * len(chunk))
+        rows = conn.execute(f'''
+            SELECT s.id, s.name, s.server_id, s.game_id, g.name, g.project_id, p.name
+            FROM servers s
+            JOIN games g ON s.game_id = g.id
+            JOIN projects p ON g.project_id = p.id
+            WHERE s.id IN ({placeholders}) AND s.user_id = ?
+        ''', (*chunk, user_id)).fetchall()
+        for row in rows:
+            servers[row[0]] = {
+                'id': row[0],
+                'name': row[1],
+                'server_id': row[2],
+                'game_id': row[3],
+                'game_name': row[4],
+                'project_id': row[5],
+                'project_name': row[6]
+            }
+    return servers
+
+
+def load_templates(conn, user_id, template_ids=None, game_ids=None):
+    """按模板ID或游戏ID批量加载模板，返回列表"""
+    if template_ids is not None:
+        column, keys = 'id', template_ids
+    else:
+        column, keys = 'game_id', game_ids
+    templates = []
+    for chunk in chunked(keys):
+        placeholders = ', '.join('?' * len(chunk))
+        rows = conn.execute(f'''
+            SELECT id, game_id, name, file_path, template_content, updated_at
+            FROM config_templates
+            WHERE {column} IN ({placeholders}) AND user_id = ?
+            ORDER BY id
+        ''', (*chunk, user_id)).fetchall()
+        for row in rows:
+            templates.append({
+                'id': row[0],
+                'game_id': row[1],
+                'name': row[2],
+                'file_path': row[3],
+                'template_content': row[4] or '',
+                'updated_at': row[5]
+            })
+    return templates
+
+
+def render_for_server(template, config_data, default_value=None):
+    """渲染单个模板（使用编译缓存）；提供default_value时为未赋值的变量填充默认值"""
+    if default_value is not None:
+        compiled = template_cache.get(template['id'], template['template_content'])
+        config_data = dict(config_data)
+        for key in compiled.variables:
+            if key not in config_data:
+                config_data[key] = default_value(key)
+    return render_template(template['template_content'], config_data, template['id'])
+
+
+def write_generated_file(server_dir, file_path, content):
+    """将生成内容写入区服目录，保留模板的相对路径，返回输出文件路径"""
+    rel_path = Path(file_path)
+    output_dir = Path(server_dir) / rel_path.parent
+    os.makedirs(output_dir, exist_ok=True)
+    output_file_path = output_dir / rel_path.name
+    with stage('file_write'), open(output_file_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return output_file_path
+
+
+def record_generated(conn, records):
+    """批量写入生成记录，records为(server_id, file_path, template_content, generated_content)"""
+    conn.executemany('''
+        INSERT INTO config_files (server_id, file_name, file_path, template_hash, generated_hash)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [
+        (server_id, Path(file_path).name, file_path,
+         put_blob(conn, template_content), put_blob(conn, generated_content))
+        for server_id, file_path, template_content, generated_content in records
+    ])
+
+
+def _manifest_thread_lock(path):
+    """同一清单路径在本进程内共用一把锁"""
+    with _manifest_locks_guard:
+        lock = _manifest_locks.get(path)
+        if lock is None:
+            lock = _manifest_locks[path] = threading.Lock()
+        return lock
+
+
+def delete_generated_records(conn, server_ids):
+    """删除区服的生成记录并释放引用的内容，返回删除的记录数"""
+    deleted = 0
+    digests = []
+    for chunk in chunked(server_ids):
+        placeholders = ', '.join('?' * len(chunk))
+        rows = conn.execute(f'''
+            SELECT template_hash, generated_hash FROM config_files WHERE server_id IN ({placeholders})
+        ''', chunk).fetchall()
+        digests.extend(digest for row in rows for digest in row)
+        deleted += conn.execute(f'DELETE FROM config_files WHERE server_id IN ({placeholders})', chunk).rowcount
+    release_blobs(conn, digests)
+    return deleted
+
+
+class ServerManifest:
+    """区服生成目录的清单，用于跳过内容未变化的文件"""
+
+    def __init__(self, server_dir):
+        self.server_dir = Path(server_dir)
+        self.path = self.server_dir / MANIFEST_NAME
+        self.entries = self._load()
+        # 本次的变更，保存时合并到磁盘上的最新清单
+        self._updated = {}
+        self._deleted = set()
+        self.written = 0
+        self.unchanged = 0
+        self.removed = 0
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('files', {})
+        except (OSError, ValueError):
+            # 清单不存在或损坏时视为全部需要重新写入
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        """清单读取-合并-替换期间互斥：进程内线程锁加进程间文件锁"""
+        with _manifest_thread_lock(str(self.path)):
+            with open(self.server_dir / MANIFEST_LOCK_NAME, 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _is_current(self, file_path, digest):
+        """清单记录与磁盘文件都与新内容一致时返回True"""
+        entry = self.entries.get(file_path)
+        if not entry or entry.get('hash') != digest:
+            return False
+        try:
+            stat = (self.server_dir / file_path).stat()
+        except OSError:
+            return False
+        return stat.st_size == entry.get('size') and stat.st_mtime_ns == entry.get('mtime_ns')
+
+    def write(self, file_path, content, template_id=None, template_version=None):
+        """内容变化时写文件并更新清单，返回(是否写入, 输出文件路径)"""
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        output_file_path = self.server_dir / file_path
+        if self._is_current(file_path, digest):
+            self.unchanged += 1
+            return False, output_file_path
+
+        output_file_path = write_generated_file(self.server_dir, file_path, content)
+        stat = output_file_path.stat()
+        self.entries[file_path] = self._updated[file_path] = {
+            'hash': digest,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'template_id': template_id,
+            'template_version': template_version
+        }
+        self._deleted.discard(file_path)
+        self.written += 1
+        return True, output_file_path
+
+    def remove_missing(self, keep_paths):
+        """删除清单中本次未生成的文件（对应模板已删除或改名）"""
+        keep_paths = set(keep_paths)
+        for file_path in [p for p in self.entries if p not in keep_paths]:
+            try:
+                os.remove(self.server_dir / file_path)
+            except FileNotFoundError:
+                pass
+            del self.entries[file_path]
+            self._updated.pop(file_path, None)
+            self._deleted.add(file_path)
+            self.removed += 1
+
+    def save(self):
+        """加锁重新读取清单，合并本次变更后原子替换（同一区服并发生成时不丢失其他请求的记录）"""
+        os.makedirs(self.server_dir, exist_ok=True)
+        with stage('file_write'), self._locked():
+            entries = self._load()
+            entries.update(self._updated)
+            for file_path in self._deleted:
+                entries.pop(file_path, None)
+            fd, tmp_path = tempfile.mkstemp(dir=self.server_dir, prefix=MANIFEST_NAME + '.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'files': entries}, f, ensure_ascii=False, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        self.entries = entries
+        self._updated = {}
+        self._deleted = set()
+
+    def counts(self):
+        """本次写入/未变化/删除的文件数"""
+        return {'written': self.written, 'unchanged': self.unchanged, 'removed': self.removed}
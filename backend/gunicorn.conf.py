@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+gunicorn生产环境配置 - 预派生多工作进程，参数均可通过环境变量覆盖
+
+启动: cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+平滑重载: kill -HUP <主进程PID>（重新加载代码与配置，旧进程处理完当前请求后退出）
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+bind = os.environ.get('WEB_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+
+# 工作进程数与每个进程的线程数（SQLite写入串行，进程数不宜过多）
+workers = int(os.environ.get('WEB_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+
+# 每个工作进程处理N个请求后回收（加随机抖动避免同时重启），防止内存缓慢增长
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 100))
+
+# 批量生成/打包可能较慢，超时时间放宽；重载或回收时等待当前请求完成的时间
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+# 不预加载应用，HUP重载时工作进程会加载新代码
+preload_app = False
+chdir = BACKEND_DIR
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+errorlog = os.environ.get('WEB_ERROR_LOG', '-')
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+pidfile = os.environ.get('WEB_PID_FILE') or None
+
+# 各工作进程的指标快照目录，/metrics合并所有进程的数据（工作进程继承该环境变量）
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'conf_manage_metrics'))
+
+
+def on_starting(server):
+    """主进程启动时初始化数据库（建表、迁移、恢复中断任务），只执行一次，在派生工作进程之前完成"""
+    # 在子进程中执行，主进程不导入应用代码，HUP重载才能生效
+    subprocess.run(
+        [sys.executable, '-c', 'from app import init_database; init_database()'],
+        cwd=BACKEND_DIR, check=True
+    )
+    # 指标从本次启动开始统计
+    from metrics import clear_snapshots
+    clear_snapshots(os.environ['METRICS_DIR'])
+
+
+def worker_exit(server, worker):
+    """
+    工作进程退出（回收/重载/停止）前等待运行中的后台任务完成，未开始的任务留给其他进程；
+    超过graceful_timeout被强制结束时，任务的心跳停止，租约超时后由其他进程重新执行
+    """
+    from jobs import job_queue
+    job_queue.shutdown(wait=True)
+    from metrics import shutdown as save_metrics
+    save_metrics()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+层级树 - 一次性查询 项目 -> 游戏 -> 区服 -> 模板摘要，替代前端逐个请求
+"""
+
+# 层级深度：1=项目 2=游戏 3=区服 4=模板
+TREE_LEVELS = ('projects', 'games', 'servers', 'templates')
+MAX_TREE_DEPTH = len(TREE_LEVELS)
+
+
+class TreeQueryError(ValueError):
+    """树查询参数错误"""
+
+
+def parse_depth(value):
+    """解析depth参数：数字1-4或层级名，默认返回完整深度"""
+    if value is None or value == '':
+        return MAX_TREE_DEPTH
+    if value in TREE_LEVELS:
+        return TREE_LEVELS.index(value) + 1
+    try:
+        depth = int(value)
+    except ValueError:
+        raise TreeQueryError(f'depth参数无效: {value}')
+    if not 1 <= depth <= MAX_TREE_DEPTH:
+        raise TreeQueryError(f'depth取值范围为1-{MAX_TREE_DEPTH}')
+    return depth
+
+
+def build_tree(conn, user_id, project_id=None, game_id=None, depth=MAX_TREE_DEPTH):
+    """
+    按层级各执行一次查询并在内存中组装树
+    project_id/game_id: 只返回指定项目或游戏所在的分支
+    返回项目列表，每个节点的子节点放在games/servers/templates中
+    """
+    where = ['p.user_id = ?']
+    params = [user_id]
+    if project_id is not None:
+        where.append('p.id = ?')
+        params.append(project_id)
+    if game_id is not None:
+        where.append('p.id = (SELECT project_id FROM games WHERE id = ? AND user_id = ?)')
+        params.extend([game_id, user_id])
+    where_sql = ' AND '.join(where)
+
+    projects = {}
+    for row in conn.execute(f'''
+        SELECT p.id, p.name, p.description, p.created_at, p.updated_at
+        FROM projects p
+        WHERE {where_sql}
+        ORDER BY p.updated_at DESC, p.id DESC
+    ''', params).fetchall():
+        project = {
+            'id': row[0],
+            'name': row[1],
+            'description': row[2],
+            'created_at': row[3],
+            'updated_at': row[4]
+        }
+        if depth > 1:
+            project['games'] = []
+        projects[row[0]] = project
+    if depth <= 1 or not projects:
+        return list(projects.values())
+
+    game_where = where_sql
+    game_params = list(params)
+    if game_id is not None:
+        game_where += ' AND g.id = ?'
+        game_params.append(game_id)
+
+    games = {}
+    for row in conn.execute(f'''
+        SELECT g.id, g.project_id, g.name, g.description, g.created_at, g.updated_at
+        FROM games g
+        JOIN projects p ON g.project_id = p.id
+        WHERE {game_where} AND g.user_id = ?
+        ORDER BY g.created_at DESC, g.id DESC
+    ''', (*game_params, user_id)).fetchall():
+        game = {
+            'id': row[0],
+            'project_id': row[1],
+            'name': row[2],
+            'description': row[3],
+            'created_at': row[4],
+            'updated_at': row[5]
+        }
+        if depth > 2:
+            game['servers'] = []
+        if depth > 3:
+            game['templates'] = []
+        games[row[0]] = game
+        projects[row[1]]['games'].append(game)
+    if depth <= 2 or not games:
+        return list(projects.values())
+
+    for row in conn.execute(f'''
+        SELECT s.id, s.game_id, s.name, s.server_id, s.description, s.created_at, s.updated_at
+        FROM servers s
+        JOIN games g ON s.game_id = g.id
+        JOIN projects p ON g.project_id = p.id
+        WHERE {game_where} AND g.user_id = ? AND s.user_id = ?
+        ORDER BY s.created_at DESC, s.id DESC
+    ''', (*game_params, user_id, user_id)).fetchall():
+        games[row[1]]['servers'].append({
+            'id': row[0],
+            'game_id': row[1],
+            'name': row[2],
+            'server_id': row[3],
+            'description': row[4],
+            'created_at': row[5],
+            'updated_at': row[6]
+        })
+    if depth <= 3:
+        return list(projects.values())
+
+    # 模板只返回摘要，不包含模板内容与配置项
+    for row in conn.execute(f'''
+        SELECT t.id, t.game_id, t.name, t.file_path, t.updated_at
+        FROM config_templates t
+        JOIN games g ON t.game_id = g.id
+        JOIN projects p ON g.project_id = p.id
+        WHERE {game_where} AND g.user_id = ? AND t.user_id = ?
+        ORDER BY t.created_at DESC, t.id DESC
+    ''', (*game_params, user_id, user_id)).fetchall():
+        games[row[1]]['templates'].append({
+            'id': row[0],
+            'game_id': row[1],
+            'name': row[2],
+            'file_path': row[3],
+            'updated_at': row[4]
+        })
+    return list(projects.values())
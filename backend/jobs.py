@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台生成任务 - 任务持久化在jobs表中，由有界线程池执行，支持进度查询
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+JOB_SCOPES = ('server', 'game', 'project')
+
+# 单个任务最多保存的错误条数，避免错误列表撑大数据库
+MAX_JOB_ERRORS = 1000
+
+# 多进程部署时各进程定期检查排队中的任务（秒）
+JOB_POLL_INTERVAL = 30
+
+# 运行中的任务每隔HEARTBEAT_INTERVAL秒刷新心跳；超过租约时间没有心跳视为执行进程已被结束
+JOB_HEARTBEAT_INTERVAL = 15
+JOB_LEASE_TIMEOUT = 90
+
+# 任务被中断（租约超时）达到该次数后不再重试，标记为失败
+MAX_JOB_ATTEMPTS = 3
+
+
+def _row_to_job(row):
+    """jobs表记录转为字典"""
+    return {
+        'id': row[0],
+        'user_id': row[1],
+        'scope': row[2],
+        'scope_id': row[3],
+        'params': json.loads(row[4]) if row[4] else {},
+        'state': row[5],
+        'total': row[6],
+        'done': row[7],
+        'errors': json.loads(row[8]) if row[8] else [],
+        'result': json.loads(row[9]) if row[9] else None,
+        'created_at': row[10],
+        'started_at': row[11],
+        'finished_at': row[12],
+        'attempts': row[13]
+    }
+
+
+JOB_COLUMNS = '''
+    id, user_id, scope, scope_id, params, state, total, done, errors, result,
+    created_at, started_at, finished_at, attempts
+'''
+
+
+def get_job(conn, job_id, user_id=None):
+    """查询任务，指定user_id时只返回该用户的任务"""
+    sql = f'SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?'
+    params = [job_id]
+    if user_id is not None:
+        sql += ' AND user_id = ?'
+        params.append(user_id)
+    row = conn.execute(sql, params).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def list_jobs(conn, user_id, limit=50):
+    """查询用户最近的任务"""
+    rows = conn.execute(f'''
+        SELECT {JOB_COLUMNS} FROM jobs WHERE user_id = ?
+        ORDER BY created_at DESC, id DESC LIMIT ?
+    ''', (user_id, limit)).fetchall()
+    return [_row_to_job(row) for row in rows]
+
+
+def recover_interrupted_jobs(conn):
+    """服务启动时（派生工作进程之前执行一次）将上次中断的运行中任务重新排队，返回任务数"""
+    cursor = conn.execute("""
+        UPDATE jobs SET state = 'queued', done = 0, lease_owner = NULL, heartbeat_at = NULL WHERE state = 'running'
+    """)
+    conn.commit()
+    return cursor.rowcount
+
+
+def expire_job_leases(conn, lease_timeout=JOB_LEASE_TIMEOUT, max_attempts=MAX_JOB_ATTEMPTS):
+    """
+    心跳超时的运行中任务（执行进程在重载/回收时被强制结束）重新排队，
+    已中断max_attempts次的标记为失败；返回(重新排队数, 失败数)
+    """
+    expired = "state = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < datetime('now', ?))"
+    cutoff = f'-{int(lease_timeout)} seconds'
+    failed = conn.execute(f"""
+        UPDATE jobs SET state = 'failed', errors = ?, lease_owner = NULL, finished_at = CURRENT_TIMESTAMP
+        WHERE {expired} AND attempts >= ?
+    """, (json.dumps([{'error': f'任务执行中断{max_attempts}次，不再重试'}], ensure_ascii=False),
+          cutoff, max_attempts)).rowcount
+    requeued = conn.execute(f"""
+        UPDATE jobs SET state = 'queued', done = 0, lease_owner = NULL, heartbeat_at = NULL
+        WHERE {expired}
+    """, (cutoff,)).rowcount
+    conn.commit()
+    return requeued, failed
+
+
+class JobQueue:
+    """生成任务队列：提交时写库，线程池异步执行"""
+
+    def __init__(self, max_workers=2, poll_interval=JOB_POLL_INTERVAL, heartbeat_interval=JOB_HEARTBEAT_INTERVAL,
+                 lease_timeout=JOB_LEASE_TIMEOUT):
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_timeout = lease_timeout
+        self._executor = None
+        self._app = None
+        self._runner = None
+        self._last_poll = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, runner):
+        """绑定应用与执行函数 runner(conn, job, progress) -> 结果字典"""
+        self._app = app
+        self._runner = runner
+        self.max_workers = app.config.get('JOB_WORKERS', self.max_workers)
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', self.poll_interval)
+        self.lease_timeout = app.config.get('JOB_LEASE_TIMEOUT', self.lease_timeout)
+        self.heartbeat_interval = min(self.heartbeat_interval, max(1, self.lease_timeout // 3))
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            return self._executor
+
+    def _enqueue(self, job_id):
+        """提交到本进程线程池（已在本进程排队的任务不重复提交）"""
+        with self._lock:
+            if job_id in self._pending:
+                return
+            self._pending.add(job_id)
+        self._get_executor().submit(self._run, job_id)
+
+    def poll(self):
+        """
+        定期接手排队中的任务：包括其他进程提交后未来得及执行（如进程回收）的任务，
+        以及执行进程被强制结束、租约已超时的运行中任务；
+        多个进程同时接手同一任务时由_run中的状态更新保证只执行一次
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._last_poll is not None and now - self._last_poll < self.poll_interval:
+                return
+            self._last_poll = now
+        pool = get_pool(self._app)
+        conn = pool.acquire()
+        try:
+            requeued, failed = expire_job_leases(conn, self.lease_timeout)
+            if requeued or failed:
+                logger.warning("后台任务租约超时: 重新排队%d个, 标记失败%d个", requeued, failed)
+            job_ids = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE state = 'queued' ORDER BY id"
+            ).fetchall()]
+        except sqlite3.OperationalError as e:
+            # 数据库尚未执行迁移（没有jobs表）时不影响其他接口
+            logger.warning("检查后台任务失败: %s", e)
+            return
+        finally:
+            pool.release(conn)
+        for job_id in job_ids:
+            self._enqueue(job_id)
+
+    def shutdown(self, wait=True):
+        """进程退出前调用：取消未开始的任务（保持排队状态由其他进程接手），等待运行中的任务结束"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(self, conn, user_id, scope, scope_id, params):
+        """创建任务并排队执行，返回任务ID"""
+        cursor = conn.execute('''
+            INSERT INTO jobs (user_id, scope, scope_id, params) VALUES (?, ?, ?, ?)
+        ''', (user_id, scope, scope_id, json.dumps(params)))
+        job_id = cursor.lastrowid
+        conn.commit()
+        self._enqueue(job_id)
+        return job_id
+
+    def _heartbeat(self, job_id, lease, stop):
+        """任务运行期间定期刷新心跳（使用独立连接，不受任务自身事务影响）"""
+        pool = get_pool(self._app)
+        while not stop.wait(self.heartbeat_interval):
+            conn = pool.acquire()
+            try:
+                conn.execute('''
+                    UPDATE jobs SET heartbeat_at = CURRENT_TIMESTAMP WHERE id = ? AND lease_owner = ?
+                ''', (job_id, lease))
+                conn.commit()
+            except sqlite3.Error as e:
+                # 偶尔写锁竞争失败不影响任务，租约时间内还会重试
+                logger.warning("刷新任务心跳失败: job_id=%s: %s", job_id, e)
+                conn.rollback()
+            finally:
+                pool.release(conn)
+
+    def _run(self, job_id):
+        """在工作线程中执行任务"""
+        pool = get_pool(self._app)
+        conn = pool.acquire()
+        stop = threading.Event()
+        try:
+            # 只有把状态从queued改为running成功的进程才执行，避免多进程重复执行；
+            # 租约标识保证租约超时被其他进程接手后，本进程不会再覆盖任务状态
+            lease = f'{os.getpid()}-{uuid.uuid4().hex}'
+            cursor = conn.execute('''
+                UPDATE jobs SET state = 'running', started_at = CURRENT_TIMESTAMP, lease_owner = ?,
+                    heartbeat_at = CURRENT_TIMESTAMP, attempts = attempts + 1
+                WHERE id = ? AND state = 'queued'
+            ''', (lease, job_id))
+            conn.commit()
+            if cursor.rowcount == 0:
+                return
+            job = get_job(conn, job_id)
+            threading.Thread(target=self._heartbeat, args=(job_id, lease, stop),
+                             name=f'job-heartbeat-{job_id}', daemon=True).start()
+
+            def progress(done, total):
+                conn.execute('''
+                    UPDATE jobs SET done = ?, total = ?, heartbeat_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND lease_owner = ?
+                ''', (done, total, job_id, lease))
+                conn.commit()
+
+            started = time.time()
+            try:
+                with self._app.app_context():
+                    result = self._runner(conn, job, progress)
+            except Exception as e:
+                logger.exception("后台任务执行失败: job_id=%s", job_id)
+                conn.rollback()
+                conn.execute('''
+                    UPDATE jobs SET state = 'failed', errors = ?, lease_owner = NULL, finished_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND lease_owner = ?
+                ''', (json.dumps([{'error': str(e)}], ensure_ascii=False), job_id, lease))
+                conn.commit()
+                return
+
+            errors = result.pop('errors', [])
+            result['elapsed'] = round(time.time() - started, 3)
+            conn.execute('''
+                UPDATE jobs SET state = ?, errors = ?, result = ?, lease_owner = NULL, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND lease_owner = ?
+            ''', ('succeeded', json.dumps(errors[:MAX_JOB_ERRORS], ensure_ascii=False),
+                  json.dumps(result, ensure_ascii=False), job_id, lease))
+            conn.commit()
+        finally:
+            stop.set()
+            pool.release(conn)
+            with self._lock:
+                self._pending.discard(job_id)
+
+
+job_queue = JobQueue()
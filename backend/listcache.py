@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列表接口缓存 - 按(用户, 接口, 参数)缓存查询结果，写操作递增对应数据的代数使缓存失效
+"""
+
+import threading
+from collections import OrderedDict
+
+from metrics import LIST_CACHE_EVICTIONS, LIST_CACHE_HITS, LIST_CACHE_MISSES
+
+CACHE_SCOPES = ('projects', 'games', 'servers', 'templates')
+
+# user_id为0的代数对所有用户生效（如清空全部数据）
+GLOBAL_USER_ID = 0
+
+
+def bump_generation(conn, user_id, *scopes):
+    """递增代数（在调用方的事务中执行，随写操作一起提交）"""
+    for scope in scopes:
+        conn.execute('''
+            INSERT INTO cache_generations (user_id, scope, generation) VALUES (?, ?, 1)
+            ON CONFLICT (user_id, scope) DO UPDATE SET generation = generation + 1
+        ''', (user_id, scope))
+
+
+def bump_all(conn):
+    """所有用户的全部缓存失效"""
+    bump_generation(conn, GLOBAL_USER_ID, *CACHE_SCOPES)
+
+
+def load_generations(conn, user_id):
+    """读取用户各类数据的当前代数（已叠加全局代数）"""
+    generations = dict.fromkeys(CACHE_SCOPES, 0)
+    for _, scope, generation in conn.execute(
+        'SELECT user_id, scope, generation FROM cache_generations WHERE user_id IN (?, ?)',
+        (GLOBAL_USER_ID, user_id)
+    ).fetchall():
+        generations[scope] = generations.get(scope, 0) + generation
+    return generations
+
+
+class ListCache:
+    """LRU缓存，键中包含依赖数据的代数，数据修改后旧条目不再命中并逐步被淘汰"""
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, conn, user_id, endpoint, params, scopes, compute):
+        """命中时返回缓存结果，否则调用compute()计算并缓存"""
+        generations = load_generations(conn, user_id)
+        key = (user_id, endpoint, params, tuple(generations[s] for s in scopes))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                LIST_CACHE_HITS.inc()
+                return self._entries[key]
+            self.misses += 1
+        LIST_CACHE_MISSES.inc()
+
+        value = compute()
+        if self.max_size <= 0:
+            return value
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                LIST_CACHE_EVICTIONS.inc()
+        return value
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """缓存统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+list_cache = ListCache()
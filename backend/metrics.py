@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标 - 进程内计数器与延迟直方图（线程安全），以Prometheus文本格式输出
+按路由统计请求数与耗时，按阶段（SQL、渲染、写文件、打包）统计每个请求内的累计耗时
+"""
+
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import request
+
+# 延迟直方图的桶上限（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 多进程部署时各进程把指标快照写入共享目录的最小间隔（秒）
+SNAPSHOT_INTERVAL = 1.0
+
+
+class Counter:
+    """按标签值分组的计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: value for labels, value in self._values.items()}
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def render(self, values):
+        lines = []
+        for labels, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """按标签值分组的直方图，保存各桶计数、总和与次数"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # 各桶计数（不累计，最后一格为+Inf）、总和、次数
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: [list(s[0]), s[1], s[2]] for labels, s in self._values.items()}
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return [list(value[0]), value[1], value[2]]
+        return [[a + b for a, b in zip(total[0], value[0])], total[1] + value[1], total[2] + value[2]]
+
+    def render(self, values):
+        lines = []
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames + ('le',), labels + (le,))
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, escaped)) + '}'
+
+
+REQUESTS_TOTAL = Counter(
+    'conf_manage_http_requests_total', 'HTTP请求数', ('method', 'route', 'status'))
+REQUEST_DURATION = Histogram(
+    'conf_manage_http_request_duration_seconds', 'HTTP请求处理耗时（不含流式响应体输出）', ('method', 'route'))
+STAGE_DURATION = Histogram(
+    'conf_manage_stage_duration_seconds', '各阶段耗时（请求内同一阶段累计后记录一次）', ('stage',))
+
+LIST_CACHE_HITS = Counter('conf_manage_list_cache_hits_total', '列表接口缓存命中次数')
+LIST_CACHE_MISSES = Counter('conf_manage_list_cache_misses_total', '列表接口缓存未命中次数')
+LIST_CACHE_EVICTIONS = Counter('conf_manage_list_cache_evictions_total', '列表接口缓存因容量淘汰的条目数')
+
+REGISTRY = (REQUESTS_TOTAL, REQUEST_DURATION, STAGE_DURATION,
+            LIST_CACHE_HITS, LIST_CACHE_MISSES, LIST_CACHE_EVICTIONS)
+
+_local = threading.local()
+
+
+def add_stage_time(stage_name, seconds):
+    """记录阶段耗时：请求（或collect_stages）内累加，否则直接记录"""
+    totals = getattr(_local, 'totals', None)
+    if totals is None:
+        STAGE_DURATION.observe(seconds, stage_name)
+    else:
+        totals[stage_name] = totals.get(stage_name, 0.0) + seconds
+
+
+@contextmanager
+def stage(stage_name):
+    """计时代码块并计入指定阶段"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage_time(stage_name, time.perf_counter() - started)
+
+
+@contextmanager
+def collect_stages():
+    """收集代码块内各阶段的累计耗时（不直接记录），用于工作进程把耗时带回主进程"""
+    parent = getattr(_local, 'totals', None)
+    totals = _local.totals = {}
+    try:
+        yield totals
+    finally:
+        _local.totals = parent
+
+
+def record_stages(totals):
+    """记录collect_stages收集的耗时"""
+    for stage_name, seconds in totals.items():
+        add_stage_time(stage_name, seconds)
+
+
+def timed_iter(iterable, stage_name):
+    """只统计迭代器自身产出数据的耗时（不含调用方消费数据的时间），迭代结束时记录一次"""
+    elapsed = 0.0
+    iterator = iter(iterable)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - started
+                return
+            elapsed += time.perf_counter() - started
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close:
+            close()
+        STAGE_DURATION.observe(elapsed, stage_name)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """统计SQL执行与取结果耗时的游标"""
+
+    def execute(self, *args):
+        with stage('sql'):
+            return super().execute(*args)
+
+    def executemany(self, *args):
+        with stage('sql'):
+            return super().executemany(*args)
+
+    def fetchone(self):
+        with stage('sql'):
+            return super().fetchone()
+
+    def fetchmany(self, *args):
+        with stage('sql'):
+            return super().fetchmany(*args)
+
+    def fetchall(self):
+        with stage('sql'):
+            return super().fetchall()
+
+
+class TimedConnection(sqlite3.Connection):
+    """所有游标（包括conn.execute的隐式游标）都使用TimedCursor"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+
+class SnapshotStore:
+    """
+    多进程部署时的指标汇总：各进程定期写入{pid}.json，抓取时合并全部进程的数据
+    进程退出时把自己的数据并入archived.json，回收过的进程的计数不会丢失
+    """
+
+    ARCHIVE_NAME = 'archived.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _own_path(self):
+        return os.path.join(self.directory, f'{os.getpid()}.json')
+
+    @contextmanager
+    def _dir_lock(self, mode):
+        """进程间文件锁：合并读取用共享锁，归档用排他锁"""
+        with open(os.path.join(self.directory, '.lock'), 'a') as f:
+            fcntl.flock(f, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _dump(path, merged):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({name: [[list(labels), value] for labels, value in values.items()]
+                       for name, values in merged.items()}, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _merge_file(merged, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for metric in REGISTRY:
+            values = merged[metric.name]
+            for labels, value in data.get(metric.name, []):
+                labels = tuple(labels)
+                values[labels] = metric.merge(values.get(labels), value)
+
+    @staticmethod
+    def _merge_live(merged):
+        for metric in REGISTRY:
+            values = merged[metric.name]
+            for labels, value in metric.snapshot().items():
+                values[labels] = metric.merge(values.get(labels), value)
+
+    def write(self):
+        """写入本进程快照（限制频率）"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_write < SNAPSHOT_INTERVAL:
+                return
+            self._last_write = now
+        self._dump(self._own_path(), {metric.name: metric.snapshot() for metric in REGISTRY})
+
+    def collect(self):
+        """合并归档数据、其他进程的快照与本进程的实时数据"""
+        merged = {metric.name: {} for metric in REGISTRY}
+        own = os.path.basename(self._own_path())
+        with self._dir_lock(fcntl.LOCK_SH):
+            for name in os.listdir(self.directory):
+                if name.endswith('.json') and name != own:
+                    self._merge_file(merged, os.path.join(self.directory, name))
+        self._merge_live(merged)
+        return merged
+
+    def retire(self):
+        """进程退出时把本进程的数据并入归档并删除快照文件"""
+        archive_path = os.path.join(self.directory, self.ARCHIVE_NAME)
+        merged = {metric.name: {} for metric in REGISTRY}
+        with self._dir_lock(fcntl.LOCK_EX):
+            self._merge_file(merged, archive_path)
+            self._merge_live(merged)
+            self._dump(archive_path, merged)
+            try:
+                os.remove(self._own_path())
+            except FileNotFoundError:
+                pass
+
+
+def clear_snapshots(directory):
+    """清空汇总目录（服务启动时调用，避免沿用上一次运行的数据）"""
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith('.json') or name.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+_store = None
+
+
+def render_metrics():
+    """输出Prometheus文本格式"""
+    if _store is not None:
+        merged = _store.collect()
+    else:
+        merged = {metric.name: metric.snapshot() for metric in REGISTRY}
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.render(merged[metric.name]))
+    return '\n'.join(lines) + '\n'
+
+
+def _start_request():
+    """before_request：记录开始时间，开始累计本请求的阶段耗时"""
+    request.environ['metrics.started'] = time.perf_counter()
+    request.environ['metrics.parent_totals'] = getattr(_local, 'totals', None)
+    _local.totals = {}
+
+
+def _finish_request(response):
+    """after_request：记录路由耗时与阶段耗时（/api/batch的子请求各自单独记录）"""
+    started = request.environ.pop('metrics.started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    totals = getattr(_local, 'totals', None) or {}
+    _local.totals = request.environ.pop('metrics.parent_totals', None)
+
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUESTS_TOTAL.inc(request.method, route, str(response.status_code))
+    REQUEST_DURATION.observe(elapsed, request.method, route)
+    for stage_name, seconds in totals.items():
+        STAGE_DURATION.observe(seconds, stage_name)
+    if _store is not None:
+        _store.write()
+    return response
+
+
+def _teardown_request(exc):
+    """teardown_request：未经过after_request（处理时抛出异常）的请求按500记录"""
+    started = request.environ.pop('metrics.started', None)
+    if started is None:
+        return
+    _local.totals = request.environ.pop('metrics.parent_totals', None)
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUESTS_TOTAL.inc(request.method, route, '500')
+    REQUEST_DURATION.observe(time.perf_counter() - started, request.method, route)
+
+
+def shutdown():
+    """进程退出前保存本进程的指标（未启用多进程汇总时不做任何事）"""
+    if _store is not None:
+        _store.retire()
+
+
+def init_app(app):
+    """注册请求计时钩子；配置METRICS_DIR时启用多进程汇总"""
+    global _store
+    directory = app.config.get('METRICS_DIR')
+    if directory:
+        _store = SnapshotStore(directory)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库结构迁移 - 按版本号顺序执行，已执行的版本记录在schema_version表中
+"""
+
+import logging
+
+from blobstore import put_blob
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """注册迁移函数的装饰器，版本号必须递增且唯一"""
+    def decorator(func):
+        if any(m[0] == version for m in MIGRATIONS):
+            raise ValueError(f'迁移版本重复: {version}')
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def current_version(conn):
+    """获取数据库当前结构版本"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def column_exists(conn, table, column):
+    """检查表中是否已有指定列"""
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+
+def run_migrations(conn):
+    """执行所有未应用的迁移，每个迁移在独立事务中完成，返回本次应用的版本列表"""
+    applied = []
+    version = current_version(conn)
+    conn.commit()
+    for target, description, func in MIGRATIONS:
+        if target <= version:
+            continue
+        try:
+            func(conn)
+            conn.execute('''
+                INSERT INTO schema_version (version, description) VALUES (?, ?)
+            ''', (target, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(target)
+    return applied
+
+
+# 迁移定义（只允许追加，不要修改已发布的迁移）
+
+@migration(1, '列表查询常用过滤/排序列索引')
+def add_list_indexes(conn):
+    """为按用户过滤、按时间排序的列表查询建立复合索引"""
+    statements = [
+        'CREATE INDEX IF NOT EXISTS idx_projects_user_updated ON projects (user_id, updated_at)',
+        'CREATE INDEX IF NOT EXISTS idx_games_user_created ON games (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_games_project_user ON games (project_id, user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_servers_user_created ON servers (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_servers_game ON servers (game_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_templates_user_created ON config_templates (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_templates_project_game_user ON config_templates (project_id, game_id, user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_config_files_server_created ON config_files (server_id, created_at)',
+    ]
+    for sql in statements:
+        conn.execute(sql)
+
+
+@migration(2, 'config_files内容改为内容寻址的压缩存储')
+def move_config_files_to_blobs(conn):
+    """新建blobs表，将config_files中的模板/生成内容迁移为哈希引用"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            stored_size INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for column in ('template_hash', 'generated_hash'):
+        if not column_exists(conn, 'config_files', column):
+            conn.execute(f'ALTER TABLE config_files ADD COLUMN {column} TEXT')
+
+    # 逐批迁移已有记录，避免一次性把全部内容读入内存
+    inline_bytes = 0
+    migrated = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, template_content, generated_content FROM config_files
+            WHERE template_content IS NOT NULL OR generated_content IS NOT NULL
+            LIMIT 500
+        ''').fetchall()
+        if not rows:
+            break
+        for row_id, template_content, generated_content in rows:
+            inline_bytes += len((template_content or '').encode('utf-8'))
+            inline_bytes += len((generated_content or '').encode('utf-8'))
+            conn.execute('''
+                UPDATE config_files
+                SET template_hash = ?, generated_hash = ?,
+                    template_content = NULL, generated_content = NULL
+                WHERE id = ?
+            ''', (put_blob(conn, template_content), put_blob(conn, generated_content), row_id))
+        migrated += len(rows)
+
+    if migrated:
+        stored = conn.execute('SELECT COALESCE(SUM(stored_size), 0) FROM blobs').fetchone()[0]
+        logger.info("config_files迁移: %d 条记录，原始内容 %d 字节，压缩去重后 %d 字节，节省 %d 字节"
+                    "（执行VACUUM后释放磁盘空间）", migrated, inline_bytes, stored, inline_bytes - stored)
+
+
+@migration(3, '后台生成任务表')
+def add_jobs_table(conn):
+    """持久化后台生成任务，服务重启后可继续执行"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            scope TEXT NOT NULL,
+            scope_id INTEGER NOT NULL,
+            params TEXT,
+            state TEXT NOT NULL DEFAULT 'queued',
+            total INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            errors TEXT,
+            result TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_user_created ON jobs (user_id, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state)')
+
+
+@migration(4, '列表缓存代数表')
+def add_cache_generations_table(conn):
+    """记录每个用户各类数据的修改代数，多进程部署时列表缓存也能及时失效"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cache_generations (
+            user_id INTEGER NOT NULL,
+            scope TEXT NOT NULL,
+            generation INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, scope)
+        ) WITHOUT ROWID
+    ''')
+
+
+@migration(5, '区服按(game_id, server_id)查重索引')
+def add_server_id_index(conn):
+    """批量开服按游戏+区服ID查重，避免逐行查询或全表扫描"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_servers_game_server_id ON servers (game_id, server_id)')
+
+
+@migration(6, '后台任务租约列')
+def add_job_lease_columns(conn):
+    """运行中的任务记录执行者与心跳时间，执行进程被强制结束后其他进程可按租约超时接手"""
+    for column, definition in (('lease_owner', 'TEXT'), ('heartbeat_at', 'TIMESTAMP'),
+                               ('attempts', 'INTEGER NOT NULL DEFAULT 0')):
+        if not column_exists(conn, 'jobs', column):
+            conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {definition}')
+
+
+@migration(7, '清理已删除区服的生成记录并重算内容引用计数')
+def repair_blob_refcounts(conn):
+    """此前删除区服时不删除生成记录，内容引用计数只增不减；清理孤立记录后按实际引用重算并删除未引用的内容"""
+    orphaned = conn.execute('''
+        DELETE FROM config_files WHERE server_id IS NULL OR server_id NOT IN (SELECT id FROM servers)
+    ''').rowcount
+    # 先按哈希汇总引用次数，避免对每个内容各扫描一遍config_files
+    conn.execute('CREATE TEMP TABLE blob_refs (hash TEXT PRIMARY KEY, refs INTEGER NOT NULL)')
+    conn.execute('''
+        INSERT INTO blob_refs (hash, refs)
+        SELECT hash, COUNT(*) FROM (
+            SELECT template_hash AS hash FROM config_files
+            UNION ALL
+            SELECT generated_hash FROM config_files
+        ) WHERE hash IS NOT NULL GROUP BY hash
+    ''')
+    conn.execute('''
+        UPDATE blobs SET refcount = COALESCE((SELECT refs FROM blob_refs WHERE blob_refs.hash = blobs.hash), 0)
+    ''')
+    conn.execute('DROP TABLE blob_refs')
+    released = conn.execute('DELETE FROM blobs WHERE refcount <= 0').rowcount
+    if orphaned or released:
+        logger.info("清理孤立生成记录 %d 条，释放未引用内容 %d 份（执行VACUUM后释放磁盘空间）", orphaned, released)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求合并 - 在同一个请求内依次执行多个子请求，子请求共享应用上下文与数据库连接
+"""
+
+import re
+
+from flask import g
+from werkzeug.test import EnvironBuilder
+
+MAX_BATCH_REQUESTS = 50
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+# 子请求与外层请求共享g，这些按请求保存的状态在子请求执行期间移出，结束后恢复为外层的值
+REQUEST_SCOPED_GLOBALS = ('request_id', 'profile')
+# 子请求的WSGI environ中带有该标记，按请求计时/剖析的钩子据此跳过子请求
+SUBREQUEST_ENVIRON_KEY = 'multiplex.subrequest'
+
+# 路径中引用前面子请求的结果：$0.game_id 表示第0个子请求返回的game_id
+PATH_REF_PATTERN = re.compile(r'\$(\d+)((?:\.\w+)+)')
+
+
+class BatchError(ValueError):
+    """批量请求参数错误"""
+
+
+class UnresolvedReference(Exception):
+    """引用的子请求失败或字段不存在"""
+
+
+def _lookup(results, index, field_path):
+    """取第index个子请求结果中的字段，支持a.b形式的嵌套字段"""
+    if index >= len(results):
+        raise UnresolvedReference(f'只能引用前面的子请求: ${index}')
+    result = results[index]
+    if result['status'] >= 400 or result['body'] is None:
+        raise UnresolvedReference(f'引用的子请求${index}执行失败')
+    value = result['body']
+    for field in field_path.strip('.').split('.'):
+        if isinstance(value, list) and field.isdigit() and int(field) < len(value):
+            value = value[int(field)]
+        elif isinstance(value, dict) and field in value:
+            value = value[field]
+        else:
+            raise UnresolvedReference(f'子请求${index}的结果中没有字段: {field_path.strip(".")}')
+    return value
+
+
+def resolve_path(path, results):
+    """替换路径中的$n.field引用"""
+    return PATH_REF_PATTERN.sub(lambda m: str(_lookup(results, int(m.group(1)), m.group(2))), path)
+
+
+def resolve_body(body, results):
+    """替换请求体中的{"$ref": "n.field"}引用（只识别该形式，避免误改模板内容）"""
+    if isinstance(body, dict):
+        if set(body) == {'$ref'} and isinstance(body['$ref'], str):
+            index, _, field_path = body['$ref'].partition('.')
+            if not index.isdigit() or not field_path:
+                raise UnresolvedReference(f'引用格式无效: {body["$ref"]}')
+            return _lookup(results, int(index), field_path)
+        return {key: resolve_body(value, results) for key, value in body.items()}
+    if isinstance(body, list):
+        return [resolve_body(value, results) for value in body]
+    return body
+
+
+def validate_batch(items, max_requests=MAX_BATCH_REQUESTS):
+    """校验子请求列表，返回规范化后的列表"""
+    if not isinstance(items, list) or not items:
+        raise BatchError('requests必须是非空数组')
+    if len(items) > max_requests:
+        raise BatchError(f'单次最多合并{max_requests}个子请求')
+    normalized = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise BatchError(f'第{i}个子请求格式无效')
+        method = str(item.get('method', 'GET')).upper()
+        path = item.get('path')
+        if method not in BATCH_METHODS:
+            raise BatchError(f'第{i}个子请求的方法不支持: {method}')
+        if not isinstance(path, str) or not path.startswith('/api/'):
+            raise BatchError(f'第{i}个子请求的路径必须以/api/开头')
+        if path.split('?', 1)[0].rstrip('/') == '/api/batch':
+            raise BatchError('不能嵌套调用/api/batch')
+        normalized.append({'method': method, 'path': path, 'body': item.get('body')})
+    return normalized
+
+
+def dispatch(app, method, path, body, headers):
+    """在当前应用上下文中执行一个子请求，返回(状态码, JSON结果)"""
+    builder = EnvironBuilder(path=path, method=method, headers=headers, json=body)
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    environ[SUBREQUEST_ENVIRON_KEY] = True
+    saved = {name: g.pop(name) for name in REQUEST_SCOPED_GLOBALS if name in g}
+    try:
+        with app.request_context(environ):
+            response = app.full_dispatch_request()
+    finally:
+        for name in REQUEST_SCOPED_GLOBALS:
+            g.pop(name, None)
+        for name, value in saved.items():
+            setattr(g, name, value)
+    try:
+        if response.is_json:
+            return response.status_code, response.get_json()
+        # 文件下载等非JSON响应不适合合并，只返回状态
+        return response.status_code, None
+    finally:
+        response.close()
+
+
+def run_batch(app, items, headers, on_error=None):
+    """
+    依次执行子请求，后面的子请求可引用前面的结果
+    headers: 传给子请求的请求头（如Cookie，用于沿用登录会话）
+    on_error: 子请求抛出异常时的回调（如回滚共享连接）
+    """
+    results = []
+    for item in items:
+        try:
+            path = resolve_path(item['path'], results)
+            body = resolve_body(item['body'], results)
+        except UnresolvedReference as e:
+            results.append({'status': 424, 'body': {'error': str(e)}})
+            continue
+        try:
+            status, payload = dispatch(app, item['method'], path, body, headers)
+        except Exception as e:
+            if on_error:
+                on_error(e)
+            results.append({'status': 500, 'body': {'error': str(e)}})
+            continue
+        results.append({'status': status, 'body': payload})
+    return results
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列表查询辅助 - 基于(created_at, id)的游标分页与字段投影
+"""
+
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class ListQueryError(ValueError):
+    """列表查询参数错误"""
+
+
+def encode_cursor(created_at, row_id):
+    """将排序键编码为不透明的游标字符串"""
+    raw = json.dumps([created_at, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标字符串，返回(created_at, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return str(created_at), int(row_id)
+    except Exception:
+        raise ListQueryError('无效的分页游标')
+
+
+def parse_list_args(args, columns):
+    """解析fields/limit/cursor参数，返回(fields, limit, after, paginated)"""
+    fields_arg = args.get('fields')
+    if fields_arg:
+        fields = [f.strip() for f in fields_arg.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in columns]
+        if unknown:
+            raise ListQueryError(f'未知字段: {", ".join(unknown)}')
+    else:
+        fields = list(columns)
+
+    # 未传limit/cursor时保持旧接口：返回完整数组
+    paginated = 'limit' in args or 'cursor' in args
+    limit = None
+    if paginated:
+        try:
+            limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ListQueryError('limit必须是整数')
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise ListQueryError(f'limit取值范围为1-{MAX_PAGE_SIZE}')
+
+    after = decode_cursor(args['cursor']) if args.get('cursor') else None
+    return fields, limit, after, paginated
+
+
+def fetch_list(cursor, columns, from_sql, where_sql, params, alias,
+               fields, limit=None, after=None, decoders=None):
+    """
+    按(created_at DESC, id DESC)顺序查询列表
+    columns: 字段名 -> SQL表达式；alias: 主表别名（用于排序键）
+    返回(items, next_cursor)
+    """
+    decoders = decoders or {}
+    # 排序键始终查询，用于生成下一页游标
+    select_exprs = [columns[f] for f in fields] + [f'{alias}.created_at', f'{alias}.id']
+    sql = f'SELECT {", ".join(select_exprs)} FROM {from_sql} WHERE {where_sql}'
+    sql_params = list(params)
+    if after is not None:
+        sql += f' AND ({alias}.created_at < ? OR ({alias}.created_at = ? AND {alias}.id < ?))'
+        sql_params.extend([after[0], after[0], after[1]])
+    sql += f' ORDER BY {alias}.created_at DESC, {alias}.id DESC'
+    if limit is not None:
+        # 多取一行判断是否还有下一页
+        sql += ' LIMIT ?'
+        sql_params.append(limit + 1)
+
+    cursor.execute(sql, sql_params)
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+
+    items = []
+    for row in rows:
+        item = {}
+        for i, field in enumerate(fields):
+            decode = decoders.get(field)
+            item[field] = decode(row[i]) if decode else row[i]
+        items.append(item)
+    return items, next_cursor
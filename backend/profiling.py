@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按请求剖析 - 按路由/采样率或管理员请求头触发，cProfile输出pstats，采样模式输出折叠栈（可直接生成火焰图）
+未触发的请求只多一次请求头查找与一次比较
+"""
+
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request, session
+
+from multiplex import SUBREQUEST_ENVIRON_KEY
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_MODES = ('cprofile', 'sample')
+PROFILE_EXTENSIONS = {'cprofile': 'pstats', 'sample': 'collapsed'}
+PROFILE_NAME_PATTERN = re.compile(
+    r'^(?P<time>\d{8}-\d{6})-(?P<endpoint>\w+)-(?P<ms>\d+)ms-(?P<request_id>[\w.-]+)\.(?P<ext>pstats|collapsed)$'
+)
+
+
+class StackSampler:
+    """采样剖析：后台线程定时读取目标线程的调用栈，统计各调用栈出现次数"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        """折叠栈格式：每行“栈帧;栈帧;... 次数”，可用flamegraph.pl或speedscope查看"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class RequestProfiler:
+    """决定哪些请求需要剖析，并把结果写入剖析目录"""
+
+    def __init__(self, output_dir, routes=(), sample_rate=0.0, mode='cprofile',
+                 sample_interval=0.005, keep=100):
+        self.output_dir = str(output_dir)
+        self.routes = frozenset(routes)
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self.keep = keep
+        # cProfile在同一时刻只剖析一个请求（Python 3.12起同一进程只能有一个活动的profiler）
+        self._cprofile_lock = threading.Lock()
+
+    def _requested_mode(self):
+        """返回本次请求的剖析模式，不需要剖析时返回None"""
+        header = request.headers.get(PROFILE_HEADER)
+        if header is not None:
+            # 请求头触发只对管理员生效
+            if session.get('role') != 'admin':
+                return None
+            return header if header in PROFILE_MODES else self.mode
+        if not self.sample_rate:
+            return None
+        if self.routes and request.endpoint not in self.routes:
+            return None
+        return self.mode if random.random() < self.sample_rate else None
+
+    def start(self):
+        """before_request：按需开始剖析（/api/batch的子请求包含在外层请求的剖析中）"""
+        if request.environ.get(SUBREQUEST_ENVIRON_KEY):
+            return
+        mode = self._requested_mode()
+        if mode is None:
+            return
+        if mode == 'cprofile':
+            if not self._cprofile_lock.acquire(blocking=False):
+                return
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), self.sample_interval)
+            profiler.start()
+        g.profile = (mode, profiler, time.perf_counter())
+
+    def finish(self, exc=None):
+        """after_request/teardown_request：停止剖析并写出结果"""
+        if request.environ.get(SUBREQUEST_ENVIRON_KEY):
+            return
+        state = g.pop('profile', None)
+        if state is None:
+            return
+        mode, profiler, started = state
+        if mode == 'cprofile':
+            profiler.disable()
+            self._cprofile_lock.release()
+        else:
+            profiler.stop()
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = '{}-{}-{}ms-{}.{}'.format(
+            datetime.now().strftime('%Y%m%d-%H%M%S'), request.endpoint or 'unmatched', elapsed_ms,
+            g.get('request_id') or os.urandom(8).hex(), PROFILE_EXTENSIONS[mode]
+        )
+        path = os.path.join(self.output_dir, name)
+        if mode == 'cprofile':
+            profiler.dump_stats(path)
+        else:
+            profiler.dump(path)
+        self.prune()
+
+    def prune(self):
+        """只保留最新的keep个剖析文件"""
+        entries = list_profiles(self.output_dir)
+        for entry in entries[self.keep:]:
+            try:
+                os.remove(os.path.join(self.output_dir, entry['name']))
+            except FileNotFoundError:
+                pass
+
+    def settings(self):
+        return {
+            'routes': sorted(self.routes),
+            'sample_rate': self.sample_rate,
+            'mode': self.mode,
+            'sample_interval': self.sample_interval,
+            'keep': self.keep
+        }
+
+
+def list_profiles(output_dir):
+    """剖析文件列表（最新的在前）"""
+    if not os.path.isdir(output_dir):
+        return []
+    entries = []
+    for name in os.listdir(output_dir):
+        match = PROFILE_NAME_PATTERN.match(name)
+        if not match:
+            continue
+        try:
+            stat = os.stat(os.path.join(output_dir, name))
+        except FileNotFoundError:
+            continue
+        entries.append({
+            'name': name,
+            'endpoint': match.group('endpoint'),
+            'duration_ms': int(match.group('ms')),
+            'request_id': match.group('request_id'),
+            'format': match.group('ext'),
+            'size': stat.st_size,
+            'created_at': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds'),
+            '_mtime': stat.st_mtime_ns
+        })
+    entries.sort(key=lambda e: (e['_mtime'], e['name']), reverse=True)
+    for entry in entries:
+        del entry['_mtime']
+    return entries
+
+
+def init_app(app, output_dir):
+    """注册剖析钩子（应最后注册，使剖析只覆盖视图函数及之后的处理）"""
+    routes = [r.strip() for r in app.config.get('PROFILE_ROUTES', '').split(',') if r.strip()]
+    mode = app.config.get('PROFILE_MODE', 'cprofile')
+    if mode not in PROFILE_MODES:
+        raise ValueError(f'PROFILE_MODE必须是 {", ".join(PROFILE_MODES)} 之一')
+    profiler = RequestProfiler(
+        output_dir,
+        routes=routes,
+        sample_rate=app.config.get('PROFILE_SAMPLE_RATE', 0.0),
+        mode=mode,
+        sample_interval=app.config.get('PROFILE_SAMPLE_INTERVAL', 0.005),
+        keep=app.config.get('PROFILE_KEEP', 100)
+    )
+    app.before_request(profiler.start)
+
+    def finish_after_request(response):
+        profiler.finish()
+        return response
+
+    app.after_request(finish_after_request)
+    app.teardown_request(profiler.finish)
+    return profiler
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量开服 - 解析区服列表（JSON/CSV）或编号范围，按(game_id, server_id)索引批量查重后一次事务写入
+"""
+
+import csv
+import io
+import re
+
+from generation import chunked
+
+MAX_BULK_SERVERS = 5000
+DUPLICATE_POLICIES = ('skip', 'error')
+
+# 范围模板中只允许{n}或{n:格式}，如 "S{n}区"、"s{n:04d}"
+RANGE_PLACEHOLDER = re.compile(r'\{n(?::([^{}]*))?\}')
+
+
+class ProvisionError(ValueError):
+    """批量开服参数错误"""
+
+
+class DuplicateServers(ProvisionError):
+    """区服ID与已有区服重复（on_duplicate=error时）"""
+
+    def __init__(self, server_ids):
+        super().__init__(f'区服ID已存在: {", ".join(server_ids[:20])}' + (' ...' if len(server_ids) > 20 else ''))
+        self.server_ids = server_ids
+
+
+def _render_pattern(pattern, n, field):
+    """把模板中的{n}/{n:格式}替换为编号"""
+    if not isinstance(pattern, str):
+        raise ProvisionError(f'range.{field}必须是字符串')
+    try:
+        rendered = RANGE_PLACEHOLDER.sub(lambda m: format(n, m.group(1) or ''), pattern)
+    except ValueError as e:
+        raise ProvisionError(f'range.{field}的格式无效: {e}')
+    if '{' in rendered or '}' in rendered:
+        raise ProvisionError(f'range.{field}只支持{{n}}或{{n:格式}}占位符')
+    return rendered
+
+
+def expand_range(spec, max_count=MAX_BULK_SERVERS):
+    """
+    按编号范围展开区服列表
+    spec: {"name": "S{n}区", "server_id": "s{n:04d}", "description": "...", "start": 1, "end": 500, "step": 1}
+    end包含在内
+    """
+    if not isinstance(spec, dict):
+        raise ProvisionError('range必须是对象')
+    try:
+        start = int(spec.get('start', 1))
+        end = int(spec['end'])
+        step = int(spec.get('step', 1))
+    except (KeyError, TypeError, ValueError):
+        raise ProvisionError('range需要整数end，可选start（默认1）、step（默认1）')
+    if step <= 0 or end < start:
+        raise ProvisionError('range需要start <= end且step > 0')
+    numbers = range(start, end + 1, step)
+    if len(numbers) > max_count:
+        raise ProvisionError(f'单次最多创建{max_count}个区服')
+    for field in ('name', 'server_id'):
+        if not RANGE_PLACEHOLDER.search(spec.get(field) or ''):
+            raise ProvisionError(f'range.{field}中需要包含{{n}}占位符')
+    description = spec.get('description', '')
+    return [{
+        'name': _render_pattern(spec['name'], n, 'name'),
+        'server_id': _render_pattern(spec['server_id'], n, 'server_id'),
+        'description': _render_pattern(description, n, 'description') if description else ''
+    } for n in numbers]
+
+
+def parse_csv(text):
+    """解析CSV（首行为表头，需包含name、server_id列，可选description列）"""
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+    fields = {name.strip() for name in reader.fieldnames or []}
+    if not {'name', 'server_id'} <= fields:
+        raise ProvisionError('CSV首行需为表头，至少包含name、server_id列')
+    return [{(key or '').strip(): value for key, value in row.items()} for row in reader]
+
+
+def normalize_servers(items, max_count=MAX_BULK_SERVERS):
+    """校验区服列表并去除首尾空白，列表内区服ID重复时报错"""
+    if not isinstance(items, list) or not items:
+        raise ProvisionError('区服列表不能为空')
+    if len(items) > max_count:
+        raise ProvisionError(f'单次最多创建{max_count}个区服')
+    servers = []
+    seen = set()
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ProvisionError(f'第{i + 1}个区服格式无效')
+        name = str(item.get('name') or '').strip()
+        server_id = str(item.get('server_id') or '').strip()
+        if not name or not server_id:
+            raise ProvisionError(f'第{i + 1}个区服缺少name或server_id')
+        if server_id in seen:
+            raise ProvisionError(f'区服ID在列表中重复: {server_id}')
+        seen.add(server_id)
+        servers.append({'name': name, 'server_id': server_id,
+                        'description': str(item.get('description') or '').strip()})
+    return servers
+
+
+def find_existing(conn, game_id, server_ids):
+    """查出游戏下已存在的区服ID（按idx_servers_game_server_id索引分批IN查询）"""
+    existing = set()
+    for chunk in chunked(server_ids):
+        placeholders = ', '.join('?' * len(chunk))
+        existing.update(row[0] for row in conn.execute(f'''
+            SELECT server_id FROM servers WHERE game_id = ? AND server_id IN ({placeholders})
+        ''', (game_id, *chunk)))
+    return existing
+
+
+def provision_servers(conn, user_id, game_id, servers, on_duplicate='skip'):
+    """
+    批量写入区服（调用方负责提交事务），返回(新建的区服列表, 跳过的区服ID列表)
+    on_duplicate: skip跳过已存在的区服ID；error时有重复则整批不写入
+    """
+    if on_duplicate not in DUPLICATE_POLICIES:
+        raise ProvisionError(f'on_duplicate必须是 {", ".join(DUPLICATE_POLICIES)} 之一')
+    if not conn.in_transaction:
+        # 先取得写锁，查重与写入之间其他进程不会插入相同的区服ID
+        conn.execute('BEGIN IMMEDIATE')
+    existing = find_existing(conn, game_id, [s['server_id'] for s in servers])
+    skipped = [s['server_id'] for s in servers if s['server_id'] in existing]
+    if skipped and on_duplicate == 'error':
+        raise DuplicateServers(skipped)
+    new_servers = [s for s in servers if s['server_id'] not in existing]
+    conn.executemany('''
+        INSERT INTO servers (game_id, name, server_id, description, user_id)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(game_id, s['name'], s['server_id'], s['description'], user_id) for s in new_servers])
+
+    # 取回新区服的ID（同样走索引）
+    ids = {}
+    for chunk in chunked([s['server_id'] for s in new_servers]):
+        placeholders = ', '.join('?' * len(chunk))
+        ids.update(conn.execute(f'''
+            SELECT server_id, id FROM servers WHERE game_id = ? AND server_id IN ({placeholders})
+        ''', (game_id, *chunk)).fetchall())
+    created = [dict(s, id=ids.get(s['server_id'])) for s in new_servers]
+    return created, skipped
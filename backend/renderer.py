@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板渲染引擎 - 模板解析一次后缓存，单次遍历拼接输出
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from metrics import stage
+
+# 与配置项解析保持一致：{{key}}，花括号内允许任意空白
+VARIABLE_PATTERN = re.compile(r'\{\{([^}]+)\}\}')
+
+
+class CompiledTemplate:
+    """解析后的模板：literals与variables交替排列，len(literals) == len(variables) + 1"""
+
+    __slots__ = ('literals', 'variables', 'placeholders')
+
+    def __init__(self, content):
+        self.literals = []
+        self.variables = []
+        self.placeholders = []
+        pos = 0
+        for match in VARIABLE_PATTERN.finditer(content):
+            self.literals.append(content[pos:match.start()])
+            self.variables.append(match.group(1).strip())
+            self.placeholders.append(match.group(0))
+            pos = match.end()
+        self.literals.append(content[pos:])
+
+    def render(self, config_data):
+        """渲染模板，未提供值的变量保留原占位符"""
+        with stage('render'):
+            literals = self.literals
+            parts = [literals[0]]
+            for i, key in enumerate(self.variables):
+                if key in config_data:
+                    parts.append(str(config_data[key]))
+                else:
+                    parts.append(self.placeholders[i])
+                parts.append(literals[i + 1])
+            return ''.join(parts)
+
+
+class TemplateCache:
+    """
+    编译结果的LRU缓存，键为(模板ID, 内容哈希)
+    更新时间只精确到秒且invalidate只作用于本进程，按内容哈希取缓存才不会用到旧版本
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, template_id, content):
+        """获取编译后的模板，未命中时编译并放入缓存"""
+        key = (template_id, hashlib.sha256(content.encode('utf-8')).digest())
+        with self._lock:
+            compiled = self._items.get(key)
+            if compiled is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+        compiled = CompiledTemplate(content)
+        with self._lock:
+            self._items[key] = compiled
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return compiled
+
+    def invalidate(self, template_id):
+        """模板修改/删除后移除该模板的全部缓存版本（只为释放内存，旧版本不会再被命中）"""
+        with self._lock:
+            for key in [k for k in self._items if k[0] == template_id]:
+                del self._items[key]
+
+    def stats(self):
+        """缓存命中统计"""
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+template_cache = TemplateCache()
+
+
+def render_template(content, config_data, template_id=None):
+    """渲染模板内容；提供template_id时使用编译缓存"""
+    if template_id is None:
+        compiled = CompiledTemplate(content)
+    else:
+        compiled = template_cache.get(template_id, content)
+    return compiled.render(config_data)
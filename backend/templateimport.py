@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板批量导入 - 从上传的zip/tar包或服务器目录读取文件，并行提取变量后按file_path一次事务新建/更新游戏的模板
+"""
+
+import json
+import os
+import re
+import tarfile
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from fleet import POOL_CONTEXT
+from generation import chunked
+from metrics import stage
+from renderer import VARIABLE_PATTERN
+
+MAX_IMPORT_FILES = 2000
+MAX_IMPORT_BYTES = 64 * 1024 * 1024
+# 内容总量低于该字节数时在当前进程提取变量（进程池的启动与传输开销大于收益）
+PARALLEL_MIN_BYTES = 1024 * 1024
+
+# 打包工具附带的元数据，不作为模板导入
+IGNORED_NAMES = {'__MACOSX', 'Thumbs.db', 'desktop.ini'}
+
+
+class TemplateImportError(ValueError):
+    """导入来源或参数无效"""
+
+
+def template_variables(content):
+    """按首次出现顺序返回模板中的变量名（去重），与渲染时使用同一个匹配规则"""
+    return list(dict.fromkeys(var.strip() for var in VARIABLE_PATTERN.findall(content)))
+
+
+def normalize_path(name, strip_components=0):
+    """
+    压缩包/目录内的路径转为模板的相对file_path
+    目录、隐藏文件与打包元数据返回None；绝对路径或包含..时报错
+    """
+    name = name.replace('\\', '/')
+    parts = [part for part in name.split('/') if part not in ('', '.')]
+    if name.startswith('/') or re.match(r'^[A-Za-z]:', name) or '..' in parts:
+        raise TemplateImportError('路径不安全')
+    parts = parts[strip_components:]
+    if not parts or name.endswith('/'):
+        return None
+    if any(part.startswith('.') or part in IGNORED_NAMES for part in parts):
+        return None
+    return '/'.join(parts)
+
+
+def _strip_count(value):
+    try:
+        count = int(value or 0)
+    except (TypeError, ValueError):
+        count = -1
+    if count < 0:
+        raise TemplateImportError('strip_components必须是非负整数')
+    return count
+
+
+def collect_files(entries, strip_components=0, max_files=MAX_IMPORT_FILES, max_bytes=MAX_IMPORT_BYTES):
+    """
+    读取(名称, 字节数, 读取函数)条目，返回([(file_path, 内容)], [{'file_path', 'reason'}跳过的条目])
+    按声明的大小先检查总量再读取，避免解压炸弹占满内存
+    """
+    strip_components = _strip_count(strip_components)
+    files = []
+    skipped = []
+    seen = set()
+    total = 0
+    for name, size, read in entries:
+        try:
+            file_path = normalize_path(name, strip_components)
+        except TemplateImportError as e:
+            skipped.append({'file_path': name, 'reason': str(e)})
+            continue
+        if file_path is None:
+            continue
+        if file_path in seen:
+            raise TemplateImportError(f'文件路径重复: {file_path}')
+        total += size
+        if len(files) >= max_files:
+            raise TemplateImportError(f'单次最多导入{max_files}个文件')
+        if total > max_bytes:
+            raise TemplateImportError(f'文件总大小超过{max_bytes}字节')
+        data = read()
+        if b'\0' in data:
+            skipped.append({'file_path': file_path, 'reason': '二进制文件'})
+            continue
+        try:
+            content = data.decode('utf-8')
+        except UnicodeDecodeError:
+            skipped.append({'file_path': file_path, 'reason': '不是UTF-8文本'})
+            continue
+        seen.add(file_path)
+        files.append((file_path, content))
+    return files, skipped
+
+
+def _zip_entries(path):
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                yield info.filename, info.file_size, lambda info=info: archive.read(info)
+
+
+def _tar_entries(path):
+    with tarfile.open(path, 'r:*') as archive:
+        for member in archive:
+            # 只导入普通文件，符号链接与设备文件跳过
+            if member.isfile():
+                yield member.name, member.size, lambda member=member: archive.extractfile(member).read()
+
+
+def _directory_entries(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for filename in sorted(filenames):
+            path = Path(dirpath) / filename
+            if path.is_symlink() or not path.is_file():
+                continue
+            yield path.relative_to(root).as_posix(), path.stat().st_size, path.read_bytes
+
+
+def read_archive(path, strip_components=0, max_files=MAX_IMPORT_FILES, max_bytes=MAX_IMPORT_BYTES):
+    """读取zip或tar（含gz/bz2/xz）压缩包中的文本文件"""
+    try:
+        if zipfile.is_zipfile(path):
+            entries = _zip_entries(path)
+        elif tarfile.is_tarfile(path):
+            entries = _tar_entries(path)
+        else:
+            raise TemplateImportError('只支持zip或tar压缩包')
+        return collect_files(entries, strip_components, max_files, max_bytes)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, zlib.error, NotImplementedError) as e:
+        raise TemplateImportError(f'压缩包无法读取: {e}')
+
+
+def resolve_directory(root, directory):
+    """把相对路径解析到导入根目录下，不允许指向根目录之外"""
+    base = Path(root).resolve()
+    target = (base / str(directory)).resolve()
+    if not target.is_relative_to(base):
+        raise TemplateImportError('目录必须位于导入根目录下')
+    if not target.is_dir():
+        raise TemplateImportError(f'目录不存在: {directory}')
+    return target
+
+
+def read_directory(root, strip_components=0, max_files=MAX_IMPORT_FILES, max_bytes=MAX_IMPORT_BYTES):
+    """读取服务器目录下的文本文件（不跟随符号链接）"""
+    return collect_files(_directory_entries(root), strip_components, max_files, max_bytes)
+
+
+def _extract_batch(contents):
+    """工作进程：提取一批模板的变量名"""
+    return [template_variables(content) for content in contents]
+
+
+def extract_variables(contents, max_workers=None):
+    """提取各模板的变量名列表（顺序与contents一致）；内容较多时按大小分批交给进程池并行提取"""
+    total = sum(len(content) for content in contents)
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(contents)))
+    if workers == 1 or total < PARALLEL_MIN_BYTES:
+        return _extract_batch(contents)
+    # 按累计大小切成连续的批次，每个进程分到几批以平衡大小不一的文件
+    target = total / (workers * 4)
+    batches, batch, size = [], [], 0
+    for content in contents:
+        batch.append(content)
+        size += len(content)
+        if size >= target:
+            batches.append(batch)
+            batch, size = [], 0
+    if batch:
+        batches.append(batch)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT) as executor:
+        return [variables for result in executor.map(_extract_batch, batches) for variables in result]
+
+
+def import_templates(conn, user_id, project_id, game_id, files, config_items, max_workers=None, dry_run=False):
+    """
+    按file_path把文件新建或更新为游戏的模板（调用方负责提交事务）
+    config_items: 由变量名列表生成配置项列表的函数
+    返回 {'created': [...], 'updated': [...], 'unchanged': [...]}，元素为{'id', 'name', 'file_path'}
+    """
+    # 变量提取在取得写锁之前完成，锁只覆盖比对与写入
+    variables = extract_variables([content for _, content in files], max_workers)
+    if not dry_run and not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+
+    existing = {}
+    for template_id, name, file_path, content in conn.execute('''
+        SELECT id, name, file_path, template_content FROM config_templates
+        WHERE project_id = ? AND game_id = ? AND user_id = ?
+        ORDER BY id
+    ''', (project_id, game_id, user_id)):
+        existing.setdefault(file_path, (template_id, name, content))
+
+    summary = {'created': [], 'updated': [], 'unchanged': []}
+    inserts = []
+    updates = []
+    for (file_path, content), names in zip(files, variables):
+        current = existing.get(file_path)
+        if current is None:
+            name = Path(file_path).name
+            summary['created'].append({'id': None, 'name': name, 'file_path': file_path})
+            inserts.append((project_id, game_id, name, file_path, content,
+                            json.dumps(config_items(names)), user_id))
+        elif current[2] == content:
+            summary['unchanged'].append({'id': current[0], 'name': current[1], 'file_path': file_path})
+        else:
+            summary['updated'].append({'id': current[0], 'name': current[1], 'file_path': file_path})
+            updates.append((content, json.dumps(config_items(names)), current[0], user_id))
+    if dry_run:
+        return summary
+
+    conn.executemany('''
+        INSERT INTO config_templates (project_id, game_id, name, file_path, template_content, config_items, user_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', inserts)
+    conn.executemany('''
+        UPDATE config_templates SET template_content = ?, config_items = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND user_id = ?
+    ''', updates)
+
+    # 取回新模板的ID
+    ids = {}
+    for chunk in chunked([item['file_path'] for item in summary['created']]):
+        placeholders = ', '.join('?' * len(chunk))
+        for template_id, file_path in conn.execute(f'''
+            SELECT id, file_path FROM config_templates
+            WHERE project_id = ? AND game_id = ? AND user_id = ? AND file_path IN ({placeholders})
+        ''', (project_id, game_id, user_id, *chunk)):
+            ids.setdefault(file_path, template_id)
+    for item in summary['created']:
+        item['id'] = ids.get(item['file_path'])
+    return summary
+
+
+def write_template_files(template_dir, files):
+    """把模板内容写入模板目录（保留相对目录层级）"""
+    template_dir = Path(template_dir)
+    with stage('file_write'):
+        for file_path, content in files:
+            target = template_dir / file_path
+            os.makedirs(target.parent, exist_ok=True)
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(content)
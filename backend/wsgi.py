@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生产环境WSGI入口 - 由gunicorn在每个工作进程中加载（数据库初始化由gunicorn.conf.py在主进程中完成）
+"""
+
+from app import app
+
+application = app
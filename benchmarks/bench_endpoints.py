@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接口基准测试 - 在合成区服数据上通过Flask测试客户端测量主要接口的延迟与吞吐量，结果输出为JSON便于跨提交对比
+
+用法: python benchmarks/bench_endpoints.py [--preset small] [--iterations 50] [--output result.json]
+对比: python benchmarks/compare.py old.json new.json
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_dir))
+
+from common import environment_info, summarize, write_results
+from fleet_data import add_dataset_arguments, load_layout, seed_fleet, spec_from_args
+
+
+class Case:
+    """一个被测项：request(i)执行第i次调用并返回(状态码, 响应字节数)；before(i)在计时前执行"""
+
+    def __init__(self, name, request, before=None):
+        self.name = name
+        self.request = request
+        self.before = before
+
+
+def run_case(case, iterations, warmup):
+    """预热后逐次计时，返回统计结果"""
+    for i in range(warmup):
+        if case.before:
+            case.before(i)
+        case.request(i)
+    latencies = []
+    statuses = {}
+    total_bytes = 0
+    for i in range(iterations):
+        if case.before:
+            case.before(i)
+        started = time.perf_counter()
+        status, size = case.request(i)
+        latencies.append(time.perf_counter() - started)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        total_bytes += size
+    result = summarize(latencies)
+    result['statuses'] = statuses
+    result['mean_bytes'] = total_bytes // max(iterations, 1)
+    return result
+
+
+def build_cases(app_module, client, layout, rnd):
+    """按数据布局构造被测项"""
+    list_cache = app_module.list_cache
+    archive_cache = app_module.archive_cache
+    games = sorted(layout)
+    game_id = games[len(games) // 2]
+    game = layout[game_id]
+    servers = game['servers']
+    smallest, largest = game['templates'][0], game['templates'][-1]
+
+    def get(path):
+        def request(i):
+            response = client.get(path)
+            return response.status_code, len(response.data)
+        return request
+
+    def clear_list_cache(i):
+        list_cache.clear()
+
+    contents = {}
+    file_paths = {}
+    zip_server = servers[0]
+    with sqlite3.connect(app_module.app.config['DATABASE_PATH']) as conn:
+        for template_id, _ in (smallest, largest):
+            contents[template_id], file_paths[template_id] = conn.execute(
+                'SELECT template_content, file_path FROM config_templates WHERE id = ?', (template_id,)).fetchone()
+        zip_names = conn.execute('''
+            SELECT p.name, g.name, s.name FROM servers s
+            JOIN games g ON s.game_id = g.id JOIN projects p ON g.project_id = p.id
+            WHERE s.id = ?
+        ''', (zip_server,)).fetchone()
+    config_data = {item['key']: f'value_{i}' for i, item in
+                   enumerate(app_module.get_template_config_items(contents[largest[0]]))}
+
+    def generate(template_id):
+        def request(i):
+            response = client.post('/api/generate-config', json={
+                'server_id': servers[i % len(servers)],
+                'template_id': template_id,
+                'config_data': dict(config_data, server_name=f'run_{rnd.random()}')
+            })
+            return response.status_code, len(response.data)
+        return request
+
+    def config_items(template_id):
+        content = contents[template_id]
+
+        def request(i):
+            items = app_module.get_template_config_items(content)
+            return 200, len(items)
+        return request
+
+    def update_template(template_id):
+        content = contents[template_id]
+
+        def request(i):
+            response = client.put(f'/api/templates/{template_id}', json={
+                'name': f'updated_{i}', 'file_path': file_paths[template_id], 'template_content': content
+            })
+            return response.status_code, len(response.data)
+        return request
+
+    # 下载测试的区服先生成全部模板
+    response = client.post('/api/generate-batch', json={
+        'server_ids': [zip_server], 'template_ids': 'all', 'config_data': config_data
+    })
+    if response.status_code != 200:
+        raise RuntimeError(f'准备下载数据失败: {response.status_code} {response.get_data(as_text=True)[:200]}')
+    zip_body = dict(zip(('project_name', 'game_name', 'server_name'), zip_names))
+
+    def download(i):
+        response = client.post('/api/download-generated-zip', json=zip_body)
+        return response.status_code, len(response.data)
+
+    def clear_archive_cache(i):
+        shutil.rmtree(str(archive_cache.folder), ignore_errors=True)
+
+    return [
+        Case('list_projects', get('/api/projects')),
+        Case('list_games', get('/api/games')),
+        Case('list_servers', get('/api/servers')),
+        Case('list_servers_cold', get('/api/servers'), before=clear_list_cache),
+        Case('list_servers_page', get('/api/servers?limit=100&fields=id,name,server_id'), before=clear_list_cache),
+        Case('list_templates', get('/api/templates')),
+        Case('list_templates_cold', get('/api/templates'), before=clear_list_cache),
+        Case('game_servers', get(f'/api/games/{game_id}/servers')),
+        Case('tree_game', get(f'/api/tree?game_id={game_id}&depth=templates'), before=clear_list_cache),
+        Case('generate_config_small', generate(smallest[0])),
+        Case('generate_config_large', generate(largest[0])),
+        Case('config_items_small', config_items(smallest[0])),
+        Case('config_items_large', config_items(largest[0])),
+        Case('update_template_large', update_template(largest[0])),
+        Case('download_zip', download),
+        Case('download_zip_cold', download, before=clear_archive_cache),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='接口基准测试')
+    add_dataset_arguments(parser)
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--cases', help='只运行指定项（逗号分隔）')
+    parser.add_argument('--workdir', help='数据库与生成目录（默认临时目录；目录中已有数据库时直接复用）')
+    parser.add_argument('--output', help='结果JSON路径（默认benchmarks/results/endpoints-<提交>.json，-为标准输出）')
+    parser.add_argument('--label', help='结果标签')
+    args = parser.parse_args()
+    spec = spec_from_args(args)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='conf_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, 'bench.db')
+    reuse = os.path.exists(db_path)
+    os.environ['DATABASE_PATH'] = db_path
+    for name in ('GENERATED', 'DOWNLOAD', 'TEMPLATE', 'UPLOAD'):
+        os.environ[f'{name}_DIR'] = os.path.join(workdir, name.lower())
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # 应用在导入时读取上述环境变量
+    import app as app_module
+    app_module.init_database()
+
+    conn = sqlite3.connect(db_path)
+    user_id = conn.execute("SELECT id FROM users WHERE username = 'admin'").fetchone()[0]
+    if reuse:
+        layout, seed_seconds = load_layout(conn, user_id), None
+    else:
+        layout, seed_seconds = seed_fleet(conn, user_id, spec, app_module.get_template_config_items)
+    conn.close()
+    if not layout:
+        sys.exit('数据库中没有数据')
+
+    client = app_module.app.test_client()
+    response = client.post('/login', json={'username': 'admin', 'password': 'admin'})
+    if response.status_code != 200:
+        sys.exit(f'登录失败: {response.status_code}')
+
+    cases = build_cases(app_module, client, layout, random.Random(42))
+    if args.cases:
+        wanted = set(args.cases.split(','))
+        cases = [case for case in cases if case.name in wanted]
+
+    results = {}
+    print(f'{"case":24s} {"p50 ms":>10s} {"p95 ms":>10s} {"p99 ms":>10s} {"req/s":>10s}')
+    for case in cases:
+        result = run_case(case, args.iterations, args.warmup)
+        results[case.name] = result
+        print(f'{case.name:24s} {result["p50_ms"]:10.3f} {result["p95_ms"]:10.3f} '
+              f'{result["p99_ms"]:10.3f} {result["throughput_rps"]:10.1f}')
+
+    output = write_results({
+        'benchmark': 'endpoints',
+        'label': args.label,
+        'environment': environment_info(),
+        'dataset': {
+            'spec': spec if not reuse else None,
+            'reused_db': reuse,
+            'games': len(layout),
+            'servers': sum(len(g['servers']) for g in layout.values()),
+            'templates': sum(len(g['templates']) for g in layout.values()),
+            'seed_seconds': seed_seconds
+        },
+        'iterations': args.iterations,
+        'results': results
+    }, args.output, 'endpoints')
+    print(f'结果: {output}')
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
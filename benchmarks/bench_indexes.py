@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+索引迁移基准测试 - 对比加索引前后列表查询的执行计划与耗时
+
+用法: python benchmarks/bench_indexes.py [--servers 50000] [--users 20]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_dir))
+
+from app import app, init_database
+from migrations import add_list_indexes
+
+# 被测查询：与各列表API保持一致；参数取自同一用户的项目、游戏与该游戏中的区服
+TARGET_USER, TARGET_GAME, TARGET_PROJECT = 3, 25, 3
+QUERIES = {
+    'get_projects': ('''
+        SELECT id, name, description, created_at, updated_at
+        FROM projects WHERE user_id = ?
+        ORDER BY updated_at DESC
+    ''', lambda uid, gid, pid, sid: (uid,)),
+    'get_all_servers': ('''
+        SELECT s.id, s.game_id, s.name, s.server_id, s.description, s.created_at, s.updated_at,
+               g.name as game_name, p.name as project_name
+        FROM servers s
+        LEFT JOIN games g ON s.game_id = g.id
+        LEFT JOIN projects p ON g.project_id = p.id
+        WHERE s.user_id = ?
+        ORDER BY s.created_at DESC
+    ''', lambda uid, gid, pid, sid: (uid,)),
+    'get_servers': ('''
+        SELECT id, name, server_id, description, created_at, updated_at
+        FROM servers
+        WHERE game_id = ? AND user_id = ?
+        ORDER BY created_at DESC
+    ''', lambda uid, gid, pid, sid: (gid, uid)),
+    'get_config_templates': ('''
+        SELECT id, name, file_path, config_items, created_at, updated_at
+        FROM config_templates
+        WHERE project_id = ? AND game_id = ? AND user_id = ?
+        ORDER BY created_at DESC
+    ''', lambda uid, gid, pid, sid: (pid, gid, uid)),
+    'config_files_history': ('''
+        SELECT id, file_name, created_at FROM config_files
+        WHERE server_id = ? ORDER BY created_at DESC LIMIT 20
+    ''', lambda uid, gid, pid, sid: (sid,)),
+}
+
+
+def seed(conn, users, servers):
+    """按用户均匀生成项目/游戏/区服/模板/生成记录"""
+    rnd = random.Random(42)
+    games_per_user = 10
+    conn.executemany('INSERT INTO projects (name, user_id) VALUES (?, ?)',
+                     [(f'P{u}', u) for u in range(1, users + 1)])
+    conn.executemany('INSERT INTO games (project_id, name, user_id) VALUES (?, ?, ?)',
+                     [(u, f'G{u}_{i}', u) for u in range(1, users + 1) for i in range(games_per_user)])
+    game_count = users * games_per_user
+    conn.executemany('''
+        INSERT INTO servers (game_id, name, server_id, user_id, created_at)
+        VALUES (?, ?, ?, ?, datetime('now', ?))
+    ''', [
+        (g, f'S{n}', f's{n:06d}', (g - 1) // games_per_user + 1, f'-{rnd.randint(0, 100000)} seconds')
+        for n in range(servers)
+        for g in [rnd.randint(1, game_count)]
+    ])
+    conn.executemany('''
+        INSERT INTO config_templates (project_id, game_id, name, file_path, config_items, user_id)
+        VALUES (?, ?, ?, ?, '[]', ?)
+    ''', [((g - 1) // games_per_user + 1, g, f'T{g}_{i}', f'conf/{i}.ini', (g - 1) // games_per_user + 1)
+          for g in range(1, game_count + 1) for i in range(5)])
+    conn.executemany('''
+        INSERT INTO config_files (server_id, file_name, file_path) VALUES (?, ?, ?)
+    ''', [(rnd.randint(1, servers), 'a.ini', 'conf/a.ini') for _ in range(servers * 2)])
+    conn.commit()
+
+
+def drop_indexes(conn):
+    """删除迁移创建的索引，模拟迁移前的表结构"""
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall()
+    for (name,) in rows:
+        conn.execute(f'DROP INDEX {name}')
+    conn.commit()
+
+
+def target_server(conn):
+    """被测游戏中生成记录最多的区服ID"""
+    row = conn.execute('''
+        SELECT s.id FROM servers s LEFT JOIN config_files f ON f.server_id = s.id
+        WHERE s.game_id = ? GROUP BY s.id ORDER BY COUNT(f.id) DESC, s.id LIMIT 1
+    ''', (TARGET_GAME,)).fetchone()
+    if row is None:
+        raise SystemExit(f'游戏{TARGET_GAME}中没有区服，请增大--servers')
+    return row[0]
+
+
+def measure(conn, label, repeat, server_id):
+    """输出每个查询的执行计划和平均耗时"""
+    results = {}
+    print(f'\n=== {label} ===')
+    for name, (sql, params) in QUERIES.items():
+        args = params(TARGET_USER, TARGET_GAME, TARGET_PROJECT, server_id)
+        plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, args)]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, args).fetchall()
+        elapsed_ms = (time.perf_counter() - start) / repeat * 1000
+        results[name] = elapsed_ms
+        print(f'{name:24s} {elapsed_ms:9.3f} ms  | ' + ' ; '.join(plan))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='索引迁移基准测试')
+    parser.add_argument('--servers', type=int, default=50000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DATABASE_PATH'] = os.path.join(tmp, 'bench.db')
+        init_database()
+        conn = sqlite3.connect(app.config['DATABASE_PATH'])
+        seed(conn, args.users, args.servers)
+        server_id = target_server(conn)
+
+        drop_indexes(conn)
+        conn.execute('ANALYZE')
+        before = measure(conn, '迁移前（无二级索引）', args.repeat, server_id)
+
+        add_list_indexes(conn)
+        conn.execute('ANALYZE')
+        conn.commit()
+        after = measure(conn, '迁移后（复合索引）', args.repeat, server_id)
+        conn.close()
+
+    print('\n=== 加速比 ===')
+    for name in QUERIES:
+        print(f'{name:24s} x{before[name] / max(after[name], 1e-6):.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板渲染基准测试 - 对比逐变量str.replace与编译后单次渲染
+
+用法: python benchmarks/bench_render.py [--size 102400] [--variables 200]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_dir))
+
+from renderer import CompiledTemplate, TemplateCache
+
+
+def build_template(size, variables):
+    """生成约size字节、包含variables个不同变量的模板"""
+    rnd = random.Random(42)
+    keys = [f'var_{i}' for i in range(variables)]
+    lines = []
+    total = 0
+    while total < size:
+        key = rnd.choice(keys)
+        line = f'setting_{len(lines)} = {{{{ {key} }}}}  # ' + 'x' * rnd.randint(10, 60) + '\n'
+        lines.append(line)
+        total += len(line)
+    return ''.join(lines), {key: f'value_{key}' for key in keys}
+
+
+def replace_loop(template_content, config_data):
+    """旧实现：每个变量对整个模板执行一次replace"""
+    generated_content = template_content
+    for key, value in config_data.items():
+        placeholder = f'{{{{ {key} }}}}'
+        generated_content = generated_content.replace(placeholder, str(value))
+    return generated_content
+
+
+def timeit(func, repeat):
+    """返回平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模板渲染基准测试')
+    parser.add_argument('--size', type=int, default=100 * 1024)
+    parser.add_argument('--variables', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    content, config_data = build_template(args.size, args.variables)
+    cache = TemplateCache()
+    assert replace_loop(content, config_data) == CompiledTemplate(content).render(config_data)
+
+    results = {
+        'replace_loop': timeit(lambda: replace_loop(content, config_data), args.repeat),
+        'compile_and_render': timeit(lambda: CompiledTemplate(content).render(config_data), args.repeat),
+        'cached_render': timeit(lambda: cache.get(1, content).render(config_data), args.repeat),
+    }
+
+    print(f'模板大小: {len(content)} 字节, 变量数: {len(config_data)}, 重复: {args.repeat}')
+    baseline = results['replace_loop']
+    for name, elapsed_ms in results.items():
+        print(f'{name:20s} {elapsed_ms:9.3f} ms  x{baseline / elapsed_ms:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试公共函数 - 延迟统计、版本信息与JSON结果输出
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+REPO_DIR = Path(__file__).parent.parent
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+
+def percentile(sorted_values, q):
+    """最近秩百分位数，sorted_values需已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, elapsed=None):
+    """延迟（秒）列表的统计结果（毫秒）；elapsed为总墙钟时间，缺省时按延迟之和计算吞吐量"""
+    values = sorted(latencies)
+    count = len(values)
+    elapsed = elapsed if elapsed is not None else sum(values)
+    return {
+        'count': count,
+        'min_ms': round(values[0] * 1000, 3) if values else 0.0,
+        'mean_ms': round(sum(values) / count * 1000, 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+        'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0
+    }
+
+
+def git_revision():
+    """当前提交（工作区有修改时加-dirty），不在git仓库中时返回None"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ('-dirty' if dirty else '')
+
+
+def environment_info():
+    """运行环境信息，随结果一起保存便于对比"""
+    return {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def write_results(results, output, prefix):
+    """写出JSON结果；未指定output时写入benchmarks/results/{prefix}-{提交}.json，返回文件路径"""
+    if output == '-':
+        json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+        return '-'
+    if not output:
+        revision = results.get('environment', {}).get('revision') or 'norev'
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = RESULTS_DIR / f'{prefix}-{revision}.json'
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return str(output)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准结果对比 - 对比两次bench_endpoints/loadtest输出的JSON，列出各项延迟与吞吐量的变化
+
+用法: python benchmarks/compare.py old.json new.json [--metric p50_ms] [--threshold 10]
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dataset_key(result):
+    """用于判断两次运行数据规模是否一致（不含写入耗时等运行信息）"""
+    dataset = result.get('dataset') or {}
+    return {key: dataset.get(key) for key in ('games', 'servers', 'templates', 'users')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基准结果对比')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--metric', default='p50_ms', help='对比的延迟指标（p50_ms/p95_ms/p99_ms/mean_ms）')
+    parser.add_argument('--threshold', type=float, default=10.0, help='变化超过该百分比时标记')
+    args = parser.parse_args()
+
+    old, new = load(args.old), load(args.new)
+    old_env, new_env = old.get('environment', {}), new.get('environment', {})
+    print(f'旧: {old_env.get("revision")} {old.get("label") or ""}  新: {new_env.get("revision")} {new.get("label") or ""}')
+    if dataset_key(old) != dataset_key(new):
+        print('注意: 两次运行的数据规模不同')
+
+    print(f'{"case":24s} {"old " + args.metric:>14s} {"new " + args.metric:>14s} {"change":>9s} {"old rps":>10s} {"new rps":>10s}')
+    regressions = 0
+    for name in sorted(set(old['results']) | set(new['results'])):
+        before, after = old['results'].get(name), new['results'].get(name)
+        if before is None or after is None:
+            print(f'{name:24s} {"仅旧结果" if after is None else "仅新结果":>14s}')
+            continue
+        base, value = before[args.metric], after[args.metric]
+        change = (value - base) / base * 100 if base else 0.0
+        flag = ''
+        if change > args.threshold:
+            flag = '  变慢'
+            regressions += 1
+        elif change < -args.threshold:
+            flag = '  变快'
+        print(f'{name:24s} {base:14.3f} {value:14.3f} {change:+8.1f}% '
+              f'{before["throughput_rps"]:10.1f} {after["throughput_rps"]:10.1f}{flag}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成区服数据 - 按指定规模批量写入项目/游戏/区服/模板，供基准测试与压测使用
+
+用法: python benchmarks/fleet_data.py --db /tmp/fleet.db [--preset medium] [--servers 2000] [--accounts 20]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+backend_dir = Path(__file__).parent.parent / 'backend'
+sys.path.insert(0, str(backend_dir))
+
+from bench_render import build_template
+
+# 规模预设：projects为项目数，games/servers/templates分别为每个项目的游戏数、每个游戏的区服数与模板数；
+# 同一游戏内的模板大小从min_size到max_size按几何级数分布
+DATASET_PRESETS = {
+    'small': {'projects': 2, 'games': 3, 'servers': 50, 'templates': 5,
+              'min_size': 1024, 'max_size': 64 * 1024, 'variables': 50},
+    'medium': {'projects': 5, 'games': 10, 'servers': 500, 'templates': 8,
+               'min_size': 1024, 'max_size': 256 * 1024, 'variables': 200},
+    'large': {'projects': 10, 'games': 20, 'servers': 2000, 'templates': 10,
+              'min_size': 1024, 'max_size': 1024 * 1024, 'variables': 300},
+}
+
+# 压测账号：第i个虚拟用户登录LOADTEST_USERNAME.format(i)，每个账号各有一份数据
+LOADTEST_USERNAME = 'loadtest_user_{}'
+LOADTEST_PASSWORD = 'loadtest'
+
+
+def dataset_spec(preset='small', **overrides):
+    """预设规模加上命令行覆盖项（值为None的忽略）"""
+    spec = dict(DATASET_PRESETS[preset])
+    spec.update({key: value for key, value in overrides.items() if value is not None})
+    return spec
+
+
+def template_sizes(spec):
+    """同一游戏内各模板的目标大小"""
+    count, low, high = spec['templates'], spec['min_size'], spec['max_size']
+    if count == 1:
+        return [high]
+    return [int(low * (high / low) ** (i / (count - 1))) for i in range(count)]
+
+
+def add_dataset_arguments(parser):
+    """为命令行添加数据规模参数"""
+    parser.add_argument('--preset', choices=sorted(DATASET_PRESETS), default='small')
+    parser.add_argument('--projects', type=int)
+    parser.add_argument('--games', type=int, help='每个项目的游戏数')
+    parser.add_argument('--servers', type=int, help='每个游戏的区服数')
+    parser.add_argument('--templates', type=int, help='每个游戏的模板数')
+    parser.add_argument('--min-size', type=int, dest='min_size', help='最小模板字节数')
+    parser.add_argument('--max-size', type=int, dest='max_size', help='最大模板字节数')
+    parser.add_argument('--variables', type=int, help='每个模板的变量数')
+
+
+def spec_from_args(args):
+    return dataset_spec(args.preset, projects=args.projects, games=args.games, servers=args.servers,
+                        templates=args.templates, min_size=args.min_size, max_size=args.max_size,
+                        variables=args.variables)
+
+
+def seed_fleet(conn, user_id, spec, config_items=None):
+    """
+    写入合成数据（单个事务），返回 {game_id: {'project_id', 'templates': [(id, 大小)], 'servers': [id...]}}
+    config_items: 由模板内容计算配置项列表的函数（可选，缺省时写入空列表）
+    """
+    started = time.perf_counter()
+    contents = []
+    for size in template_sizes(spec):
+        content, _ = build_template(size, spec['variables'])
+        items = json.dumps(config_items(content) if config_items else [], ensure_ascii=False)
+        contents.append((size, content, items))
+
+    layout = {}
+    cursor = conn.cursor()
+    for p in range(spec['projects']):
+        cursor.execute('INSERT INTO projects (name, description, user_id) VALUES (?, ?, ?)',
+                       (f'bench_project_{p}', '基准测试数据', user_id))
+        project_id = cursor.lastrowid
+        for g in range(spec['games']):
+            cursor.execute('INSERT INTO games (project_id, name, user_id) VALUES (?, ?, ?)',
+                           (project_id, f'bench_game_{p}_{g}', user_id))
+            game_id = cursor.lastrowid
+            cursor.executemany('''
+                INSERT INTO servers (game_id, name, server_id, user_id) VALUES (?, ?, ?, ?)
+            ''', [(game_id, f'S{n}区', f's{game_id}_{n:05d}', user_id) for n in range(spec['servers'])])
+            cursor.executemany('''
+                INSERT INTO config_templates (project_id, game_id, name, file_path, template_content, config_items, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(project_id, game_id, f'template_{i}_{size}', f'conf/t{i}.conf',
+                   f'# game {game_id} template {i}\n' + content, items, user_id)
+                  for i, (size, content, items) in enumerate(contents)])
+            templates = cursor.execute('''
+                SELECT id, length(template_content) FROM config_templates WHERE game_id = ? ORDER BY id
+            ''', (game_id,)).fetchall()
+            servers = [row[0] for row in cursor.execute('SELECT id FROM servers WHERE game_id = ? ORDER BY id',
+                                                        (game_id,))]
+            layout[game_id] = {'project_id': project_id, 'templates': templates, 'servers': servers}
+    conn.commit()
+    conn.execute('ANALYZE')
+    return layout, round(time.perf_counter() - started, 3)
+
+
+def create_user(conn, username, password):
+    """新建普通用户，返回用户ID；用户已存在时返回None"""
+    cursor = conn.execute('''
+        INSERT OR IGNORE INTO users (username, password_hash, email, role) VALUES (?, ?, ?, 'user')
+    ''', (username, hashlib.sha256(password.encode()).hexdigest(), f'{username}@example.com'))
+    conn.commit()
+    return cursor.lastrowid if cursor.rowcount else None
+
+
+def load_layout(conn, user_id):
+    """读取已有数据库中的数据布局（复用已写入的数据时使用）"""
+    layout = {}
+    for game_id, project_id in conn.execute('SELECT id, project_id FROM games WHERE user_id = ? ORDER BY id',
+                                            (user_id,)):
+        templates = conn.execute('''
+            SELECT id, length(template_content) FROM config_templates WHERE game_id = ? ORDER BY id
+        ''', (game_id,)).fetchall()
+        servers = [row[0] for row in conn.execute('SELECT id FROM servers WHERE game_id = ? ORDER BY id',
+                                                  (game_id,))]
+        layout[game_id] = {'project_id': project_id, 'templates': templates, 'servers': servers}
+    return layout
+
+
+def main():
+    parser = argparse.ArgumentParser(description='写入合成区服数据')
+    parser.add_argument('--db', required=True, help='数据库文件（不存在时创建）')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--accounts', type=int,
+                        help=f'改为新建这么多个压测账号（{LOADTEST_USERNAME.format("<序号>")}），各写入一份数据；已存在的账号跳过')
+    parser.add_argument('--password', default=LOADTEST_PASSWORD, help='压测账号的密码')
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+    spec = spec_from_args(args)
+
+    os.environ['DATABASE_PATH'] = os.path.abspath(args.db)
+    # 应用按环境变量中的路径初始化数据库，需在设置后导入
+    from app import init_database, get_template_config_items
+    init_database()
+
+    conn = sqlite3.connect(args.db)
+    if args.accounts is not None:
+        user_ids = [create_user(conn, LOADTEST_USERNAME.format(i), args.password) for i in range(args.accounts)]
+        user_ids = [user_id for user_id in user_ids if user_id is not None]
+    else:
+        row = conn.execute('SELECT id FROM users WHERE username = ?', (args.username,)).fetchone()
+        if not row:
+            sys.exit(f'用户不存在: {args.username}')
+        user_ids = [row[0]]
+
+    for user_id in user_ids:
+        layout, elapsed = seed_fleet(conn, user_id, spec, get_template_config_items)
+        servers = sum(len(game['servers']) for game in layout.values())
+        templates = sum(len(game['templates']) for game in layout.values())
+        print(f'写入完成(用户{user_id}): {len(layout)}个游戏, {servers}个区服, {templates}个模板, 耗时{elapsed}秒')
+    conn.close()
+    print('规模: ' + json.dumps(spec))
+
+
+if __name__ == '__main__':
+    main()
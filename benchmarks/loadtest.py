@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发压测 - 模拟多个已登录用户同时浏览列表、编辑模板和生成配置，统计各操作的延迟分位数、错误率（如database is locked）与吞吐量
+
+用法:
+  python benchmarks/loadtest.py --users 20 --duration 30                 启动生产模式（gunicorn）实例并压测
+  python benchmarks/loadtest.py --serve dev --users 20                   启动Flask开发服务器实例并压测
+  python benchmarks/loadtest.py --url http://127.0.0.1:5000 --users 20   压测已运行的实例（压测账号需先用fleet_data.py --accounts写入）
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from common import environment_info, summarize, write_results
+from fleet_data import DATASET_PRESETS, LOADTEST_PASSWORD, LOADTEST_USERNAME
+
+REPO_DIR = Path(__file__).parent.parent
+BACKEND_DIR = REPO_DIR / 'backend'
+
+# 默认操作比例：列表浏览为主，其次是生成，编辑模板最少
+DEFAULT_MIX = 'list=6,generate=3,edit=1'
+OPERATIONS = ('list', 'generate', 'edit')
+
+
+class LoadClient:
+    """单个虚拟用户：独立的长连接与登录会话"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookie = None
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        """返回(状态码, 响应体)；连接异常时重连一次后再抛出"""
+        headers = {'Content-Type': 'application/json'}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            set_cookie = response.getheader('Set-Cookie')
+            if set_cookie:
+                self.cookie = set_cookie.split(';', 1)[0]
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+            return response.status, data
+
+    def login(self, username, password):
+        status, data = self.request('POST', '/login', {'username': username, 'password': password})
+        if status != 200:
+            raise RuntimeError(f'登录失败: {status} {data[:200]!r}')
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class Workload:
+    """操作定义：从已有数据中随机选取项目/游戏/区服/模板"""
+
+    def __init__(self, games, config_data):
+        self.games = games
+        self.config_data = config_data
+        self._contents = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def discover(cls, client, max_games):
+        """通过层级树接口获取可操作的数据"""
+        status, data = client.request('GET', '/api/tree?depth=games')
+        if status != 200:
+            raise RuntimeError(f'获取层级失败: {status}')
+        game_ids = [(g['id'], p['id']) for p in json.loads(data) for g in p['games']]
+        if not game_ids:
+            raise RuntimeError('没有可用的游戏数据，请先写入数据（benchmarks/fleet_data.py）')
+        games = []
+        for game_id, project_id in random.Random(42).sample(game_ids, min(max_games, len(game_ids))):
+            status, data = client.request('GET', f'/api/tree?game_id={game_id}&depth=templates')
+            game = json.loads(data)[0]['games'][0]
+            if game['servers'] and game['templates']:
+                games.append({'id': game_id, 'project_id': project_id,
+                              'servers': [s['id'] for s in game['servers']],
+                              'templates': [(t['id'], t['name'], t['file_path']) for t in game['templates']]})
+        if not games:
+            raise RuntimeError('没有同时包含区服和模板的游戏')
+        # 生成时为模板中的全部变量提供值
+        template_id = games[0]['templates'][0][0]
+        status, data = client.request('GET', f'/api/templates/{template_id}')
+        items = json.loads(data).get('config_items', []) if status == 200 else []
+        return cls(games, {item['key']: f'load_{i}' for i, item in enumerate(items)})
+
+    def template_content(self, client, template_id):
+        """编辑模板时使用的原始内容（每个模板只获取一次）"""
+        with self._lock:
+            content = self._contents.get(template_id)
+        if content is None:
+            status, data = client.request('GET', f'/api/templates/{template_id}')
+            content = json.loads(data)['template_content'] if status == 200 else ''
+            with self._lock:
+                self._contents[template_id] = content
+        return content
+
+    def run(self, operation, client, rnd):
+        """执行一次操作，返回(操作名, 状态码, 响应体)"""
+        game = rnd.choice(self.games)
+        if operation == 'list':
+            path = rnd.choice([
+                '/api/projects',
+                '/api/servers?limit=100',
+                '/api/templates?limit=100',
+                f'/api/games/{game["id"]}/servers',
+                f'/api/tree?game_id={game["id"]}&depth=servers',
+            ])
+            return ('list',) + client.request('GET', path)
+        if operation == 'generate':
+            body = {'server_id': rnd.choice(game['servers']), 'template_id': rnd.choice(game['templates'])[0],
+                    'config_data': dict(self.config_data, server_name=f'run_{rnd.randrange(1000)}')}
+            return ('generate',) + client.request('POST', '/api/generate-config', body)
+        template_id, name, file_path = rnd.choice(game['templates'])
+        content = self.template_content(client, template_id)
+        body = {'name': name, 'file_path': file_path,
+                'template_content': content.rstrip('\n') + f'\n# edited {rnd.randrange(1000000)}\n'}
+        return ('edit',) + client.request('PUT', f'/api/templates/{template_id}', body)
+
+
+def classify_error(status, body):
+    """错误分类：database_locked / http_<状态码>"""
+    if b'database is locked' in body or b'database table is locked' in body:
+        return 'database_locked'
+    return f'http_{status}'
+
+
+def parse_mix(text):
+    """解析操作比例，如 list=6,generate=3,edit=1"""
+    weights = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f'未知操作: {name}（可选 {", ".join(OPERATIONS)}）')
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def virtual_user(index, args, workloads, weights, records, start_barrier):
+    """
+    单个虚拟用户的循环：用自己的账号登录并获取该账号的数据，等待全部用户就绪后
+    按比例随机执行操作直到压测时长结束
+    """
+    rnd = random.Random(args.seed + index)
+    client = LoadClient(args.url, args.timeout)
+    names, probabilities = zip(*weights.items())
+    local = []
+    try:
+        try:
+            client.login(args.username or LOADTEST_USERNAME.format(index), args.password)
+            workload = Workload.discover(client, args.games)
+        except Exception:
+            # 任一用户准备失败时让全部用户与主线程退出等待
+            start_barrier.abort()
+            raise
+        workloads[index] = workload
+        start_barrier.wait()
+        deadline = time.monotonic() + args.duration
+        while time.monotonic() < deadline:
+            operation = rnd.choices(names, probabilities)[0]
+            started = time.perf_counter()
+            try:
+                operation, status, body = workload.run(operation, client, rnd)
+                error = None if status < 400 else classify_error(status, body)
+            except (OSError, http.client.HTTPException) as e:
+                error = f'connection_{type(e).__name__}'
+            local.append((operation, time.perf_counter() - started, error))
+            if args.think:
+                time.sleep(rnd.uniform(0, 2 * args.think))
+    except threading.BrokenBarrierError:
+        pass
+    finally:
+        client.close()
+        records.extend(local)
+
+
+def report(records, elapsed):
+    """按操作汇总延迟分位数、吞吐量与错误率"""
+    results = {}
+    for name in sorted({r[0] for r in records}) + ['all']:
+        selected = [r for r in records if name == 'all' or r[0] == name]
+        ok = [latency for _, latency, error in selected if error is None]
+        errors = {}
+        for _, _, error in selected:
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+        result = summarize(ok, elapsed)
+        result['requests'] = len(selected)
+        result['errors'] = errors
+        result['error_rate'] = round(sum(errors.values()) / len(selected), 4) if selected else 0.0
+        results[name] = result
+    return results
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, workdir, port, args):
+    """在独立数据目录中写入合成数据并启动实例，返回子进程"""
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_PATH': os.path.join(workdir, 'load.db'),
+        'PORT': str(port),
+        'LOG_LEVEL': 'WARNING',
+        'WEB_ACCESS_LOG': os.path.join(workdir, 'access.log'),
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+    })
+    for name in ('GENERATED', 'DOWNLOAD', 'TEMPLATE', 'UPLOAD'):
+        env[f'{name}_DIR'] = os.path.join(workdir, name.lower())
+    if args.web_workers:
+        env['WEB_WORKERS'] = str(args.web_workers)
+
+    seed_command = [sys.executable, str(Path(__file__).parent / 'fleet_data.py'),
+                    '--db', env['DATABASE_PATH'], '--preset', args.preset]
+    if args.servers:
+        seed_command += ['--servers', str(args.servers)]
+    if args.username:
+        # 共用账号：只在新建数据库时为该账号写入数据
+        if not os.path.exists(env['DATABASE_PATH']):
+            subprocess.run(seed_command + ['--username', args.username], env=env, check=True,
+                           stdout=subprocess.DEVNULL)
+    else:
+        # 每个虚拟用户一个压测账号；复用数据目录时只为新增的账号写入数据
+        subprocess.run(seed_command + ['--accounts', str(args.users), '--password', args.password], env=env,
+                       check=True, stdout=subprocess.DEVNULL)
+
+    if mode == 'production':
+        command = [sys.executable, '-m', 'gunicorn', '-c', str(BACKEND_DIR / 'gunicorn.conf.py'), 'wsgi:app']
+    else:
+        command = [sys.executable, '-c',
+                   f'from app import app, init_database; init_database(); '
+                   f'app.run(host="127.0.0.1", port={port}, threaded=True)']
+    log = open(os.path.join(workdir, 'server.log'), 'wb')
+    process = subprocess.Popen(command, cwd=str(BACKEND_DIR), env=env, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    return process
+
+
+def wait_ready(url, process, timeout=30):
+    """等待实例开始响应"""
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f'服务进程已退出: {process.returncode}')
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            conn.request('GET', '/metrics')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('等待服务启动超时')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并发压测')
+    parser.add_argument('--url', help='压测已运行的实例（不指定时自动启动实例）')
+    parser.add_argument('--serve', choices=('production', 'dev'), default='production', help='自动启动的实例类型')
+    parser.add_argument('--web-workers', type=int, help='自动启动生产模式实例时的工作进程数')
+    parser.add_argument('--preset', choices=sorted(DATASET_PRESETS), default='small', help='自动启动时写入的数据规模')
+    parser.add_argument('--servers', type=int, help='自动启动时每个游戏的区服数')
+    parser.add_argument('--workdir', help='自动启动实例的数据目录（默认临时目录；已有数据库时直接复用）')
+    parser.add_argument('--users', type=int, default=10, help='并发用户数')
+    parser.add_argument('--duration', type=float, default=20, help='压测时长（秒）')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'操作比例（默认{DEFAULT_MIX}）')
+    parser.add_argument('--think', type=float, default=0, help='每次操作后的平均等待时间（秒）')
+    parser.add_argument('--games', type=int, default=5, help='参与压测的游戏数')
+    parser.add_argument('--username',
+                        help=f'全部虚拟用户共用的账号（默认第i个用户登录各自的{LOADTEST_USERNAME.format("<i>")}）')
+    parser.add_argument('--password', default=LOADTEST_PASSWORD, help='登录密码（使用--username时需指定该账号的密码）')
+    parser.add_argument('--timeout', type=float, default=60, help='单个请求超时（秒）')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='结果JSON路径（默认benchmarks/results/loadtest-<提交>.json，-为标准输出）')
+    parser.add_argument('--label', help='结果标签')
+    args = parser.parse_args()
+    weights = parse_mix(args.mix)
+
+    process = None
+    workdir = None
+    if not args.url:
+        workdir = args.workdir or tempfile.mkdtemp(prefix='conf_load_')
+        os.makedirs(workdir, exist_ok=True)
+        port = free_port()
+        args.url = f'http://127.0.0.1:{port}'
+        process = start_server(args.serve, workdir, port, args)
+    try:
+        wait_ready(args.url, process)
+
+        records = []
+        workloads = [None] * args.users
+        # 全部用户登录完成后同时开始
+        start_barrier = threading.Barrier(args.users + 1)
+        threads = [threading.Thread(target=virtual_user, args=(i, args, workloads, weights, records, start_barrier),
+                                    daemon=True) for i in range(args.users)]
+        for thread in threads:
+            thread.start()
+        try:
+            start_barrier.wait(timeout=120)
+        except threading.BrokenBarrierError:
+            raise RuntimeError('虚拟用户登录或获取数据失败（见上方错误）') from None
+        started = time.monotonic()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    results = report(records, elapsed)
+    print(f'{"operation":12s} {"requests":>9s} {"p50 ms":>10s} {"p95 ms":>10s} {"p99 ms":>10s} '
+          f'{"req/s":>9s} {"errors":>8s}  error types')
+    for name, result in results.items():
+        print(f'{name:12s} {result["requests"]:9d} {result["p50_ms"]:10.3f} {result["p95_ms"]:10.3f} '
+              f'{result["p99_ms"]:10.3f} {result["throughput_rps"]:9.1f} {result["error_rate"]:8.2%}  '
+              + ', '.join(f'{k}={v}' for k, v in sorted(result['errors'].items())))
+
+    output = write_results({
+        'benchmark': 'loadtest',
+        'label': args.label,
+        'environment': environment_info(),
+        'target': {'url': args.url if process is None else None,
+                   'serve': args.serve if process is not None else 'external',
+                   'web_workers': args.web_workers},
+        # 各账号的数据规模相同，games/servers/templates为单个用户参与压测的数据量
+        'dataset': {'preset': args.preset if process is not None else None,
+                    'games': len(workloads[0].games),
+                    'servers': sum(len(g['servers']) for g in workloads[0].games),
+                    'templates': sum(len(g['templates']) for g in workloads[0].games),
+                    'users': args.users,
+                    'accounts': 1 if args.username else args.users},
+        'load': {'users': args.users, 'duration': args.duration, 'mix': weights, 'think': args.think},
+        'results': results
+    }, args.output, 'loadtest')
+    print(f'结果: {output}')
+    if workdir and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
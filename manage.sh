@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # 配置文件生成系统 - 统一服务管理脚本
-# 支持：start, stop, restart, status, install, uninstall, logs
+# 支持：start, stop, restart, reload, status, install, uninstall, logs
 
 # 配置变量
 SERVICE_NAME="config-generator"
@@ -10,6 +10,10 @@ BACKEND_DIR="$APP_DIR/backend"
 PYTHON_CMD="python3"
 APP_FILE="app.py"
 PORT=5000
+# 运行模式：production（gunicorn多进程）或 dev（Flask开发服务器）
+SERVE_MODE="${SERVE_MODE:-production}"
+WSGI_APP="wsgi:app"
+GUNICORN_CONF="gunicorn.conf.py"
 PID_FILE="/tmp/$SERVICE_NAME.pid"
 LOG_FILE="/tmp/$SERVICE_NAME.log"
 
@@ -55,7 +59,7 @@ check_pip() {
 # 安装依赖
 install_dependencies() {
     log_info "检查并安装Python依赖包..."
-    cd "$BACKEND_DIR" || exit 1
+    cd "$APP_DIR" || exit 1
     
     if [[ -f "requirements.txt" ]]; then
         pip3 install -r requirements.txt --user
@@ -138,7 +142,12 @@ start_service() {
     export PYTHONPATH="$BACKEND_DIR"
     
     # 使用nohup在后台运行
-    nohup $PYTHON_CMD "$APP_FILE" --host=0.0.0.0 --port=$PORT > "$LOG_FILE" 2>&1 &
+    if [[ "$SERVE_MODE" == "dev" ]]; then
+        nohup $PYTHON_CMD "$APP_FILE" --host=0.0.0.0 --port=$PORT > "$LOG_FILE" 2>&1 &
+    else
+        # gunicorn主进程初始化数据库后派生工作进程，PID为主进程
+        nohup $PYTHON_CMD -m gunicorn -c "$GUNICORN_CONF" --bind "0.0.0.0:$PORT" "$WSGI_APP" > "$LOG_FILE" 2>&1 &
+    fi
     local pid=$!
     
     # 保存PID
@@ -148,7 +157,7 @@ start_service() {
     sleep 3
     
     if is_running; then
-        log_info "服务启动成功 (PID: $pid)"
+        log_info "服务启动成功 (PID: $pid, 模式: $SERVE_MODE)"
         log_info "访问地址: http://localhost:$PORT"
         log_info "日志文件: $LOG_FILE"
         log_info "默认登录: admin / admin123"
@@ -198,6 +207,26 @@ restart_service() {
     start_service
 }
 
+# 平滑重载（仅生产模式）：主进程收到HUP后启动新工作进程加载新代码，旧进程处理完当前请求后退出
+reload_service() {
+    log_info "平滑重载 $SERVICE_NAME 服务..."
+    
+    if ! is_running; then
+        log_warn "服务未运行，直接启动"
+        start_service
+        return
+    fi
+    
+    if [[ "$SERVE_MODE" == "dev" ]]; then
+        log_warn "开发模式不支持平滑重载，执行重启"
+        restart_service
+        return
+    fi
+    
+    kill -HUP "$(cat "$PID_FILE")"
+    log_info "已发送重载信号"
+}
+
 # 查看服务状态
 status_service() {
     log_info "检查 $SERVICE_NAME 服务状态..."
@@ -208,7 +237,11 @@ status_service() {
         local cpu=$(ps -p "$pid" -o %cpu= 2>/dev/null | awk '{print $1 "%"}' || echo "未知")
         
         log_info "服务状态: 运行中"
+        log_info "运行模式: $SERVE_MODE"
         log_info "进程ID: $pid"
+        if [[ "$SERVE_MODE" != "dev" ]]; then
+            log_info "工作进程数: $(pgrep -P "$pid" | wc -l)"
+        fi
         log_info "内存使用: $memory"
         log_info "CPU使用: $cpu"
         log_info "端口: $PORT"
@@ -252,6 +285,11 @@ install_service() {
         exit 1
     fi
     
+    local exec_start="$PYTHON_CMD -m gunicorn -c $GUNICORN_CONF --bind 0.0.0.0:$PORT $WSGI_APP"
+    if [[ "$SERVE_MODE" == "dev" ]]; then
+        exec_start="$PYTHON_CMD $APP_FILE --host=0.0.0.0 --port=$PORT"
+    fi
+    
     # 创建systemd服务文件
     cat > "/etc/systemd/system/$SERVICE_NAME.service" << EOF
 [Unit]
@@ -263,7 +301,7 @@ Type=simple
 User=$(whoami)
 Group=$(whoami)
 WorkingDirectory=$BACKEND_DIR
-ExecStart=$PYTHON_CMD $APP_FILE --host=0.0.0.0 --port=$PORT
+ExecStart=$exec_start
 ExecReload=/bin/kill -HUP \$MAINPID
 Restart=always
 RestartSec=5
@@ -288,6 +326,7 @@ EOF
     log_info "  systemctl start $SERVICE_NAME"
     log_info "  systemctl stop $SERVICE_NAME"
     log_info "  systemctl restart $SERVICE_NAME"
+    log_info "  systemctl reload $SERVICE_NAME   # 平滑重载"
     log_info "  systemctl status $SERVICE_NAME"
 }
 
@@ -324,12 +363,13 @@ uninstall_service() {
 show_help() {
     echo "配置文件生成系统 - 统一服务管理脚本"
     echo ""
-    echo "用法: $0 {start|stop|restart|status|install|uninstall|logs|help}"
+    echo "用法: $0 {start|stop|restart|reload|status|install|uninstall|logs|help}"
     echo ""
     echo "命令:"
-    echo "  start     启动服务 (开发模式)"
+    echo "  start     启动服务 (默认gunicorn多进程，SERVE_MODE=dev 使用开发服务器)"
     echo "  stop      停止服务"
     echo "  restart   重启服务"
+    echo "  reload    平滑重载 (不中断正在处理的请求)"
     echo "  status    查看服务状态"
     echo "  install   安装为系统服务 (需要root权限)"
     echo "  uninstall 卸载系统服务 (需要root权限)"
@@ -338,6 +378,8 @@ show_help() {
     echo ""
     echo "示例:"
     echo "  $0 start     # 启动服务"
+    echo "  WEB_WORKERS=4 WEB_THREADS=8 $0 start  # 指定工作进程与线程数"
+    echo "  SERVE_MODE=dev $0 start  # 开发模式启动"
     echo "  $0 status    # 查看状态"
     echo "  sudo $0 install  # 安装系统服务"
     echo ""
@@ -359,6 +401,9 @@ main() {
         restart)
             restart_service
             ;;
+        reload)
+            reload_service
+            ;;
         status)
             status_service
             ;;
@@ -2,6 +2,9 @@
 # -*- coding: utf-8 -*-
 """
 测试启动脚本
+
+python3 test_start.py               开发服务器（单进程）
+python3 test_start.py --production  gunicorn多进程模式（参数见backend/gunicorn.conf.py）
 """
 
 import os
@@ -12,11 +15,22 @@ from pathlib import Path
 backend_dir = Path(__file__).parent / 'backend'
 sys.path.insert(0, str(backend_dir))
 
-# 导入并运行Flask应用
-from app import app
-
 if __name__ == '__main__':
+    if '--production' in sys.argv[1:]:
+        # 由gunicorn主进程初始化数据库后派生工作进程，本进程直接替换为gunicorn
+        print("以生产模式启动游戏配置管理系统...")
+        os.execvp(sys.executable, [
+            sys.executable, '-m', 'gunicorn',
+            '-c', str(backend_dir / 'gunicorn.conf.py'),
+            'wsgi:app'
+        ])
+
+    # 导入并运行Flask应用
+    from app import app, init_database
+
     print("启动游戏配置管理系统...")
     print("访问地址: http://localhost:5000")
+    # 初始化数据库并执行未应用的迁移
+    init_database()
     # 不切换到backend目录，保持当前目录
     app.run(host='0.0.0.0', port=5000, debug=False)
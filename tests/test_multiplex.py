@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/batch 子请求与外层请求的隔离：请求ID与剖析状态不被子请求覆盖
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent / 'backend'
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('conf_manage')
+    # 应用在导入时读取目录配置，必须在导入前指向临时目录
+    for name in ('UPLOAD_DIR', 'TEMPLATE_DIR', 'DOWNLOAD_DIR', 'GENERATED_DIR', 'PROFILE_DIR'):
+        os.environ[name] = str(tmp / name.lower())
+    os.environ['DATABASE_PATH'] = str(tmp / 'config_system.db')
+    sys.path.insert(0, str(BACKEND_DIR))
+    import app as conf_app
+
+    conf_app.init_database()
+    client = conf_app.app.test_client()
+    response = client.post('/login', json={'username': 'admin', 'password': 'admin'})
+    assert response.status_code == 200
+    yield client
+    conf_app.get_pool(conf_app.app).close_all()
+
+
+def test_profiled_batch_keeps_request_id(client):
+    project = client.post('/api/projects', json={'name': 'batch'}).json
+    response = client.post(
+        '/api/batch',
+        json={'requests': [
+            {'path': f'/api/projects/{project["id"]}'},
+            {'path': '/api/projects'}
+        ]},
+        headers={'X-Request-ID': 'outer-batch-0001', 'X-Profile': 'cprofile'}
+    )
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json['results']] == [200, 200]
+    assert response.headers['X-Request-ID'] == 'outer-batch-0001'
+
+    profiles = client.get('/api/admin/profiles').json['profiles']
+    assert [(p['endpoint'], p['request_id']) for p in profiles] == [('batch_requests', 'outer-batch-0001')]
+
+
+def test_sampled_sub_requests_are_not_profiled(client, monkeypatch):
+    import app as conf_app
+
+    project = client.post('/api/projects', json={'name': 'sampled'}).json
+    monkeypatch.setattr(conf_app.request_profiler, 'routes', frozenset({'get_project'}))
+    monkeypatch.setattr(conf_app.request_profiler, 'sample_rate', 1.0)
+    response = client.post(
+        '/api/batch',
+        json={'requests': [{'path': f'/api/projects/{project["id"]}'}]},
+        headers={'X-Request-ID': 'outer-batch-0002'}
+    )
+    assert response.json['results'][0]['status'] == 200
+    direct = client.get(f'/api/projects/{project["id"]}', headers={'X-Request-ID': 'direct-0002'})
+    assert direct.status_code == 200
+    monkeypatch.undo()
+
+    profiles = client.get('/api/admin/profiles').json['profiles']
+    # 只有直接请求被剖析，合并请求中的子请求没有单独的剖析文件
+    assert [p['request_id'] for p in profiles if p['endpoint'] == 'get_project'] == ['direct-0002']